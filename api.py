@@ -4,9 +4,16 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), "third_party"))
 
 from fastapi import FastAPI
+from fastapi.responses import Response
+
+from gt7.metrics import METRICS, CONTENT_TYPE
 
 app = FastAPI()
 
 @app.get("/health")
 def read_root():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/metrics")
+def metrics():
+    return Response(METRICS.render(), media_type=CONTENT_TYPE)
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""Hot path micro-benchmarks on synthetic telemetry.
+
+Runs every stage a packet goes through over the same synthetic laps and
+reports packets per second, plus the peak memory traced while it runs and
+the blocks it leaves allocated:
+
+    python benchmarks/hotpath.py --laps 3 --json results.json
+    python benchmarks/hotpath.py --compare results.json
+
+--compare prints the change against an earlier results file.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import numpy as np
+
+from gt7.synth import datagrams
+from gt7.telemetry import GT7DataPacket, GT7Logger
+from gt7.batch import decode_batch
+
+def _logger(tmp):
+    return GT7Logger(replay=True, filetemplate=os.path.join(tmp, "{datetime}.ld"))
+
+def bench_decrypt(data, tmp):
+    scratch = bytearray(4096)
+    decrypt = GT7DataPacket.decrypt
+    def run():
+        for d in data:
+            decrypt(d, out=scratch)
+    return run
+
+def bench_unpack(data, tmp):
+    plain = [bytes(GT7DataPacket.decrypt(d)) for d in data]
+    def run():
+        for d in plain:
+            GT7DataPacket(d, encrypted=False)
+    return run
+
+def bench_decode_batch(data, tmp):
+    def run():
+        decode_batch(data)
+    return run
+
+def bench_process_sample(data, tmp):
+    logger = _logger(tmp)
+    def run():
+        for i, d in enumerate(data):
+            logger.process_sample(i / 60, d)
+    return run
+
+def bench_save_log(data, tmp):
+    logger = _logger(tmp)
+    for i, d in enumerate(data):
+        logger.process_sample(i / 60, d)
+    return logger.save_log
+
+def bench_export_to_ld(data, tmp):
+    import pandas as pd
+    from gt7.writer.motec_exporter import export_to_ld
+
+    derive = _logger(tmp).new_derive()
+    df = pd.DataFrame(derive(np.array([_raw(GT7DataPacket(d)) for d in data])), columns=derive.names)
+    path = os.path.join(tmp, "export.ld")
+    def run():
+        export_to_ld(df, {"vehicle": "", "venue": "", "event": ""}, path)
+    return run
+
+def _raw(p):
+    return (
+        0, p.current_lap, p.rpm, p.gear, p.throttle, p.brake, p.clutch, p.speed,
+        *p.position, *p.velocity, *p.rotation, *p.suspension, *p.wheelspeed,
+        *p.wheelradius, *p.tyretemp, p.ride_height, p.turbo_boost, p.oil_pressure,
+        p.oil_temp, p.water_temp, p.current_fuel, p.fuel_capacity,
+        p.asm_active, p.tcs_active, p.in_race,
+    )
+
+class _Socket:
+    async def send_bytes(self, data):
+        pass
+
+def bench_broadcast(data, tmp, clients=8):
+    from gt7.broadcast import Broadcaster, Client
+
+    logger = _logger(tmp)
+    rows = logger.new_derive()(np.array([_raw(GT7DataPacket(d)) for d in data]))
+    manager = Broadcaster(GT7Logger.channels)
+    for i in range(clients):
+        # half of them want everything, the rest a few channels at 10Hz
+        channels = None if i % 2 else (2, 4, 5, 8)
+        manager.clients[i] = Client(_Socket(), every=1 if i % 2 else 6, channels=channels)
+    def run():
+        for i, row in enumerate(rows):
+            manager.publish(i / 60, row)
+    return run
+
+BENCHMARKS = {
+    "decrypt": bench_decrypt,
+    "unpack": bench_unpack,
+    "decode_batch": bench_decode_batch,
+    "process_sample": bench_process_sample,
+    "save_log": bench_save_log,
+    "export_to_ld": bench_export_to_ld,
+    "broadcast": bench_broadcast,
+}
+
+def measure(name, data, repeat):
+    times = []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            run = BENCHMARKS[name](data, tmp)
+            gc.collect()
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # the fixture exists on both sides of the count, only what run()
+        # leaves behind is retained
+        run = BENCHMARKS[name](data, tmp)
+        gc.collect()
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        run()
+        gc.collect()
+        retained = sys.getallocatedblocks() - blocks
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del run
+
+    best = min(times)
+    return {
+        "seconds": best,
+        "packets_per_s": len(data) / best if best else None,
+        "us_per_packet": best / len(data) * 1e6,
+        "peak_bytes": peak,
+        "retained_blocks": retained,
+    }
+
+def commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laps", type=int, default=3)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS))
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    data = list(datagrams(laps=args.laps, loss=args.loss))
+    results = {
+        "commit": commit(),
+        "python": sys.version.split()[0],
+        "packets": len(data),
+        "results": {},
+    }
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("results", {})
+
+    print(f"{len(data)} packets, {args.laps} laps")
+    print(f"{'':16} {'packets/s':>12} {'us/packet':>10} {'peak KiB':>10} {'retained':>9}")
+    for name in args.only or BENCHMARKS:
+        try:
+            r = measure(name, data, args.repeat)
+        except ImportError as e:
+            print(f"{name:16} skipped, {e}")
+            results["results"][name] = {"skipped": str(e)}
+            continue
+        results["results"][name] = r
+
+        line = (
+            f"{name:16} {r['packets_per_s']:12.0f} {r['us_per_packet']:10.2f}"
+            f" {r['peak_bytes'] / 1024:10.1f} {r['retained_blocks']:9d}"
+        )
+        before = baseline.get(name, {}).get("packets_per_s")
+        if before:
+            line += f"  {(r['packets_per_s'] / before - 1) * 100:+6.1f}%"
+        print(line)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
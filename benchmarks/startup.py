@@ -0,0 +1,129 @@
+"""Cold start benchmark.
+
+Reports how long the ingest path takes to start listening, and what every
+module costs to import, each measured in fresh interpreters:
+
+    python benchmarks/startup.py --runs 5 --budget 0.5 --json startup.json
+
+Exits non-zero when the median time to listen is over --budget seconds.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    "core",
+    "gt7.sampler",
+    "gt7.heartbeat",
+    "gt7.telemetry",
+    "gt7.pipeline",
+    "gt7.database",
+    "gt7.tracks",
+)
+
+def import_times(module):
+    """{module: (self, cumulative)} in seconds for one `import module`."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_to_listen(timeout=30):
+    """Seconds from launching gt7.py until it reports the socket is bound."""
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "config.yml"), "w") as f:
+            json.dump({
+                "ps_ip": "",
+                "ports": {"heartbeat": free_port(), "telemetry": free_port()},
+                "log_output_path": os.path.join(tmp, "logs", "session.ld"),
+            }, f)
+
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(REPO, "gt7.py")],
+            cwd=tmp, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        try:
+            for line in proc.stdout:
+                if line.startswith("Listening"):
+                    return time.perf_counter() - start
+                if time.perf_counter() - start > timeout:
+                    break
+            raise RuntimeError("gt7.py never started listening")
+        finally:
+            proc.send_signal(signal.SIGINT)
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="fail if the median time to listen is over this")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    listen = [time_to_listen() for _ in range(args.runs)]
+
+    modules = {}
+    slowest = {}
+    for module in MODULES:
+        runs = [import_times(module) for _ in range(args.runs)]
+        modules[module] = statistics.median(r.get(module, (0, 0))[1] for r in runs)
+        if module == MODULES[0]:
+            names = set().union(*runs)
+            slowest = {
+                name: statistics.median(r[name][0] for r in runs if name in r)
+                for name in names
+            }
+
+    results = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "time_to_listen": {"median": statistics.median(listen), "min": min(listen), "max": max(listen)},
+        "imports": modules,
+        "slowest": dict(sorted(slowest.items(), key=lambda kv: -kv[1])[:args.top]),
+    }
+
+    print(f"time to listen: {results['time_to_listen']['median'] * 1000:8.1f} ms (median of {args.runs})")
+    print("\nimport, cumulative:")
+    for name, t in modules.items():
+        print(f"  {t * 1000:8.1f} ms  {name}")
+    print(f"\nslowest modules imported by {MODULES[0]}, self time:")
+    for name, t in results["slowest"].items():
+        print(f"  {t * 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.budget is not None and results["time_to_listen"]["median"] > args.budget:
+        print(f"\nover budget: {results['time_to_listen']['median']:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
+import time
+
+STARTED = time.perf_counter()
+
 import asyncio
+import importlib
 import yaml
 import os
-import pandas as pd
 import sys, traceback
-from gt7.writer.motec_exporter import export_to_ld
+from datetime import datetime
+from gt7.sampler import AsyncGT7Sampler
+from gt7.heartbeat import Heartbeat, LinkStats
 
 def handle_uncaught(exc_type, exc_value, tb):
     print(f"[UNEXPECTED ERROR] {exc_value}")
@@ -22,40 +28,203 @@ def load_config():
     with open(CONFIG_FILE, 'r') as f:
         return yaml.safe_load(f)
 
-async def main():
-    config = load_config()
-
-    # Placeholder for UDP listeners
-    print("UDP listeners would be started here.")
+def raw_output_path(config):
+    path = config.get('raw_output_path', './logs/raw/{datetime}.gt7raw')
+    path = path.format(datetime=datetime.now().strftime("%Y-%m-%dT%H-%M-%S"))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return path
 
+def export_sample(config):
     # Example of processing a sample file
     # In a real scenario, this would come from the UDP listener
-    if os.path.exists('samples/packet_a.bin'):
-        print("Processing sample file...")
-        # This is a placeholder for the full decryption and parsing pipeline
-        # For now, we'll create a dummy dataframe
-        data = {
-            'timestamp': [0, 0.01, 0.02],
-            'throttle': [0, 10, 50],
-            'brake': [100, 90, 20]
-        }
-        df = pd.DataFrame(data)
-
-        metadata = {
-            'vehicle': 'Placeholder Vehicle',
-            'venue': 'Placeholder Track',
-            'event': 'Placeholder Event'
-        }
-
-        output_path = config.get('log_output_path', './logs/session.ld')
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        export_to_ld(df, metadata, output_path)
-        print(f"Successfully generated .ld file at {output_path}")
-    else:
+    if not os.path.exists('samples/packet_a.bin'):
         print("Sample file not found, skipping processing.")
+        return
+
+    # pandas is slow to import, so it is only loaded for this
+    import pandas as pd
+    from gt7.writer.motec_exporter import export_to_ld
+
+    print("Processing sample file...")
+    # This is a placeholder for the full decryption and parsing pipeline
+    # For now, we'll create a dummy dataframe
+    data = {
+        'timestamp': [0, 0.01, 0.02],
+        'throttle': [0, 10, 50],
+        'brake': [100, 90, 20]
+    }
+    df = pd.DataFrame(data)
+
+    metadata = {
+        'vehicle': 'Placeholder Vehicle',
+        'venue': 'Placeholder Track',
+        'event': 'Placeholder Event'
+    }
+
+    output_path = config.get('log_output_path', './logs/session.ld')
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    export_to_ld(df, metadata, output_path)
+    print(f"Successfully generated .ld file at {output_path}")
+
+def apply_changes(logger, config, changes):
+    """Hands edited settings to the logger, the rest wait for a restart."""
+    applied = logger.apply_settings(changes)
+    for key, value in changes.items():
+        if value is None:
+            config.pop(key, None)
+        else:
+            config[key] = value
+    restart = set(changes) - applied
+    if restart:
+        print(f"Restart to apply: {', '.join(sorted(restart))}")
+
+async def run_consoles(config):
+    """Logs every console in `consoles`, sharded over worker processes."""
+    from gt7.multi import MultiIngest, consoles_from_config
+
+    receive = config.get('receive', {})
+    ingest = MultiIngest(
+        consoles_from_config(config),
+        config=config,
+        port=config.get('ports', {}).get('telemetry', 33740),
+        heartbeat_port=config.get('ports', {}).get('heartbeat', 33739),
+        interval=config.get('heartbeat_interval', 1.5),
+        workers=config.get('ingest_workers'),
+        pool_size=receive.get('pool_size', 0),
+        rcvbuf=receive.get('rcvbuf'),
+    )
+    # bound before the workers load numpy, packets wait in the socket buffer
+    ingest.bind()
+    print(f"Listening {time.perf_counter() - STARTED:.3f}s after start")
+
+    if config.get('endurance') is not None:
+        from gt7.journal import recover
+        endurance = config['endurance'] if isinstance(config['endurance'], dict) else {}
+        for path in await asyncio.to_thread(recover, endurance.get('journal_dir', './logs/journal')):
+            print(f"Recovered {path}")
+
+    await ingest.start()
+    print(f"Logging {len(ingest.consoles)} consoles on {ingest.workers} workers")
+    try:
+        await ingest.wait_closed()
+    finally:
+        await ingest.close()
+        print(f"Consoles: {ingest.snapshot()}")
+
+async def main(listen=True, saveraw=False, settings_file=None):
+    config = load_config()
+    if settings_file:
+        config['settings_file'] = settings_file
+    if config.get('settings_file'):
+        from gt7.config import read_settings
+        config.update(read_settings(config['settings_file']))
+
+    if listen and config.get('consoles'):
+        await run_consoles(config)
+        return
+
+    receive = config.get('receive', {})
+    sampler = AsyncGT7Sampler(
+        port=config.get('ports', {}).get('telemetry', 33740),
+        pool_size=receive.get('pool_size', 0),
+        rcvbuf=receive.get('rcvbuf'),
+    )
+
+    link = LinkStats(freq=sampler.freq)
+    heartbeat = None
+    # the web app's settings file calls it playstation_ip
+    ps_ip = config.get('ps_ip') or config.get('playstation_ip')
+    if listen and ps_ip:
+        heartbeat = Heartbeat(
+            ps_ip,
+            port=config.get('ports', {}).get('heartbeat', 33739),
+            interval=config.get('heartbeat_interval', 1.5),
+            stats=link,
+        )
+
+    # Bind and get the console streaming before anything heavy is imported,
+    # packets queue up in the socket buffer until the logger is ready.
+    if listen:
+        sampler.bind()
+        if heartbeat:
+            await heartbeat.start()
+        print(f"Listening {time.perf_counter() - STARTED:.3f}s after start")
+
+    # numpy and the cipher load in a thread so the heartbeat keeps going
+    telemetry = await asyncio.to_thread(importlib.import_module, 'gt7.telemetry')
+
+    from gt7.metrics import METRICS, STAGE, monitor_loop
+    METRICS.enabled = config.get('metrics', True)
+    monitor = asyncio.create_task(monitor_loop()) if METRICS.enabled else None
+
+    rawfile = None
+    if listen and (saveraw or config.get('save_raw_telemetry', False)):
+        rawfile = raw_output_path(config)
+
+    logger = telemetry.GT7Logger(
+        config=config,
+        rawfile=rawfile,
+        filetemplate=config.get('filetemplate'),
+        replay=config.get('replay', False),
+        gap_fill=config.get('gap_fill', 'hold'),
+        max_gap=config.get('max_gap', 60),
+        derived=config.get('derived_channels', True),
+        live=config.get('live_state', 'gt7-live'),
+        export_worker=config.get('export_worker', True),
+        endurance=config.get('endurance'),
+    )
+    logger.sampler = sampler
+    logger.link = link
+    sampler.callback = logger.process_sample
+
+    if logger.endurance is not None:
+        # sessions a crash or power loss cut short, finished from their journal
+        for path in await asyncio.to_thread(logger.recover):
+            print(f"Recovered {path}")
+
+    pipeline = None
+    if config.get('pipeline'):
+        from gt7.pipeline import Pipeline
+        # the logger hands over every packet it has decrypted, so it is
+        # not decrypted a second time
+        pipeline = Pipeline.from_config(config['pipeline'], decrypted=True)
+        logger.on_packet = pipeline.feed
+
+    # edits of the settings are applied between samples, ingest never stops
+    watcher = None
+    if listen and config.get('reload', True):
+        from gt7.config import SettingsWatcher
+        paths = [CONFIG_FILE] + ([config['settings_file']] if config.get('settings_file') else [])
+        watcher = SettingsWatcher(paths, lambda changes: apply_changes(logger, config, changes))
+        logger.apply_settings(watcher.settings)
+        await watcher.start()
+
+    if listen:
+        await sampler.start()
+
+    await asyncio.to_thread(export_sample, config)
 
     print("Async core running")
-    await asyncio.sleep(1)
+    if not listen:
+        return
+
+    try:
+        await sampler.wait_closed()
+    finally:
+        if monitor:
+            monitor.cancel()
+        if watcher:
+            watcher.stop()
+        if heartbeat:
+            heartbeat.stop()
+        sampler.stop()
+        logger.close()
+        if pipeline:
+            pipeline.close()
+            print(f"Pipeline stages: {pipeline.snapshot()}")
+        print(f"Link stats: {logger.link.snapshot()}")
+        if METRICS.enabled:
+            print(f"Stage p99 (s): { {name: h.quantile(0.99) for name, h in STAGE.items()} }")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -1,7 +1,17 @@
+import argparse
 import asyncio
 import logging
 from core import main
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-listen', action='store_true', help="only run the sample export, don't listen for telemetry")
+    parser.add_argument('--saveraw', action='store_true', help="capture the raw telemetry next to the logs")
+    parser.add_argument('--settings-file', help="settings read on top of config.yml and applied while logging, e.g. the web app's service_settings.json")
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main(listen=not args.no_listen, saveraw=args.saveraw, settings_file=args.settings_file))
+    except KeyboardInterrupt:
+        pass
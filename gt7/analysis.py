@@ -0,0 +1,222 @@
+
+import argparse
+import json
+from collections import namedtuple
+
+import numpy as np
+
+from . import gps
+from .derived import MS_TO_KPH, MS_TO_MPH, STEP_COLUMNS, EVENT_COLUMNS
+from .writer.ld_stream import HEAD, CHANNEL
+
+# logged channels taken from the sample before a grid point instead of
+# interpolated
+STEP_CHANNELS = STEP_COLUMNS + EVENT_COLUMNS
+
+Lap = namedtuple("Lap", ["number", "start", "end", "time", "length"])
+
+# a lap on the distance grid: elapsed time and channel values at every
+# point, with the channel of each column of values
+Resampled = namedtuple("Resampled", ["time", "values", "length", "names"])
+
+def read_ld_channels(path):
+    """The channels of an .ld file as {name: float64 array}, and the sample rate."""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    channels = {}
+    freq = 0
+    ptr = HEAD.unpack_from(data)[1]
+    while ptr:
+        (_, ptr, data_ptr, length, _, kind, size, rate,
+         shift, mul, scale, dec, name, _, _) = CHANNEL.unpack_from(data, ptr)
+        if kind == 0x07:
+            values = np.frombuffer(data, dtype=f"<f{size}", count=length, offset=data_ptr).astype(np.float64)
+        else:
+            raw = np.frombuffer(data, dtype=f"<i{size}", count=length, offset=data_ptr)
+            values = (raw / scale * 10.0 ** -dec + shift) * mul
+        channels[name.split(b"\0", 1)[0].decode("ascii", "replace")] = values
+        freq = freq or rate
+    return channels, freq
+
+class LapAnalysis:
+    """Compares the laps of a session on a shared distance grid.
+
+    The session is split at the beacon GT7Logger writes on the first sample
+    of every lap, or where `lap` changes when there is no beacon channel.
+    Only laps with a beacon at both ends count. Distance is integrated from
+    speed, or summed from lat and long with `position`. Each lap is then
+    resampled onto `points` evenly spaced fractions of its own length, so
+    laps driven on different lines still start and finish together.
+
+    Resampling a lap is one searchsorted and one gather over all channels.
+    The result is cached per lap, so comparing every lap with the best one
+    only pays for laps not seen before. Laps of another session compare as
+    long as both use the same `points`.
+    """
+
+    def __init__(self, channels, freq=60, points=None, step=2.0, imperial=False, position=False):
+        self.names = list(channels)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.data = np.column_stack([np.asarray(channels[n], dtype=np.float64) for n in self.names])
+        self.freq = freq
+        self.steps = np.array([name in STEP_CHANNELS for name in self.names])
+        self.distance = self._distance(imperial, position)
+        self.laps = self._split()
+
+        if points is None:
+            # `step` metres apart on a lap of median length
+            length = np.median([lap.length for lap in self.laps]) if self.laps else 0
+            points = max(2, int(length / step) + 1)
+        self.points = int(points)
+        self.fraction = np.linspace(0.0, 1.0, self.points)
+        self.cache = {}
+
+    @classmethod
+    def from_ld(cls, path, **options):
+        channels, freq = read_ld_channels(path)
+        return cls(channels, freq=freq or 60, **options)
+
+    def _column(self, name):
+        return self.data[:, self.index[name]]
+
+    def _distance(self, imperial, position):
+        if position and 'lat' in self.index and 'long' in self.index:
+            lat, long = self._column('lat'), self._column('long')
+            m_per_deg_lat, m_per_deg_lon = gps.scale(float(lat[0]) if len(lat) else gps.ORIGIN[0])
+            steps = np.hypot(np.diff(lat) * m_per_deg_lat, np.diff(long) * m_per_deg_lon)
+        else:
+            speed = self._column('speed') / (MS_TO_MPH if imperial else MS_TO_KPH)
+            steps = (speed[1:] + speed[:-1]) / (2 * self.freq)
+        return np.concatenate([[0.0], np.cumsum(steps)])
+
+    def _split(self):
+        if 'beacon' in self.index:
+            starts = np.flatnonzero(self._column('beacon') > 0)
+        elif 'lap' in self.index:
+            starts = np.flatnonzero(np.diff(self._column('lap')) != 0) + 1
+        else:
+            raise ValueError("no beacon or lap channel to split laps at")
+
+        laps = []
+        for i, (start, end) in enumerate(zip(starts[:-1], starts[1:])):
+            length = self.distance[end] - self.distance[start]
+            if length <= 0:
+                continue
+            number = int(self._column('lap')[start]) if 'lap' in self.index else i + 1
+            laps.append(Lap(number, int(start), int(end), float((end - start) / self.freq), float(length)))
+        return laps
+
+    def best(self):
+        """Index of the fastest lap."""
+        if not self.laps:
+            raise ValueError("no complete laps")
+        return min(range(len(self.laps)), key=lambda i: self.laps[i].time)
+
+    def resample(self, lap):
+        """self.laps[lap] on the distance grid, cached."""
+        cached = self.cache.get(lap)
+        if cached is not None:
+            return cached
+
+        info = self.laps[lap]
+        # the sample with the next beacon closes the lap
+        distance = self.distance[info.start:info.end + 1] - self.distance[info.start]
+        block = self.data[info.start:info.end + 1]
+
+        target = self.fraction * distance[-1]
+        i = np.clip(np.searchsorted(distance, target, side="right") - 1, 0, len(distance) - 2)
+        span = distance[i + 1] - distance[i]
+        w = np.clip((target - distance[i]) / np.where(span > 0, span, 1.0), 0.0, 1.0)[:, None]
+
+        values = block[i] + (block[i + 1] - block[i]) * w
+        values[:, self.steps] = block[i][:, self.steps]
+        time = (i + w[:, 0]) / self.freq
+
+        cached = self.cache[lap] = Resampled(time, values.astype(np.float32), distance[-1], tuple(self.names))
+        return cached
+
+    def _reference(self, reference):
+        if reference is None:
+            reference = self.best()
+        if isinstance(reference, Resampled):
+            if len(reference.time) != self.points:
+                raise ValueError(f"reference has {len(reference.time)} points, not {self.points}")
+            return reference
+        return self.resample(reference)
+
+    def _select(self, ref, channels):
+        # columns are matched by name, a reference from another session may
+        # have other channels or the same ones in another order
+        ref_index = {name: i for i, name in enumerate(ref.names)}
+        names = self.names if channels is None else channels
+        names = [name for name in names if name in self.index and name in ref_index]
+        return names, [self.index[name] for name in names], [ref_index[name] for name in names]
+
+    def compare(self, lap, reference=None, channels=None):
+        """Delta time and channel differences of one lap against a reference.
+
+        `reference` is a lap index, a Resampled lap from any session with
+        the same points, or the best lap when None. Distances are along
+        the reference lap. A positive delta means slower than the reference.
+        Only channels both laps have are compared.
+        """
+        ref = self._reference(reference)
+        this = self.resample(lap)
+        names, columns, ref_columns = self._select(ref, channels)
+        diff = this.values[:, columns] - ref.values[:, ref_columns]
+        return {
+            "lap": self.laps[lap],
+            "distance": self.fraction * ref.length,
+            "delta": this.time - ref.time,
+            "channels": {name: diff[:, j] for j, name in enumerate(names)},
+        }
+
+    def compare_all(self, reference=None, channels=None, laps=None):
+        """compare() for many laps at once, as (laps, points) arrays."""
+        ref = self._reference(reference)
+        laps = range(len(self.laps)) if laps is None else laps
+        resampled = [self.resample(i) for i in laps]
+        names, columns, ref_columns = self._select(ref, channels)
+        values = np.stack([r.values[:, columns] for r in resampled]) - ref.values[:, ref_columns]
+        return {
+            "laps": [self.laps[i] for i in laps],
+            "distance": self.fraction * ref.length,
+            "delta": np.stack([r.time for r in resampled]) - ref.time,
+            "channels": {name: values[:, :, j] for j, name in enumerate(names)},
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the laps of an .ld file")
+    parser.add_argument("path")
+    parser.add_argument("--reference", type=int, help="lap index to compare with, the best lap by default")
+    parser.add_argument("--step", type=float, default=2.0, help="metres between grid points")
+    parser.add_argument("--position", action="store_true", help="distance from lat/long instead of speed")
+    parser.add_argument("--imperial", action="store_true", help="speed is in mph")
+    parser.add_argument("--json", help="write the delta traces to this file")
+    args = parser.parse_args()
+
+    analysis = LapAnalysis.from_ld(args.path, step=args.step, imperial=args.imperial, position=args.position)
+    if not analysis.laps:
+        raise SystemExit(f"{args.path} has no complete laps")
+    reference = analysis.best() if args.reference is None else args.reference
+    result = analysis.compare_all(reference, channels=())
+
+    print(f"reference lap {analysis.laps[reference].number}, {analysis.points} points")
+    for lap, delta in zip(result["laps"], result["delta"]):
+        worst = int(np.argmax(np.diff(delta))) if len(delta) > 1 else 0
+        print(
+            f"lap {lap.number:3} {lap.time:8.3f}s {lap.length:8.1f}m"
+            f" {delta[-1]:+7.3f}s, most lost at {result['distance'][worst]:7.1f}m"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "distance": result["distance"].tolist(),
+                "laps": [lap._asdict() for lap in result["laps"]],
+                "delta": result["delta"].tolist(),
+            }, f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import re
+import numpy as np
+
+from .telemetry import GT7DataPacket, Flags
+
+# names of the values in GT7DataPacket.fmt, in the order they are unpacked
+FIELDS = (
+    "position_x", "position_y", "position_z",
+    "velocity_x", "velocity_y", "velocity_z",
+    "rotation_w", "rotation_x", "rotation_y", "rotation_z",
+    "ride_height",
+    "rpm",
+    "current_fuel",
+    "fuel_capacity",
+    "speed",
+    "turbo_boost",
+    "oil_pressure",
+    "water_temp",
+    "oil_temp",
+    "tyretemp_fl", "tyretemp_fr", "tyretemp_rl", "tyretemp_rr",
+    "tick",
+    "current_lap", "laps",
+    "best_laptime",
+    "last_laptime",
+    "race_position", "opponents",
+    "rev_upshift",
+    "rev_limit",
+    "flags",
+    "gear_raw",
+    "throttle",
+    "brake",
+    "wheelspeed_fl", "wheelspeed_fr", "wheelspeed_rl", "wheelspeed_rr",
+    "wheelradius_fl", "wheelradius_fr", "wheelradius_rl", "wheelradius_rr",
+    "suspension_fl", "suspension_fr", "suspension_rl", "suspension_rr",
+    "clutch",
+    "car_code",
+)
+
+# columns decoded from the flags word, named like the GT7DataPacket attributes
+FLAG_COLUMNS = {
+    Flags.IN_RACE: "in_race",
+    Flags.PAUSED: "paused",
+    Flags.LOADING: "loading",
+    Flags.IN_GEAR: "in_gear",
+    Flags.HAS_TURBO: "has_turbo",
+    Flags.REV_LIMIT: "rev_limit_active",
+    Flags.HANDBRAKE: "handbrake",
+    Flags.LIGHTS: "lights",
+    Flags.LOWBEAM: "lowbeam",
+    Flags.HIGHBEAM: "highbeam",
+    Flags.ASM: "asm_active",
+    Flags.TCS: "tcs_active",
+}
+
+def _build_dtype(fmt, names):
+    fields = []
+    offset = 0
+    tokens = re.findall(r"(\d*)([a-zA-Z?])", fmt.format)
+    for count, code in tokens:
+        count = int(count) if count else 1
+        if code == "x":
+            offset += count
+            continue
+        for _ in range(count):
+            fields.append((np.dtype("<" + code), offset))
+            offset += np.dtype(code).itemsize
+
+    if len(fields) != len(names):
+        raise RuntimeError(f"GT7DataPacket.fmt has {len(fields)} fields, expected {len(names)}")
+
+    return np.dtype({
+        "names": list(names),
+        "formats": [f for f, _ in fields],
+        "offsets": [o for _, o in fields],
+        "itemsize": fmt.size,
+    })
+
+# raw view of a decrypted packet, padding included
+PACKET_DTYPE = _build_dtype(GT7DataPacket.fmt, FIELDS)
+
+# packed output of decode_batch/unpack_batch
+RECORD_DTYPE = np.dtype(
+    [(name, PACKET_DTYPE.fields[name][0]) for name in FIELDS if name != "gear_raw"]
+    + [("gear", "u1"), ("suggested_gear", "u1")]
+    + [(name, "?") for name in FLAG_COLUMNS.values()]
+)
+
+def unpack_batch(buf, count=-1):
+    """Unpacks a buffer of back to back decrypted packets.
+
+    Args:
+        buf: A bytes-like object holding whole decrypted packets of
+            GT7DataPacket.size bytes each.
+        count (int): Number of packets to read, -1 for all of them.
+
+    Returns:
+        np.ndarray: One RECORD_DTYPE row per packet.
+    """
+    raw = np.frombuffer(buf, dtype=PACKET_DTYPE, count=count)
+    out = np.empty(len(raw), dtype=RECORD_DTYPE)
+
+    for name in FIELDS:
+        if name != "gear_raw":
+            out[name] = raw[name]
+
+    out["gear"] = raw["gear_raw"] & 0x0F
+    out["suggested_gear"] = raw["gear_raw"] >> 4
+
+    for flag, name in FLAG_COLUMNS.items():
+        out[name] = (raw["flags"] & flag.value) != 0
+
+    return out
+
+def decode_batch(datagrams, encrypted=True):
+    """Decrypts and decodes a block of GT7 datagrams in one go.
+
+    Packets that fail to decrypt (bad magic) or are too short are dropped,
+    so the result can be shorter than the input.
+
+    Args:
+        datagrams: An iterable of raw datagrams as received from the console.
+        encrypted (bool): Whether the datagrams still need decrypting.
+
+    Returns:
+        np.ndarray: One RECORD_DTYPE row per valid packet, in input order.
+    """
+    if not isinstance(datagrams, (list, tuple)):
+        datagrams = list(datagrams)
+
+    size = GT7DataPacket.size
+    buf = bytearray(len(datagrams) * size)
+    view = memoryview(buf)
+
+    n = 0
+    for dat in datagrams:
+        if encrypted:
+            dat = GT7DataPacket.decrypt(dat)
+        if len(dat) < size:
+            continue
+        view[n * size:(n + 1) * size] = memoryview(dat)[:size]
+        n += 1
+
+    return unpack_batch(buf, count=n)
@@ -0,0 +1,106 @@
+
+import asyncio
+import json
+import logging
+import struct
+from collections import deque
+
+import numpy as np
+
+l = logging.getLogger(__name__)
+
+# binary frame: TIMESTAMP followed by one little endian float32 per channel
+FRAME_HEADER = struct.Struct("<d")
+
+class Client:
+    def __init__(self, websocket, maxlen=64, every=1, channels=None):
+        self.websocket = websocket
+        self.queue = deque(maxlen=maxlen)
+        self.ready = asyncio.Event()
+        self.every = max(int(every), 1)
+        self.channels = channels
+        self.seen = 0
+        self.sent = 0
+        self.dropped = 0
+        self.task = None
+
+class Broadcaster:
+    """Fans samples out to WebSocket clients without letting one slow them all.
+
+    publish() never awaits: each sample is encoded once per distinct channel
+    subset and appended to every client's bounded queue, dropping the oldest
+    frame when a client has fallen behind. A task per client drains its
+    queue, so a stalled connection only ever delays itself.
+
+    On connect a client is sent a JSON text message with the channel names
+    of its frames, then binary frames of FRAME_HEADER and float32 values.
+    """
+
+    def __init__(self, channels, maxlen=64):
+        self.names = [c.get('name') if isinstance(c, dict) else c for c in channels]
+        self.maxlen = maxlen
+        self.clients = {}
+
+    async def connect(self, websocket, every=1, channels=None):
+        await websocket.accept()
+
+        index = None
+        if channels:
+            index = tuple(self.names.index(c) for c in channels if c in self.names)
+
+        client = Client(websocket, maxlen=self.maxlen, every=every, channels=index)
+        names = self.names if index is None else [self.names[i] for i in index]
+        await websocket.send_text(json.dumps({"channels": names, "every": client.every}))
+
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[websocket] = client
+        return client
+
+    def disconnect(self, websocket):
+        client = self.clients.pop(websocket, None)
+        if client and client.task:
+            client.task.cancel()
+
+    def publish(self, timestamp, row):
+        if not self.clients:
+            return
+
+        values = None
+        frames = {}
+        for client in self.clients.values():
+            client.seen += 1
+            if (client.seen - 1) % client.every:
+                continue
+
+            frame = frames.get(client.channels)
+            if frame is None:
+                if values is None:
+                    values = np.asarray(row, dtype="<f4")
+                data = values if client.channels is None else values[list(client.channels)]
+                frame = FRAME_HEADER.pack(timestamp) + data.tobytes()
+                frames[client.channels] = frame
+
+            if len(client.queue) == client.queue.maxlen:
+                client.dropped += 1
+            client.queue.append(frame)
+            client.ready.set()
+
+    async def _sender(self, client):
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.queue:
+                    await client.websocket.send_bytes(client.queue.popleft())
+                    client.sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            l.info(f"WebSocket client went away: {e}")
+            self.clients.pop(client.websocket, None)
+
+    def stats(self):
+        return [
+            {"sent": c.sent, "dropped": c.dropped, "queued": len(c.queue), "every": c.every}
+            for c in self.clients.values()
+        ]
@@ -0,0 +1,115 @@
+import numpy as np
+
+class SampleBuffer:
+    """Columnar store for logged samples.
+
+    Rows are written into fixed size chunks of shape (chunk_size, channels)
+    in Fortran order, so each channel is a contiguous typed array and
+    growing the buffer never copies what has already been logged.
+
+    With a `sink`, full chunks are handed to it instead of being kept, so
+    only the chunk being filled stays in memory.
+    """
+
+    def __init__(self, channels, chunk_size=4096, dtype=np.float64, sink=None):
+        self.names = [c.get('name') if isinstance(c, dict) else c for c in channels]
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(dtype)
+        self.sink = sink
+        self.chunks = []
+        self.current = None
+        self.index = 0
+        self.flushed = 0
+
+    def __len__(self):
+        return self.flushed + len(self.chunks) * self.chunk_size + self.index
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def _rotate(self):
+        if self.current is not None:
+            if self.sink:
+                self.sink(self.current)
+                self.flushed += len(self.current)
+            else:
+                self.chunks.append(self.current)
+        self.current = np.empty((self.chunk_size, len(self.names)), dtype=self.dtype, order='F')
+        self.index = 0
+
+    def append(self, row):
+        if self.current is None or self.index == self.chunk_size:
+            self._rotate()
+        self.current[self.index] = row
+        self.index += 1
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=self.dtype)
+        done = 0
+        while done < len(rows):
+            if self.current is None or self.index == self.chunk_size:
+                self._rotate()
+            n = min(len(rows) - done, self.chunk_size - self.index)
+            self.current[self.index:self.index + n] = rows[done:done + n]
+            self.index += n
+            done += n
+
+    def last(self):
+        if not self.index:
+            return None
+        return self.current[self.index - 1]
+
+    def flush(self):
+        """Hands the rows of the chunk being filled to the sink."""
+        if self.sink and self.index:
+            self.sink(self.current[:self.index])
+            self.flushed += self.index
+        if self.sink:
+            self.current = None
+            self.index = 0
+
+    def pending(self):
+        """The rows of the chunk being filled, not handed to the sink yet."""
+        if self.current is None:
+            return np.empty((0, len(self.names)), dtype=self.dtype, order='F')
+        return self.current[:self.index]
+
+    def clear(self):
+        self.chunks = []
+        self.current = None
+        self.index = 0
+        self.flushed = 0
+
+    def blocks(self):
+        """Yields the logged rows chunk by chunk as 2D views."""
+        yield from self.chunks
+        if self.current is not None and self.index:
+            yield self.current[:self.index]
+
+    def array(self):
+        """Returns all rows as one (samples, channels) Fortran ordered array.
+
+        With a single chunk this is a view, otherwise the chunks are copied
+        once into a new array.
+        """
+        blocks = list(self.blocks())
+        if not blocks:
+            return np.empty((0, len(self.names)), dtype=self.dtype, order='F')
+        if len(blocks) == 1:
+            return blocks[0]
+
+        out = np.empty((len(self), len(self.names)), dtype=self.dtype, order='F')
+        start = 0
+        for block in blocks:
+            out[start:start + len(block)] = block
+            start += len(block)
+        return out
+
+    def columns(self):
+        data = self.array()
+        return {name: data[:, i] for i, name in enumerate(self.names)}
+
+    def frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.array(), columns=self.names, copy=False)
@@ -0,0 +1,104 @@
+
+import asyncio
+from collections import deque
+
+TOPICS = ('sample', 'lap', 'session')
+OVERFLOW = ('drop_oldest', 'drop_newest')
+
+class Subscription:
+    def __init__(self, bus, name, topics, maxlen=1024, overflow='drop_oldest'):
+        if overflow not in OVERFLOW:
+            raise ValueError(f"unknown overflow policy {overflow!r}, use one of {OVERFLOW}")
+        self.bus = bus
+        self.name = name
+        self.topics = frozenset(topics)
+        self.maxlen = maxlen
+        self.overflow = overflow
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.delivered = 0
+        self.dropped = 0
+
+    @property
+    def lag(self):
+        return len(self.queue)
+
+    def offer(self, topic, item):
+        if len(self.queue) >= self.maxlen:
+            self.dropped += 1
+            if self.overflow == 'drop_newest':
+                return
+            self.queue.popleft()
+        self.queue.append((topic, item))
+        self.ready.set()
+
+    def get_nowait(self):
+        self.delivered += 1
+        return self.queue.popleft()
+
+    async def get(self):
+        while not self.queue:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.get_nowait()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.get()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+class EventBus:
+    """In-process publish/subscribe for logger events.
+
+    Every subscriber gets its own bounded queue filtered by topic, so each
+    consumer sees every event it asked for and a slow one only loses its
+    own events. publish() never blocks or awaits.
+
+    Topics:
+        sample: (timestamp, row) for every logged sample.
+        lap: (timestamp, {"lap", "laptime"}) when a lap is completed.
+        session: (timestamp, {"state", "event", ...}) when a log starts or ends.
+    """
+
+    def __init__(self):
+        self.subscriptions = []
+        self.routes = {topic: () for topic in TOPICS}
+
+    def subscribe(self, name, topics=TOPICS, maxlen=1024, overflow='drop_oldest'):
+        unknown = set(topics) - set(TOPICS)
+        if unknown:
+            raise ValueError(f"unknown topics {sorted(unknown)}, use {TOPICS}")
+        sub = Subscription(self, name, topics, maxlen=maxlen, overflow=overflow)
+        self.subscriptions.append(sub)
+        self._route()
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscriptions:
+            self.subscriptions.remove(sub)
+            self._route()
+
+    def _route(self):
+        self.routes = {
+            topic: tuple(s for s in self.subscriptions if topic in s.topics)
+            for topic in TOPICS
+        }
+
+    def publish(self, topic, item):
+        for sub in self.routes[topic]:
+            sub.offer(topic, item)
+
+    def stats(self):
+        return {
+            sub.name: {
+                "topics": sorted(sub.topics),
+                "lag": sub.lag,
+                "delivered": sub.delivered,
+                "dropped": sub.dropped,
+            }
+            for sub in self.subscriptions
+        }
@@ -0,0 +1,228 @@
+
+import mmap
+import os
+import struct
+import zlib
+import logging
+from bisect import bisect_right
+
+l = logging.getLogger(__name__)
+
+# File layout:
+#   HEADER
+#   blocks of BLOCK header + records, each record RECORD header + datagram,
+#   the records of a block are zlib compressed as a whole if FLAG_ZLIB is set
+#   INDEX entry per block
+#   TRAILER
+HEADER = struct.Struct("<8sII")     # MAGIC FLAGS BLOCK_RECORDS
+BLOCK = struct.Struct("<III")       # RECORDS STORED_LEN RAW_LEN
+RECORD = struct.Struct("<diH")      # TIMESTAMP TICK LEN
+INDEX = struct.Struct("<iihdQI")    # FIRST_TICK LAST_TICK FIRST_LAP FIRST_TIMESTAMP OFFSET RECORDS
+TRAILER = struct.Struct("<QI8s")    # INDEX_OFFSET INDEX_ENTRIES MAGIC
+
+MAGIC = b"GT7RAW\x00\x01"
+INDEX_MAGIC = b"GT7RAWIX"
+FLAG_ZLIB = 0x1
+
+class CaptureWriter:
+    """Appends raw (still encrypted) GT7 datagrams to a capture file.
+
+    Records are written a block at a time, once the block holds
+    `block_records` of them or spans `max_age` seconds, whichever comes
+    first. A logger that dies loses the records of the block still being
+    gathered, so at most `max_age` seconds of telemetry, plus whatever the
+    OS had not written out yet when the power went.
+    """
+
+    def __init__(self, path, block_records=256, compress=False, max_age=1.0):
+        self.path = path
+        self.block_records = block_records
+        self.max_age = max_age
+        self.flags = FLAG_ZLIB if compress else 0
+        self.index = []
+        self.block = bytearray()
+        self.block_meta = None
+        self.records = 0
+
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, self.flags, block_records))
+
+    def write(self, timestamp, data, tick=-1, lap=-1):
+        if not self.records:
+            self.block_meta = [tick, tick, lap, timestamp]
+        self.block_meta[1] = tick
+
+        self.block += RECORD.pack(timestamp, tick, len(data))
+        self.block += data
+        self.records += 1
+
+        if self.records == self.block_records or timestamp - self.block_meta[3] >= self.max_age:
+            self.flush()
+
+    def flush(self):
+        if not self.records:
+            return
+
+        payload = bytes(self.block)
+        if self.flags & FLAG_ZLIB:
+            payload = zlib.compress(payload, 1)
+
+        first_tick, last_tick, first_lap, first_timestamp = self.block_meta
+        self.index.append(INDEX.pack(first_tick, last_tick, first_lap, first_timestamp, self.f.tell(), self.records))
+        self.f.write(BLOCK.pack(self.records, len(payload), len(self.block)))
+        self.f.write(payload)
+        self.f.flush()
+
+        self.block = bytearray()
+        self.records = 0
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.flush()
+        offset = self.f.tell()
+        self.f.write(b"".join(self.index))
+        self.f.write(TRAILER.pack(offset, len(self.index), INDEX_MAGIC))
+        self.f.close()
+
+class CaptureReader:
+    """Memory maps a capture file for replay.
+
+    Records are returned as memoryviews into the map (or into the
+    decompressed block), so iterating a capture doesn't copy datagrams.
+    Files that were never closed have no index and are scanned block by
+    block instead, decrypting the first packet of each block for its lap;
+    a truncated last block is skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "rb")
+        self.map = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+
+        magic, self.flags, self.block_records = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a GT7 capture file")
+
+        self.index = self._read_index()
+        if self.index is None:
+            l.info(f"{path} has no index, scanning blocks")
+            self.index = self._scan_index()
+
+        self.first_ticks = [e[0] for e in self.index]
+
+    def _read_index(self):
+        if len(self.map) < HEADER.size + TRAILER.size:
+            return None
+        offset, entries, magic = TRAILER.unpack_from(self.map, len(self.map) - TRAILER.size)
+        if magic != INDEX_MAGIC:
+            return None
+        return [INDEX.unpack_from(self.map, offset + i * INDEX.size) for i in range(entries)]
+
+    def _scan_index(self):
+        from .telemetry import GT7DataPacket
+
+        index = []
+        lap = -1
+        offset = HEADER.size
+        while offset + BLOCK.size <= len(self.map):
+            records, stored, _ = BLOCK.unpack_from(self.map, offset)
+            if offset + BLOCK.size + stored > len(self.map):
+                break
+            first = last = None
+            first_lap = None
+            for timestamp, tick, data in self._block_records(offset):
+                if first is None:
+                    first = (timestamp, tick)
+                last = tick
+                if first_lap is None:
+                    # the lap the writer would have indexed, from the first
+                    # packet that decrypts
+                    try:
+                        first_lap = GT7DataPacket(data).current_lap
+                    except ValueError:
+                        pass
+            if first is not None:
+                lap = lap if first_lap is None else first_lap
+                index.append((first[1], last, lap, first[0], offset, records))
+            offset += BLOCK.size + stored
+        return index
+
+    def __len__(self):
+        return sum(e[5] for e in self.index)
+
+    def close(self):
+        self.f.close()
+        try:
+            self.view.release()
+            self.map.close()
+        except BufferError:
+            # a record is still referenced, the map goes away with it
+            pass
+
+    def _block_records(self, offset):
+        records, stored, _ = BLOCK.unpack_from(self.map, offset)
+        payload = self.view[offset + BLOCK.size:offset + BLOCK.size + stored]
+        if self.flags & FLAG_ZLIB:
+            payload = memoryview(zlib.decompress(payload))
+
+        pos = 0
+        for _ in range(records):
+            timestamp, tick, length = RECORD.unpack_from(payload, pos)
+            pos += RECORD.size
+            yield timestamp, tick, payload[pos:pos + length]
+            pos += length
+
+    def _start_block(self, tick=None, lap=None):
+        if tick is not None:
+            return max(bisect_right(self.first_ticks, tick) - 1, 0)
+        if lap is not None:
+            for i, entry in enumerate(self.index):
+                if entry[2] >= lap:
+                    return max(i - 1, 0)
+            return len(self.index)
+        return 0
+
+    def records(self, tick=None, lap=None):
+        """Yields (timestamp, tick, datagram), optionally from a tick or lap on.
+
+        Seeking uses the index to jump to the right block; records before
+        `tick` in that block are skipped. For `lap` the block before the
+        first one starting in that lap is replayed, so the logger sees the
+        lap change.
+        """
+        for entry in self.index[self._start_block(tick, lap):]:
+            for record in self._block_records(entry[4]):
+                if tick is not None and record[1] < tick:
+                    continue
+                yield record
+
+    def __iter__(self):
+        for timestamp, _, data in self.records():
+            yield timestamp, data
+
+def replay(path, logger, tick=None, lap=None):
+    """Feeds a capture through logger.process_sample and saves the log."""
+    reader = CaptureReader(path)
+    try:
+        for timestamp, _, data in reader.records(tick=tick, lap=lap):
+            logger.process_sample(timestamp, data)
+        logger.save_log()
+    finally:
+        reader.close()
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python -m gt7.capture <capture_file> [<lap>]")
+        sys.exit(1)
+
+    from .telemetry import GT7Logger
+
+    logging.basicConfig(level=logging.INFO)
+    capture = sys.argv[1]
+    lap = int(sys.argv[2]) if len(sys.argv) == 3 else None
+    logger = GT7Logger(replay=True, filetemplate=os.path.splitext(capture)[0] + ".ld")
+    replay(capture, logger, lap=lap)
@@ -1,16 +1,31 @@
 
+import logging
+import os
+import threading
+
 import yaml
 
+l = logging.getLogger(__name__)
+
 class Config:
-    def __init__(self, filename="config.yml"):
+    """config.yml, written back `delay` seconds after the last set().
+
+    A burst of set() calls makes one write, and the file is replaced
+    atomically so a logger watching it never reads half of it.
+    """
+
+    def __init__(self, filename="config.yml", delay=0.5):
         self.filename = filename
+        self.delay = delay
         self.data = {}
+        self.timer = None
+        self.lock = threading.Lock()
         self.load()
 
     def load(self):
         try:
             with open(self.filename, "r") as f:
-                self.data = yaml.safe_load(f)
+                self.data = yaml.safe_load(f) or {}
         except FileNotFoundError:
             self.data = {
                 "ps_ip": "",
@@ -28,13 +43,109 @@ class Config:
             }
             self.save()
 
+    def reload(self):
+        """Reads the file again and returns the keys that changed."""
+        before = self.data
+        self.load()
+        return changed_keys(before, self.data)
+
     def save(self):
-        with open(self.filename, "w") as f:
-            yaml.dump(self.data, f, indent=4)
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            tmp = self.filename + ".tmp"
+            with open(tmp, "w") as f:
+                yaml.dump(self.data, f, indent=4)
+            os.replace(tmp, self.filename)
+
+    def flush(self):
+        """Writes pending changes now."""
+        if self.timer:
+            self.save()
 
     def get(self, key, default=None):
         return self.data.get(key, default)
 
     def set(self, key, value):
-        self.data[key] = value
-        self.save()
+        self.update({key: value})
+
+    def update(self, values):
+        # under the lock, so a save() on the timer thread never dumps a dict
+        # that changes under it
+        with self.lock:
+            self.data.update(values)
+        if not self.delay:
+            self.save()
+            return
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.save)
+            self.timer.daemon = True
+            self.timer.start()
+
+def changed_keys(before, after):
+    """The top level keys whose values differ between two settings dicts."""
+    before, after = before or {}, after or {}
+    return {k for k in before.keys() | after.keys() if before.get(k) != after.get(k)}
+
+def read_settings(path):
+    """A YAML or JSON settings file as a dict, empty when it is missing."""
+    try:
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+
+class SettingsWatcher:
+    """Calls `callback(changes)` when settings files are edited.
+
+    Later files in `paths` override earlier ones. `changes` holds the top
+    level keys whose values changed, with their new values. A file that
+    does not parse, say caught half written by an editor, is skipped until
+    the next change.
+    """
+
+    def __init__(self, paths, callback, debounce=0.2):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.callback = callback
+        self.debounce = debounce
+        self.watchers = []
+        self.files = {p: read_settings(p) for p in self.paths}
+        self.settings = self.merged()
+
+    def merged(self):
+        settings = {}
+        for path in self.paths:
+            settings.update(self.files[path])
+        return settings
+
+    async def start(self):
+        from .watch import DirectoryWatcher
+
+        directories = {}
+        for path in self.paths:
+            directories.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+        for directory, names in directories.items():
+            watcher = DirectoryWatcher(directory, self.changed, names=names, debounce=self.debounce)
+            await watcher.start()
+            self.watchers.append(watcher)
+
+    def changed(self, names):
+        for path in self.paths:
+            if names is None or os.path.basename(path) in names:
+                try:
+                    self.files[path] = read_settings(path)
+                except (OSError, yaml.YAMLError) as e:
+                    l.warning(f"not reloading {path}: {e}")
+        settings = self.merged()
+        keys = changed_keys(self.settings, settings)
+        self.settings = settings
+        if keys:
+            self.callback({k: settings.get(k) for k in keys})
+
+    def stop(self):
+        for watcher in self.watchers:
+            watcher.stop()
+        self.watchers = []
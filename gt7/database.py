@@ -1,76 +1,277 @@
 import sqlite3
 import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 
 l = logging.getLogger(__name__)
 
+SCHEMA_VERSION = 3
+
+# the format of CURRENT_TIMESTAMP, every time is stored in UTC like this
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    driver TEXT,
+    vehicle TEXT,
+    venue TEXT,
+    session TEXT
+);
+CREATE TABLE IF NOT EXISTS laps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER NOT NULL REFERENCES sessions(id),
+    lap INTEGER,
+    laptime REAL,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS sessions_started_at ON sessions(started_at);
+CREATE INDEX IF NOT EXISTS sessions_venue ON sessions(venue, started_at);
+CREATE INDEX IF NOT EXISTS sessions_vehicle ON sessions(vehicle, started_at);
+CREATE INDEX IF NOT EXISTS laps_session ON laps(session_id, laptime);
+CREATE INDEX IF NOT EXISTS laps_timestamp ON laps(timestamp);
+"""
+
+# executescript() commits first, so migrations run these one at a time
+SCHEMA_STATEMENTS = [statement.strip() for statement in SCHEMA.split(";") if statement.strip()]
+
+def utc(text=None):
+    """An ISO 8601 time as stored, in UTC. Times without a zone are local."""
+    then = datetime.fromisoformat(text) if text else datetime.now(timezone.utc)
+    return then.astimezone(timezone.utc).strftime(TIME_FORMAT)
+
+SESSION_QUERY = """
+SELECT s.id, s.started_at AS timestamp, s.driver, s.vehicle, s.venue, s.session,
+       (SELECT MIN(laptime) FROM laps WHERE session_id = s.id) AS best_lap,
+       (SELECT COUNT(*) FROM laps WHERE session_id = s.id) AS laps
+FROM sessions s
+"""
+
 class Database:
-    def __init__(self, db_file="sessions.db"):
+    """Session and lap store.
+
+    Writes are queued to a writer thread that owns the read/write
+    connection and commits whatever has queued up, at most `flush_interval`
+    seconds after the first write of the batch, in a single transaction, in WAL mode with synchronous=NORMAL.
+    Reads go through a separate read-only connection, so they never wait
+    on a commit. Times are stored in UTC as YYYY-MM-DD HH:MM:SS, the
+    format of CURRENT_TIMESTAMP, so they sort in order.
+    """
+
+    def __init__(self, db_file="sessions.db", flush_interval=1.0):
         self.db_file = db_file
+        self.flush_interval = flush_interval
         self.conn = None
+        self.reader = None
+        self.read_lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.writer = None
+        self.session_ids = {}
 
     def connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_file)
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
             l.info(f"Connected to database: {self.db_file}")
         except sqlite3.Error as e:
             l.error(f"Error connecting to database: {e}")
 
     def close(self):
+        if self.writer:
+            self.queue.put(None)
+            self.writer.join()
+            self.writer = None
+        if self.reader:
+            self.reader.close()
+            self.reader = None
         if self.conn:
             self.conn.close()
+            self.conn = None
             l.info("Database connection closed.")
 
+    def _create(self, cursor):
+        for statement in SCHEMA_STATEMENTS:
+            cursor.execute(statement)
+
+    def _migrate(self, cursor, version):
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(sessions)")]
+        if "best_lap" in columns:
+            # version 1 stored every lap as its own session row
+            l.info("Migrating sessions table to the sessions/laps schema")
+            cursor.execute("ALTER TABLE sessions RENAME TO sessions_v1")
+            self._create(cursor)
+            cursor.execute("""
+            INSERT INTO sessions (id, started_at, driver, vehicle, venue, session)
+            SELECT id, timestamp, driver, vehicle, venue, session FROM sessions_v1
+            """)
+            cursor.execute("""
+            INSERT INTO laps (session_id, lap, laptime, timestamp)
+            SELECT id, 1, best_lap, timestamp FROM sessions_v1
+            """)
+            cursor.execute("DROP TABLE sessions_v1")
+        elif version == 2 and columns:
+            # version 2 stored the local start time of a logged session as
+            # 2026-10-18T10:00:00, next to CURRENT_TIMESTAMP in UTC
+            rows = cursor.execute("SELECT id, started_at FROM sessions WHERE started_at LIKE '%T%'").fetchall()
+            for session_id, started_at in rows:
+                try:
+                    cursor.execute("UPDATE sessions SET started_at = ? WHERE id = ?", (utc(started_at), session_id))
+                except ValueError:
+                    l.warning(f"session {session_id} has an unreadable start time {started_at!r}")
+
     def create_tables(self):
         if not self.conn:
             self.connect()
         try:
             cursor = self.conn.cursor()
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                driver TEXT,
-                vehicle TEXT,
-                venue TEXT,
-                session TEXT,
-                best_lap REAL
-            )
-            """)
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version < SCHEMA_VERSION:
+                cursor.execute("BEGIN")
+                self._migrate(cursor, version)
+                self._create(cursor)
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             self.conn.commit()
             l.info("Database tables created successfully.")
         except sqlite3.Error as e:
+            self.conn.rollback()
             l.error(f"Error creating tables: {e}")
+        self.start()
 
-    def insert_session(self, session_data):
+    def start(self):
+        if self.writer:
+            return
         if not self.conn:
             self.connect()
-        try:
-            cursor = self.conn.cursor()
+        self.writer = threading.Thread(target=self._writer, name="database-writer", daemon=True)
+        self.writer.start()
+
+    def _writer(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            # committed at most flush_interval after the first item of the
+            # batch arrived, however steadily the rest keeps coming
+            deadline = time.monotonic() + self.flush_interval
+            try:
+                while batch[-1] is not None:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+
+            # drain anything else that is already waiting
+            while running:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                else:
+                    batch.append(item)
+
+            if batch:
+                self._commit(batch)
+
+    def _session_id(self, cursor, data):
+        fields = tuple(data.get(name, "") for name in ("driver", "vehicle", "venue", "session"))
+        # a logged session is its start time on its console, the names can
+        # change while it runs; without a start time the names are all there is
+        started = data.get("datetime", "")
+        key = (data.get("console", ""), started) if started else ("", "", *fields)
+        session_id, stored = self.session_ids.get(key, (None, None))
+        if session_id is None:
+            try:
+                started_at = utc(started)
+            except ValueError:
+                l.warning(f"unreadable session time {started!r}, using now")
+                started_at = utc()
             cursor.execute("""
-            INSERT INTO sessions (driver, vehicle, venue, session, best_lap)
+            INSERT INTO sessions (started_at, driver, vehicle, venue, session)
             VALUES (?, ?, ?, ?, ?)
-            """, (
-                session_data.get("driver", ""),
-                session_data.get("vehicle", ""),
-                session_data.get("venue", ""),
-                session_data.get("session", ""),
-                session_data.get("best_lap", 0.0)
-            ))
-            self.conn.commit()
-            l.info(f"New session inserted: {session_data}")
-        except sqlite3.Error as e:
-            l.error(f"Error inserting session: {e}")
+            """, (started_at, *fields))
+            session_id = cursor.lastrowid
+        elif stored != fields:
+            cursor.execute("""
+            UPDATE sessions SET driver = ?, vehicle = ?, venue = ?, session = ?
+            WHERE id = ?
+            """, (*fields, session_id))
+        self.session_ids[key] = (session_id, fields)
+        return session_id
 
-    def get_sessions(self, limit=10):
-        if not self.conn:
-            self.connect()
+    def _commit(self, batch):
         try:
             cursor = self.conn.cursor()
-            cursor.execute("SELECT * FROM sessions ORDER BY timestamp DESC LIMIT ?", (limit,))
-            rows = cursor.fetchall()
+            cursor.execute("BEGIN")
+            for data in batch:
+                cursor.execute("""
+                INSERT INTO laps (session_id, lap, laptime)
+                VALUES (?, ?, ?)
+                """, (
+                    self._session_id(cursor, data),
+                    data.get("lap"),
+                    data.get("best_lap", data.get("laptime", 0.0)),
+                ))
+            self.conn.commit()
+            l.info(f"Stored {len(batch)} laps")
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            self.session_ids.clear()
+            l.error(f"Error inserting laps: {e}")
+
+    def insert_session(self, session_data):
+        """Queues a lap of a session for the writer thread.
+
+        `session_data` holds the event fields (driver, vehicle, venue and
+        session), optionally the start `datetime` and the `console` it was
+        logged from, the lap number as `lap` and its time as `best_lap`.
+        Laps with the same start time and console go into one session, which
+        takes the names of its latest lap.
+        """
+        self.queue.put(dict(session_data))
+
+    def _read(self, query, params=()):
+        with self.read_lock:
+            if not self.reader:
+                self.reader = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+            cursor = self.reader.execute(query, params)
             columns = [description[0] for description in cursor.description]
-            sessions = [dict(zip(columns, row)) for row in rows]
-            return sessions
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def get_sessions(self, limit=10, offset=0, venue=None, vehicle=None):
+        where = []
+        params = []
+        if venue:
+            where.append("s.venue = ?")
+            params.append(venue)
+        if vehicle:
+            where.append("s.vehicle = ?")
+            params.append(vehicle)
+
+        query = SESSION_QUERY
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY s.started_at DESC LIMIT ? OFFSET ?"
+
+        try:
+            return self._read(query, (*params, limit, offset))
         except sqlite3.Error as e:
             l.error(f"Error getting sessions: {e}")
             return []
+
+    def get_laps(self, session_id):
+        try:
+            return self._read(
+                "SELECT lap, laptime, timestamp FROM laps WHERE session_id = ? ORDER BY lap",
+                (session_id,),
+            )
+        except sqlite3.Error as e:
+            l.error(f"Error getting laps: {e}")
+            return []
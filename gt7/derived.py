@@ -0,0 +1,192 @@
+import numpy as np
+
+from . import gps
+
+# what the logger records per packet, in packet units
+RAW_COLUMNS = (
+    'beacon', 'lap', 'rpm', 'gear',
+    'throttle', 'brake', 'clutch', 'speed',
+    'x', 'y', 'z',
+    'vx', 'vy', 'vz',
+    'rotation_w', 'rotation_x', 'rotation_y', 'rotation_z',
+    'suspfl', 'suspfr', 'susprl', 'susprr',
+    'wspdfl', 'wspdfr', 'wspdrl', 'wspdrr',
+    'radiusfl', 'radiusfr', 'radiusrl', 'radiusrr',
+    'tyretempfl', 'tyretempfr', 'tyretemprl', 'tyretemprr',
+    'rideheight', 'turbopres',
+    'oilpres', 'oiltemp', 'watertemp',
+    'fuel', 'fuelcapacity',
+    'asm', 'tcs', 'in_race',
+)
+
+# columns, and .ld channels, that only change in steps and are never
+# interpolated, by gap filling or lap analysis
+STEP_COLUMNS = ('lap', 'gear', 'asm', 'tcs', 'in_race')
+# columns that only mark the real sample they were logged with
+EVENT_COLUMNS = ('beacon',)
+
+MS_TO_KPH = 3.6
+MS_TO_MPH = 2.23693629
+G = 9.8
+
+class Channel:
+    def __init__(self, names, func, derived):
+        self.names = names
+        self.func = func
+        self.derived = derived
+
+CHANNELS = []
+
+def channel(*names, derived=False):
+    """Declares logged channels computed from raw columns.
+
+    The function gets a mapping of raw column name to array and the
+    DerivedChannels evaluating it, and returns one array per name.
+    `derived` marks the channels that can be switched off.
+    """
+    def register(func):
+        CHANNELS.append(Channel(names, func, derived))
+        return func
+    return register
+
+def _cross(a, b):
+    return np.stack([
+        a[1] * b[2] - a[2] * b[1],
+        a[2] * b[0] - a[0] * b[2],
+        a[0] * b[1] - a[1] * b[0],
+    ])
+
+def _rotate(q, v):
+    # rotate world vectors v (3, n) into the car's frame, by the conjugate of q (4, n)
+    w = q[0]
+    r = -q[1:]
+    t = 2 * _cross(r, v)
+    return v + w * t + _cross(r, t)
+
+def _quaternion(c):
+    q = np.stack([c['rotation_w'], c['rotation_x'], c['rotation_y'], c['rotation_z']])
+    norm = np.linalg.norm(q, axis=0)
+    # interpolated rows are slightly off unit length, empty rotations are left alone
+    return q / np.where(norm > 0, norm, 1)
+
+for _name in ('beacon', 'lap', 'rpm', 'gear', 'tyretempfl', 'tyretempfr', 'tyretemprl', 'tyretemprr',
+              'oilpres', 'oiltemp', 'watertemp', 'asm', 'tcs'):
+    channel(_name)(lambda c, e, _name=_name: c[_name])
+
+@channel('throttle', 'brake', 'clutch')
+def pedals(c, e):
+    return c['throttle'] * (100 / 255), c['brake'] * (100 / 255), c['clutch'] * (100 / 255)
+
+@channel('steer')
+def steer(c, e):
+    # not in the packet
+    return np.zeros_like(c['rpm'])
+
+@channel('speed')
+def speed(c, e):
+    return c['speed'] * e.ms_to_speed
+
+@channel('lat', 'long', derived=True)
+def position(c, e):
+    lat, long = gps.convert(x=c['x'], z=-c['z'], latmid=e.origin[0], longmid=e.origin[1])
+    return lat, long
+
+@channel('velx', 'vely', 'velz', derived=True)
+def velocity(c, e):
+    v = _rotate(_quaternion(c), np.stack([c['vx'], c['vy'], c['vz']])) * e.ms_to_speed
+    # so we match the GPS long
+    return v[0], v[1], -v[2]
+
+@channel('glat', 'gvert', 'glong', derived=True)
+def acceleration(c, e):
+    v = np.stack([c['vx'], c['vy'], c['vz']])
+    prev = e.previous
+    first = v[:, :1] if prev is None else np.array([[prev['vx']], [prev['vy']], [prev['vz']]])
+    dv = np.diff(v, axis=1, prepend=first)
+    g = _rotate(_quaternion(c), dv) * (e.freq / G)
+    return g[0], g[1], -g[2]
+
+@channel('suspfl', 'suspfr', 'susprl', 'susprr')
+def suspension(c, e):
+    return tuple(c[name] * 100 for name in ('suspfl', 'suspfr', 'susprl', 'susprr'))
+
+@channel('wspdfl', 'wspdfr', 'wspdrl', 'wspdrr')
+def wheelspeed(c, e):
+    # wheel speed is inverted while racing but not in replays
+    k = np.where(c['in_race'] > 0, -e.ms_to_speed, e.ms_to_speed)
+    return tuple(
+        c[f'radius{w}'] * c[f'wspd{w}'] * k
+        for w in ('fl', 'fr', 'rl', 'rr')
+    )
+
+@channel('rideheight')
+def rideheight(c, e):
+    return c['rideheight'] * 100
+
+@channel('turbopres')
+def turbopres(c, e):
+    return c['turbopres'] * 100
+
+@channel('fuellevel')
+def fuellevel(c, e):
+    capacity = c['fuelcapacity']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(capacity > 0, c['fuel'] / capacity * 100, 0.0)
+
+class DerivedChannels:
+    """Evaluates logged channels from blocks of raw columns.
+
+    Every channel is a vectorised function declared once with @channel and
+    run over a whole block at a time. Channels that differentiate over time
+    use the last raw row of the previous block, so calling the instance on
+    consecutive blocks gives the same result as one call on all of them.
+
+    With `derived` off the GPS, velocity and g-force channels are zero.
+    """
+
+    def __init__(self, channels, freq=60, imperial=False, origin=gps.ORIGIN, derived=True, raw=RAW_COLUMNS):
+        self.names = [c.get('name') if isinstance(c, dict) else c for c in channels]
+        self.raw = list(raw)
+        self.freq = freq
+        self.imperial = imperial
+        self.origin = tuple(origin)
+        self.previous = None
+
+        # warm the cache so the first block does not pay for it
+        gps.scale(self.origin[0])
+
+        wanted = set(self.names)
+        self.plan = []
+        for ch in CHANNELS:
+            if ch.derived and not derived:
+                continue
+            out = [(i, self.names.index(name)) for i, name in enumerate(ch.names) if name in wanted]
+            if out:
+                self.plan.append((ch, out))
+
+    @property
+    def ms_to_speed(self):
+        # a property, so a logger can switch units while logging
+        return MS_TO_MPH if self.imperial else MS_TO_KPH
+
+    def reset(self):
+        self.previous = None
+
+    def evaluate(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        columns = {name: block[:, i] for i, name in enumerate(self.raw)}
+        out = np.zeros((len(block), len(self.names)), dtype=np.float64, order='F')
+        if not len(block):
+            return out
+
+        for ch, index in self.plan:
+            values = ch.func(columns, self)
+            if len(ch.names) == 1:
+                values = (values,)
+            for i, j in index:
+                out[:, j] = values[i]
+
+        self.previous = {name: block[-1, i] for i, name in enumerate(self.raw)}
+        return out
+
+    __call__ = evaluate
@@ -1,5 +1,6 @@
 
 import curses
+import time
 
 class Display:
     def __init__(self, stdscr):
@@ -28,3 +29,29 @@ class Display:
             data = callback()
             if data:
                 self.update(data)
+
+def main(stdscr, name):
+    from .livestate import LiveState
+
+    while True:
+        try:
+            live = LiveState.attach(name)
+            break
+        except FileNotFoundError:
+            stdscr.addstr(0, 0, f"Waiting for the logger ({name})")
+            stdscr.refresh()
+            time.sleep(1)
+    try:
+        Display(stdscr).run(live.read)
+    finally:
+        live.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    from .livestate import DEFAULT_NAME
+
+    parser = argparse.ArgumentParser(description="Show the live telemetry of a running logger")
+    parser.add_argument("--name", default=DEFAULT_NAME, help="shared memory block of the logger")
+    args = parser.parse_args()
+    curses.wrapper(main, args.name)
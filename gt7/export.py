@@ -0,0 +1,142 @@
+
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from .journal import Journal
+from .writer.ld_stream import LDStreamWriter
+
+l = logging.getLogger(__name__)
+
+def finalise(state, tail, event):
+    """Writes the last rows of a detached log, patches its metadata and closes it.
+
+    Returns the number of samples in the file, an empty file is removed.
+    """
+    writer = (Journal if state.get("journal") else LDStreamWriter).resume(state)
+    try:
+        if tail is not None:
+            writer.append(tail)
+    finally:
+        writer.close(event)
+    if not writer.count and os.path.exists(writer.path):
+        os.remove(writer.path)
+    return writer.count
+
+def _worker(jobs, results):
+    # Ctrl-C reaches the whole process group, the logger decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        path = job[0]["path"]
+        try:
+            results.put((path, finalise(*job), None))
+        except Exception as e:
+            results.put((path, 0, repr(e)))
+
+class ExportWorker:
+    """Finishes .ld files in a process of its own.
+
+    The logger detaches the writer of a session that ended and hands it over
+    with the rows still buffered, then carries on with the next session
+    straight away. At most `maxsize` sessions wait in the handoff queue;
+    submit() returns False when it is full and the caller finishes the file
+    itself. An export that raises is reported by poll() and never reaches
+    the logger. A worker that dies is replaced, with new queues since it
+    may have died holding their locks, and its unfinished jobs are queued
+    again, except one that already killed a worker before.
+    """
+
+    def __init__(self, maxsize=4):
+        # spawned, a fork would copy the sockets and threads of the logger
+        self.ctx = multiprocessing.get_context("spawn")
+        self.maxsize = maxsize
+        self.process = None
+        self.pending = {}
+        self.retried = set()
+        self.done = []
+
+    def _start(self):
+        self.jobs = self.ctx.Queue(self.maxsize)
+        self.results = self.ctx.Queue()
+        self.process = self.ctx.Process(target=_worker, args=(self.jobs, self.results), name="gt7-export", daemon=True)
+        self.process.start()
+
+    def _drain(self):
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return
+            self.pending.pop(result[0], None)
+            self.retried.discard(result[0])
+            self.done.append(result)
+
+    def _stop(self):
+        for q in (self.jobs, self.results):
+            q.cancel_join_thread()
+            q.close()
+        self.process = None
+
+    def _restart(self):
+        l.error(f"export worker exited with {self.process.exitcode}, restarting it")
+        self._drain()
+        self._stop()
+        self._start()
+        for path, job in list(self.pending.items()):
+            if path in self.retried:
+                l.error(f"giving up on {path}")
+                del self.pending[path]
+            else:
+                self.retried.add(path)
+                self.jobs.put_nowait(job)
+
+    def submit(self, state, tail, event):
+        if self.process is None:
+            self._start()
+        elif not self.process.is_alive():
+            self._restart()
+        if len(self.pending) >= self.maxsize:
+            return False
+        job = (state, tail, event)
+        self.jobs.put_nowait(job)
+        self.pending[state["path"]] = job
+        return True
+
+    def poll(self):
+        """Finished exports since the last call, as (path, samples, error)."""
+        if self.process is not None:
+            self._drain()
+            if self.pending and not self.process.is_alive():
+                self._restart()
+        done, self.done = self.done, []
+        return done
+
+    def close(self, timeout=60):
+        """Waits for the queued exports, stops the worker and returns what poll() would."""
+        if self.process is None:
+            return self.poll()
+
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            self.process.join(0.1)
+            self._drain()
+            if self.pending and not self.process.is_alive():
+                self._restart()
+        self.jobs.put(None)
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self._drain()
+        self._stop()
+
+        for path in self.pending:
+            l.error(f"{path} was not finalised")
+        self.pending.clear()
+        return self.poll()
@@ -0,0 +1,174 @@
+import numpy as np
+
+from .derived import STEP_COLUMNS, EVENT_COLUMNS
+
+METHODS = ('hold', 'linear')
+
+# the console sends one packet per tick, 60 a second
+TICK_RATE = 60
+
+# rotation quaternion of decoded packets, see gt7.batch
+ROTATION = ('rotation_w', 'rotation_x', 'rotation_y', 'rotation_z')
+
+def fill_rows(last, current, n, method='hold', step=(), event=(), rotation=()):
+    """Synthesises the `n` rows missing between two logged rows.
+
+    Args:
+        last: The row logged before the gap.
+        current: The row logged after the gap.
+        n (int): Number of rows to synthesise.
+        method (str): 'hold' repeats `last`, 'linear' interpolates towards
+            `current`.
+        step: Column indices that are always held.
+        event: Column indices that are zero in synthesised rows.
+        rotation: Indices of the (w, x, y, z) columns of a quaternion, which
+            'linear' interpolates with slerp so it stays unit length.
+
+    Returns:
+        np.ndarray: An (n, channels) array.
+    """
+    last = np.asarray(last, dtype=np.float64)
+    rows = np.repeat(last[None, :], n, axis=0)
+
+    if method == 'linear':
+        frac = np.arange(1, n + 1, dtype=np.float64)[:, None] / (n + 1)
+        rows += (np.asarray(current, dtype=np.float64) - last) * frac
+        if len(step):
+            rows[:, step] = last[step]
+        if len(rotation):
+            q0 = np.repeat(last[None, rotation], n, axis=0)
+            q1 = np.repeat(np.asarray(current, dtype=np.float64)[None, rotation], n, axis=0)
+            rows[:, rotation] = _slerp(q0, q1, frac[:, 0])
+    elif method != 'hold':
+        raise ValueError(f"unknown gap fill method {method!r}, use one of {METHODS}")
+
+    if len(event):
+        rows[:, event] = 0
+    return rows
+
+def _slerp(q0, q1, t):
+    # q0, q1: (n, 4), t: (n,)
+    dot = np.sum(q0 * q1, axis=1)
+    # take the short way round
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.abs(dot)
+
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin = np.sin(theta)
+    near = sin < 1e-6
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        w0 = np.where(near, 1 - t, np.sin((1 - t) * theta) / sin)
+        w1 = np.where(near, t, np.sin(t * theta) / sin)
+
+    q = q0 * w0[:, None] + q1 * w1[:, None]
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+def _interpolate(x, xp, columns, method, step, quaternions):
+    # index of the last real sample at or before each x
+    left = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, len(xp) - 1)
+    right = np.minimum(left + 1, len(xp) - 1)
+
+    span = (xp[right] - xp[left]).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = np.where(span > 0, (x - xp[left]) / span, 0.0)
+
+    in_quaternion = {name for q in quaternions for name in q}
+    out = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        if method == 'hold' or name in step or values.dtype.kind in 'biu' or name in in_quaternion:
+            out[name] = values[left]
+        else:
+            out[name] = values[left] + (values[right] - values[left]) * t
+
+    if method == 'linear':
+        for q in quaternions:
+            stacked = np.stack([np.asarray(columns[name], dtype=np.float64) for name in q], axis=1)
+            rotated = _slerp(stacked[left], stacked[right], t)
+            for i, name in enumerate(q):
+                out[name] = rotated[:, i].astype(np.asarray(columns[name]).dtype)
+
+    return out
+
+def resample(times, columns, freq, method='linear', step=STEP_COLUMNS, event=EVENT_COLUMNS, quaternions=(ROTATION,), start=None):
+    """Resamples columnar data onto an exact `freq` grid.
+
+    Columns are held or interpolated as in fill_rows. A non zero value of an
+    `event` column lands on the first grid point at or after its sample and
+    is zero everywhere else.
+
+    Args:
+        times: Sorted time of every sample in seconds.
+        columns (dict): Column name to array, one value per sample.
+        freq (float): Samples per second of the grid.
+        method (str): 'hold' or 'linear'.
+        step: Column names that are always held.
+        event: Column names that only mark the sample they were logged with.
+        quaternions: Tuples of (w, x, y, z) column names.
+        start (float): Time of the first grid point, the first of `times`
+            by default.
+
+    Returns:
+        tuple: (grid, columns) with the grid points up to the last of `times`.
+    """
+    if method not in METHODS:
+        raise ValueError(f"unknown gap fill method {method!r}, use one of {METHODS}")
+
+    times = np.asarray(times, dtype=np.float64)
+    start = times[0] if start is None and len(times) else start
+    n = int(np.floor((times[-1] - start) * freq + 1e-9)) + 1 if len(times) else 0
+    grid = start + np.arange(max(n, 0)) / freq
+    if not len(grid):
+        return grid, {name: np.asarray(values)[:0] for name, values in columns.items()}
+
+    quaternions = [q for q in quaternions if all(name in columns for name in q)]
+    out = _interpolate(grid, times, columns, method, set(step), quaternions)
+    for name in event:
+        if name in out:
+            values = np.asarray(columns[name])
+            marked = np.flatnonzero(values)
+            at = np.searchsorted(grid, times[marked] - 1e-9)
+            keep = at < len(grid)
+            out[name] = np.zeros_like(out[name])
+            out[name][at[keep]] = values[marked[keep]]
+    return grid, out
+
+class Resampler:
+    """resample() over consecutive blocks of rows logged one per tick.
+
+    The last row of a block is kept to interpolate up to the first row of
+    the next, so the blocks give the same grid as one call on all of them.
+    """
+
+    def __init__(self, names, freq, rate=TICK_RATE, method='linear'):
+        self.names = list(names)
+        self.freq = freq
+        self.rate = rate
+        self.method = method
+        self.ticks = 0
+        self.count = 0
+        self.last = None
+
+    def __call__(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        if not len(rows):
+            return np.empty((0, len(self.names)))
+        first = self.ticks
+        if self.last is not None:
+            last = self.last.copy()
+            # its events are marked already when a grid point fell on it
+            if self.count and abs((self.count - 1) / self.freq - (first - 1) / self.rate) < 1e-9:
+                for name in EVENT_COLUMNS:
+                    if name in self.names:
+                        last[self.names.index(name)] = 0
+            rows = np.vstack([last[None, :], rows])
+            first -= 1
+        times = (first + np.arange(len(rows))) / self.rate
+        self.ticks = first + len(rows)
+        self.last = rows[-1]
+
+        columns = {name: rows[:, i] for i, name in enumerate(self.names)}
+        grid, columns = resample(times, columns, self.freq, self.method, start=self.count / self.freq)
+        self.count += len(grid)
+        return np.column_stack([columns[name] for name in self.names]) if len(grid) else np.empty((0, len(self.names)))
@@ -1,19 +1,34 @@
 
 import math
+from functools import lru_cache
 
-def convert(x=None, z=None, latmid=52.83067304956695, longmid=-1.3740268265085214):
+# default origin GT7 world coordinates are placed at
+ORIGIN = (52.83067304956695, -1.3740268265085214)
 
-    # we consider lat to be z
-    # therefore long x
+@lru_cache(maxsize=64)
+def scale(latmid):
+    """Metres per degree of latitude and longitude around `latmid`."""
 
     # https://en.wikipedia.org/wiki/Geographic_coordinate_system#Length_of_a_degree
 
     latmid_rad = math.radians(latmid)
-    longmid_rad = math.radians(longmid)
 
     m_per_deg_lat = 111132.954 - (559.822 * math.cos( 2 * latmid_rad ) ) + ( 1.175 * math.cos( 4 * latmid_rad) ) - ( 0.0023 * math.cos( 6 * latmid_rad ))
     m_per_deg_lon = ( 111412.84 * math.cos( latmid_rad ) ) - (93.5 * math.cos( 3 * latmid_rad )) + (0.118 * math.cos( 5 * latmid_rad ))
 
+    return m_per_deg_lat, m_per_deg_lon
+
+def convert(x=None, z=None, latmid=ORIGIN[0], longmid=ORIGIN[1]):
+    """Converts world x and z in metres to (lat, long).
+
+    Works on scalars and on numpy arrays alike.
+    """
+
+    # we consider lat to be z
+    # therefore long x
+
+    m_per_deg_lat, m_per_deg_lon = scale(latmid)
+
     # z is lat, x is long
     dlat = z / m_per_deg_lat
     dlong = x / m_per_deg_lon
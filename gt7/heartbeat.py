@@ -0,0 +1,180 @@
+
+import asyncio
+import logging
+import time
+
+l = logging.getLogger(__name__)
+
+class LinkStats:
+    """Packet loss and arrival jitter of the telemetry stream.
+
+    Loss is counted from gaps in the packet tick, jitter is the RFC 3550
+    interarrival jitter: the smoothed difference between the spacing of
+    arrivals and the spacing of the ticks they carry.
+
+    A tick more than `reset_after` seconds behind the last one means the
+    console started counting again, after a restart or a new session, so
+    the count is picked up from there instead of the rest of the stream
+    being taken for reordered packets.
+    """
+
+    def __init__(self, freq=60, reset_after=2.0):
+        self.freq = freq
+        self.reset_after = reset_after
+        self.started = time.monotonic()
+        self.first_arrival = None
+        self.last_arrival = None
+        self.last_tick = None
+        self.tick_arrival = None
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.resets = 0
+        self.jitter = 0.0
+
+    @property
+    def time_to_first_packet(self):
+        if self.first_arrival is None:
+            return None
+        return self.first_arrival - self.started
+
+    @property
+    def loss(self):
+        total = self.received + self.lost
+        return self.lost / total if total else 0.0
+
+    def reset(self):
+        self.__init__(self.freq, self.reset_after)
+
+    def touch(self, arrival=None):
+        """Records an arrival whose tick is not known here.
+
+        Enough for Heartbeat to tell the stream is flowing, loss and jitter
+        need observe().
+        """
+        if arrival is None:
+            arrival = time.monotonic()
+        if self.first_arrival is None:
+            self.first_arrival = arrival
+        self.last_arrival = arrival
+
+    def observe(self, tick, arrival=None):
+        if arrival is None:
+            arrival = time.monotonic()
+
+        if self.first_arrival is None:
+            self.first_arrival = arrival
+            l.info(f"first packet {self.time_to_first_packet:.3f}s after start")
+
+        # any packet shows the stream is flowing, late ones too
+        self.last_arrival = arrival
+
+        last_tick = self.last_tick
+        if last_tick is not None:
+            step = tick - last_tick
+            if step <= -self.reset_after * self.freq:
+                self.resets += 1
+                l.info(f"tick went back from {last_tick} to {tick}, counting from there")
+            elif step <= 0:
+                # duplicate or late packet, the gap it fills was already counted
+                self.reordered += 1
+                return
+            else:
+                self.lost += step - 1
+
+                d = (arrival - self.tick_arrival) - step / self.freq
+                self.jitter += (abs(d) - self.jitter) / 16
+
+        self.received += 1
+        self.last_tick = tick
+        # jitter compares with the arrival of the packet that set last_tick
+        self.tick_arrival = arrival
+
+    def snapshot(self):
+        return {
+            "time_to_first_packet": self.time_to_first_packet,
+            "received": self.received,
+            "lost": self.lost,
+            "reordered": self.reordered,
+            "resets": self.resets,
+            "loss": self.loss,
+            "jitter": self.jitter,
+        }
+
+class Heartbeat:
+    """Keeps the console streaming by sending it heartbeats.
+
+    While packets are flowing a heartbeat goes out every `interval` seconds.
+    Before the first packet, or once nothing has arrived for
+    `stall_timeout` seconds, they are sent every `retry_interval` instead so
+    the stream starts (or restarts) as soon as the console listens.
+    """
+
+    def __init__(self, ps_ip, port=33739, interval=1.5, retry_interval=0.25,
+                 stall_timeout=0.5, payload=b"A", stats=None):
+        self.ps_ip = ps_ip
+        self.port = port
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.stall_timeout = stall_timeout
+        self.payload = payload
+        self.stats = stats or LinkStats()
+        self.transport = None
+        self.task = None
+        self.last_sent = 0.0
+        self.sent = 0
+        self.stalled = False
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol,
+            remote_addr=(self.ps_ip, self.port),
+        )
+        self.stats.started = time.monotonic()
+        self.task = asyncio.create_task(self._run())
+        l.info(f"Sending heartbeats to {self.ps_ip}:{self.port}")
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+        if self.transport:
+            self.transport.close()
+
+    def send(self):
+        self.transport.sendto(self.payload)
+        self.last_sent = time.monotonic()
+        self.sent += 1
+
+    def _flowing(self, now):
+        last = self.stats.last_arrival
+        flowing = last is not None and now - last < self.stall_timeout
+
+        if last is not None and flowing == self.stalled:
+            self.stalled = not flowing
+            if self.stalled:
+                l.info(f"telemetry stalled, link stats: {self.stats.snapshot()}")
+            else:
+                l.info("telemetry resumed")
+        return flowing
+
+    async def _run(self):
+        try:
+            while True:
+                now = time.monotonic()
+                flowing = self._flowing(now)
+
+                due = self.interval if flowing else self.retry_interval
+                wait = self.last_sent + due - now
+                if wait <= 0:
+                    self.send()
+                    continue
+
+                if flowing:
+                    # wake up when the stream would count as stalled
+                    wait = min(wait, self.stats.last_arrival + self.stall_timeout - now)
+                await asyncio.sleep(max(wait, 0.001))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            l.error(f"Error sending heartbeat: {e}")
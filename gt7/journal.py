@@ -0,0 +1,224 @@
+
+import json
+import logging
+import os
+import shutil
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from .writer.ld_stream import LDStreamWriter, DTYPE
+
+l = logging.getLogger(__name__)
+
+MAGIC = 0x4A375447
+
+# MAGIC SEQUENCE ROWS COLUMNS CRC32, then rows * columns float32 in column order
+SEGMENT = struct.Struct("<IIIII")
+
+META_FILE = "meta.json"
+SEGMENTS_FILE = "segments"
+
+def _channels(channels):
+    names, units = [], []
+    for c in channels:
+        if isinstance(c, dict):
+            names.append(c.get("name"))
+            units.append(c.get("units", ""))
+        else:
+            names.append(c)
+            units.append("")
+    return names, units
+
+def read_segments(directory, columns, data=True):
+    """Yields the (rows, columns) blocks of a journal in order.
+
+    Stops at the first segment that is cut short or fails its checksum,
+    which is where the logger was when it died. With data=False only the
+    headers are read and the row count of each segment is yielded.
+    """
+    path = os.path.join(directory, SEGMENTS_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        end = os.fstat(f.fileno()).st_size
+        seq = 0
+        while True:
+            head = f.read(SEGMENT.size)
+            if not head:
+                return
+            if len(head) < SEGMENT.size:
+                l.warning(f"{path}: segment {seq} is cut short, dropping it")
+                return
+            magic, n, rows, cols, crc = SEGMENT.unpack(head)
+            size = rows * cols * DTYPE.itemsize
+            if magic != MAGIC or n != seq or cols != columns:
+                l.warning(f"{path}: segment {seq} has a bad header, dropping the rest")
+                return
+            if f.tell() + size > end:
+                l.warning(f"{path}: segment {seq} is cut short, dropping it")
+                return
+            if not data:
+                f.seek(size, os.SEEK_CUR)
+                yield rows
+            else:
+                payload = f.read(size)
+                if zlib.crc32(payload) != crc:
+                    l.warning(f"{path}: segment {seq} fails its checksum, dropping the rest")
+                    return
+                yield np.frombuffer(payload, dtype=DTYPE).reshape((rows, cols), order="F")
+            seq += 1
+
+class Journal:
+    """Logs a session as an append-only journal of fixed size segments.
+
+    Used instead of LDStreamWriter for endurance sessions. Every block
+    appended becomes one segment on disk, written once and never moved,
+    so memory stays bounded by the segment size however long the session
+    runs. The event and laps live in a small metadata file next to the
+    segments, replaced atomically when they change.
+
+    close() assembles the .ld from the segments and removes the journal.
+    A journal left behind by a crash is assembled by recover() instead,
+    up to the last segment that made it to disk.
+    """
+
+    def __init__(self, directory, path, channels, freq=60, sync=True):
+        self.path = path
+        self.freq = freq
+        self.names, self.units = _channels(channels)
+        self.event = {}
+        self.laps = []
+        self.laptimes = []
+        self.count = 0
+        self.seq = 0
+        self.sync = sync
+
+        name = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}-{id(self):x}"
+        self.directory = os.path.join(directory, name + ".journal")
+        os.makedirs(self.directory)
+        self.fd = os.open(os.path.join(self.directory, SEGMENTS_FILE), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._write_meta()
+
+    def _meta(self):
+        return {
+            "path": self.path,
+            "freq": self.freq,
+            "names": self.names,
+            "units": self.units,
+            "event": self.event,
+            "laps": self.laps,
+            "laptimes": self.laptimes,
+        }
+
+    def _write_meta(self):
+        meta = self._meta()
+        tmp = os.path.join(self.directory, META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, META_FILE))
+
+    def append(self, block):
+        """Writes a (samples, channels) block as the next segment."""
+        data = np.asarray(block, dtype=DTYPE)
+        if not len(data):
+            return
+        payload = np.asfortranarray(data).tobytes(order="F")
+        os.write(self.fd, SEGMENT.pack(MAGIC, self.seq, len(data), len(self.names), zlib.crc32(payload)) + payload)
+        if self.sync:
+            os.fsync(self.fd)
+        self.seq += 1
+        self.count += len(data)
+
+    def add_lap(self, time, laptime):
+        self.laps.append(time)
+        self.laptimes.append(laptime)
+        self._write_meta()
+
+    def update_event(self, event):
+        self.event = dict(event)
+        self._write_meta()
+
+    def detach(self):
+        """Closes the journal here and returns the state resume() needs to finish it elsewhere."""
+        os.close(self.fd)
+        self.fd = None
+        state = dict(vars(self))
+        state["journal"] = True
+        return state
+
+    @classmethod
+    def resume(cls, state):
+        self = cls.__new__(cls)
+        self.__dict__.update(state)
+        del self.journal
+        self.fd = os.open(os.path.join(self.directory, SEGMENTS_FILE), os.O_WRONLY | os.O_APPEND)
+        return self
+
+    def close(self, event=None):
+        """Assembles the .ld from the segments and removes the journal."""
+        if self.fd is None:
+            return
+        if event is not None:
+            self.update_event(event)
+        os.close(self.fd)
+        self.fd = None
+        if self.count:
+            assemble(self.directory, self._meta())
+        shutil.rmtree(self.directory)
+
+def assemble(directory, meta):
+    """Writes the .ld of a journal one segment at a time, returns the sample count."""
+    names = meta["names"]
+    count = sum(read_segments(directory, len(names), data=False))
+    if not count:
+        return 0
+
+    channels = [{"name": n, "units": u} for n, u in zip(names, meta["units"])]
+    os.makedirs(os.path.dirname(meta["path"]) or ".", exist_ok=True)
+    # one extent sized for the whole session, nothing is moved while writing
+    writer = LDStreamWriter(meta["path"], channels, freq=meta["freq"], capacity=count)
+    try:
+        for block in read_segments(directory, len(names)):
+            writer.append(block)
+        for time, laptime in zip(meta["laps"], meta["laptimes"]):
+            if time * meta["freq"] <= count:
+                writer.add_lap(time, laptime)
+    finally:
+        writer.close(meta["event"])
+    return writer.count
+
+def recover(directory):
+    """Assembles the journals left in `directory` by a logger that died.
+
+    Returns the paths of the .ld files written. A journal is only removed
+    once its .ld is complete, so an interrupted recovery runs again.
+    """
+    recovered = []
+    if not os.path.isdir(directory):
+        return recovered
+
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.name.endswith(".journal") or not entry.is_dir():
+            continue
+        try:
+            with open(os.path.join(entry.path, META_FILE)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            l.error(f"can not recover {entry.path}: {e}")
+            continue
+        try:
+            count = assemble(entry.path, meta)
+        except Exception as e:
+            l.error(f"can not recover {entry.path}: {e}")
+            continue
+        if count:
+            l.info(f"recovered {count} samples to {meta['path']}")
+            recovered.append(meta["path"])
+        shutil.rmtree(entry.path)
+    return recovered
@@ -0,0 +1,334 @@
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from .writer.ld_stream import HEAD, EVENT, CHANNEL
+
+l = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    name TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL,
+    started_at TEXT,
+    driver TEXT,
+    vehicle TEXT,
+    venue TEXT,
+    event TEXT,
+    session TEXT,
+    comment TEXT,
+    channels INTEGER,
+    freq INTEGER,
+    samples INTEGER,
+    duration REAL,
+    laps INTEGER,
+    best_lap REAL
+);
+CREATE INDEX IF NOT EXISTS logs_started_at ON logs(started_at);
+CREATE INDEX IF NOT EXISTS logs_venue ON logs(venue, started_at);
+CREATE INDEX IF NOT EXISTS logs_vehicle ON logs(vehicle, started_at);
+CREATE INDEX IF NOT EXISTS logs_driver ON logs(driver, started_at);
+"""
+
+COLUMNS = (
+    "name", "size", "mtime", "started_at", "driver", "vehicle", "venue", "event", "session",
+    "comment", "channels", "freq", "samples", "duration", "laps", "best_lap",
+)
+
+FILTERS = ("driver", "vehicle", "venue", "session")
+SORTS = ("started_at", "mtime", "size", "duration", "laps", "best_lap", "name")
+
+def _text(value):
+    return value.split(b"\0", 1)[0].decode("ascii", "replace").strip()
+
+def read_ld(path):
+    """The event details, channel count, rate and length in an .ld header."""
+    with open(path, "rb") as f:
+        head = f.read(HEAD.size)
+        if len(head) < HEAD.size:
+            raise ValueError(f"{path} is not an .ld file")
+        (marker, meta_ptr, _, event_ptr, _, _, _, _, _, _, _, channels,
+         date, time, driver, vehicle, venue, _, shortcomment) = HEAD.unpack(head)
+        if marker != 0x40:
+            raise ValueError(f"{path} is not an .ld file")
+
+        info = {"driver": _text(driver), "vehicle": _text(vehicle), "venue": _text(venue),
+                "channels": channels, "comment": _text(shortcomment)}
+        try:
+            then = datetime.strptime(f"{_text(date)} {_text(time)}", "%d/%m/%Y %H:%M:%S")
+            info["started_at"] = then.strftime("%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            info["started_at"] = None
+
+        f.seek(event_ptr)
+        event = f.read(EVENT.size)
+        if event_ptr and len(event) == EVENT.size:
+            name, session, comment, _ = EVENT.unpack(event)
+            info.update(event=_text(name), session=_text(session))
+            info["comment"] = _text(comment) or info["comment"]
+
+        f.seek(meta_ptr)
+        channel = f.read(CHANNEL.size)
+        info["freq"] = info["samples"] = 0
+        if channels and len(channel) == CHANNEL.size:
+            fields = CHANNEL.unpack(channel)
+            info["samples"], info["freq"] = fields[3], fields[7]
+        info["duration"] = info["samples"] / info["freq"] if info["freq"] else 0.0
+        return info
+
+def _laptime(text):
+    minutes, _, seconds = text.rpartition(":")
+    return int(minutes or 0) * 60 + float(seconds)
+
+def read_ldx(path):
+    """The lap count and best lap from the .ldx next to an .ld, if there is one."""
+    ldx = os.path.splitext(path)[0] + ".ldx"
+    try:
+        root = ET.parse(ldx).getroot()
+    except (OSError, ET.ParseError):
+        return {"laps": 0, "best_lap": None}
+
+    details = {s.get("Id"): s.get("Value") for s in root.iter("String")}
+    laps = sum(1 for _ in root.iter("Marker"))
+    try:
+        best = _laptime(details["Fastest Time"])
+    except (KeyError, ValueError):
+        best = None
+    return {"laps": int(details.get("Total Laps") or laps), "best_lap": best}
+
+def parse_range(header, size):
+    """The (start, end) bytes, end inclusive, of a Range header on a file of `size` bytes.
+
+    None means the whole file: there is no header, or it asks for several
+    ranges, which may be answered with the whole file. Raises ValueError
+    when the range lies past the end of the file.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if not first:
+            # the last `last` bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        raise ValueError(f"bad range {header!r}")
+    if start >= size or start > end:
+        raise ValueError(f"range {header!r} not satisfiable for {size} bytes")
+    return start, end
+
+class LogLibrary:
+    """Index of the .ld files under `directory`, kept in SQLite.
+
+    Every file is read once, its header and .ldx, and looked up from the
+    index afterwards. The index follows the directory through inotify,
+    see gt7/watch.py, so only files that change are read again. A full
+    scan, comparing sizes and modification times with the index, runs at
+    start and whenever inotify may have missed events. Subdirectories,
+    the per console ones of gt7/multi.py, are watched as well.
+    """
+
+    def __init__(self, directory, db_file=":memory:", debounce=0.5):
+        self.directory = os.path.abspath(directory)
+        self.db_file = db_file
+        self.debounce = debounce
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.watchers = {}
+        self.loop = None
+
+    def close(self):
+        self.stop()
+        with self.lock:
+            self.conn.close()
+
+    def _name(self, path):
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+    def path(self, name):
+        return os.path.join(self.directory, *name.split("/"))
+
+    def _files(self, top=None):
+        for root, dirs, files in os.walk(top or self.directory):
+            dirs.sort()
+            for f in files:
+                if f.endswith(".ld"):
+                    yield os.path.join(root, f)
+
+    def _walk(self, top):
+        # the directories under top and the .ld files in them, run in a thread
+        return [root for root, _, _ in os.walk(top)], list(self._files(top))
+
+    def _row(self, name, st):
+        row = {"name": name, "size": st.st_size, "mtime": st.st_mtime}
+        path = self.path(name)
+        row.update(read_ld(path))
+        row.update(read_ldx(path))
+        return row
+
+    def _store(self, rows, removed=()):
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO logs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [tuple(row.get(c) for c in COLUMNS) for row in rows],
+                )
+                self.conn.executemany("DELETE FROM logs WHERE name = ?", [(name,) for name in removed])
+
+    def _read(self, query, params=()):
+        with self.lock:
+            cursor = self.conn.execute(query, params)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def scan(self):
+        """Brings the index in line with the directory, returns (updated, removed) counts."""
+        known = {row["name"]: (row["size"], row["mtime"]) for row in self._read("SELECT name, size, mtime FROM logs")}
+        rows = []
+        for path in self._files():
+            name = self._name(path)
+            try:
+                st = os.stat(path)
+                if known.pop(name, None) != (st.st_size, st.st_mtime):
+                    rows.append(self._row(name, st))
+            except (OSError, ValueError) as e:
+                l.warning(f"not indexing {name}: {e}")
+        self._store(rows, known)
+        if rows or known:
+            l.info(f"indexed {len(rows)} logs, removed {len(known)}")
+        return len(rows), len(known)
+
+    def refresh(self, paths):
+        """Indexes the given .ld files again, or drops them when they are gone."""
+        rows, removed = [], []
+        for path in paths:
+            name = self._name(path)
+            try:
+                rows.append(self._row(name, os.stat(path)))
+            except FileNotFoundError:
+                removed.append(name)
+            except (OSError, ValueError) as e:
+                l.warning(f"not indexing {name}: {e}")
+        self._store(rows, removed)
+
+    def query(self, limit=50, offset=0, search=None, since=None, until=None,
+              sort="started_at", descending=True, include_empty=False, **filters):
+        """A page of the index, newest first, with the number of matches as `total`.
+
+        `filters` match driver, vehicle, venue or session exactly, `search`
+        any of them or the file name in part. `since` and `until` bound the
+        start time, as ISO 8601.
+        """
+        where, params = [], []
+        for key, value in filters.items():
+            if key not in FILTERS:
+                raise ValueError(f"can not filter on {key}")
+            if value:
+                where.append(f"{key} = ?")
+                params.append(value)
+        if search:
+            where.append("(" + " OR ".join(f"{c} LIKE ?" for c in ("name", *FILTERS)) + ")")
+            params.extend([f"%{search}%"] * (len(FILTERS) + 1))
+        if since:
+            where.append("started_at >= ?")
+            params.append(since)
+        if until:
+            where.append("started_at < ?")
+            params.append(until)
+        if not include_empty:
+            where.append("samples > 0")
+        if sort not in SORTS:
+            raise ValueError(f"can not sort on {sort}")
+
+        clause = f" WHERE {' AND '.join(where)}" if where else ""
+        total = self._read(f"SELECT COUNT(*) AS n FROM logs{clause}", params)[0]["n"]
+        items = self._read(
+            f"SELECT * FROM logs{clause} ORDER BY {sort} {'DESC' if descending else 'ASC'}, name LIMIT ? OFFSET ?",
+            (*params, limit, offset),
+        )
+        return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+    def get(self, name):
+        rows = self._read("SELECT * FROM logs WHERE name = ?", (name,))
+        return rows[0] if rows else None
+
+    async def start(self):
+        """Indexes what changed since the last run and follows the directory from then on."""
+        self.loop = asyncio.get_running_loop()
+        os.makedirs(self.directory, exist_ok=True)
+        # watched before the scan so nothing written meanwhile is missed
+        roots, _ = await asyncio.to_thread(self._walk, self.directory)
+        for root in roots:
+            await self._watch(root)
+        await asyncio.to_thread(self.scan)
+
+    async def _watch(self, directory):
+        from .watch import DirectoryWatcher
+
+        if directory in self.watchers:
+            return
+        watcher = DirectoryWatcher(directory, lambda names: self._changed(directory, names), debounce=self.debounce)
+        self.watchers[directory] = watcher
+        await watcher.start()
+
+    def _changed(self, directory, names):
+        self.loop.create_task(self._update(directory, names))
+
+    async def _update(self, directory, names):
+        if names is None:
+            await asyncio.to_thread(self.scan)
+            return
+        paths = set()
+        rescan = False
+        for name in names:
+            path = os.path.join(directory, name)
+            if name.endswith((".ld", ".ldx")):
+                paths.add(os.path.splitext(path)[0] + ".ld")
+            elif os.path.isdir(path):
+                # a new console directory, or one moved in with its logs;
+                # only that directory is walked, and not on the loop
+                await self._watch(path)
+                roots, files = await asyncio.to_thread(self._walk, path)
+                for root in roots:
+                    await self._watch(root)
+                paths.update(files)
+            elif path in self.watchers:
+                # a directory went away, drop whatever was indexed under it
+                self.watchers.pop(path).stop()
+                rescan = True
+        if rescan:
+            await asyncio.to_thread(self.scan)
+        elif paths:
+            await asyncio.to_thread(self.refresh, paths)
+
+    def stop(self):
+        for watcher in self.watchers.values():
+            watcher.stop()
+        self.watchers = {}
+
+def read_file(path, start, end, chunk_size=64 * 1024):
+    """Yields bytes `start` to `end` of a file, end inclusive."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        offset = start
+        while offset <= end:
+            data = os.pread(fd, min(chunk_size, end + 1 - offset), offset)
+            if not data:
+                break
+            offset += len(data)
+            yield data
+    finally:
+        os.close(fd)
@@ -0,0 +1,189 @@
+
+import os
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+DEFAULT_NAME = "gt7-live"
+
+MAGIC = 0x4C375447
+VERSION = 2
+
+# magic, version, payload size, the sequence counter on its own 8 bytes,
+# then the pid of the writer
+HEADER = struct.Struct("<IHHQI4x")
+SEQ = struct.Struct("<Q")
+SEQ_OFFSET = 8
+PID = struct.Struct("<I")
+PID_OFFSET = 16
+
+FIELDS = (
+    ("timestamp", "d"),
+    ("tick", "i"),
+    ("current_lap", "h"),
+    ("laps", "h"),
+    ("last_laptime", "d"),
+    ("best_laptime", "d"),
+    ("speed", "f"),
+    ("rpm", "f"),
+    ("gear", "B"),
+    ("suggested_gear", "B"),
+    ("throttle", "B"),
+    ("brake", "B"),
+    ("clutch", "f"),
+    ("fuel", "f"),
+    ("fuel_capacity", "f"),
+    ("x", "f"),
+    ("y", "f"),
+    ("z", "f"),
+    ("race_position", "h"),
+    ("opponents", "h"),
+    ("car_code", "i"),
+    ("in_race", "?"),
+    ("paused", "?"),
+    ("imperial", "?"),
+)
+NAMES = tuple(name for name, _ in FIELDS)
+LAYOUT = struct.Struct("<" + "".join(fmt for _, fmt in FIELDS))
+SIZE = HEADER.size + LAYOUT.size
+
+def _attach(name):
+    # the writer owns the block, a reader must not unlink it when it exits
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # before Python 3.13 every attach is tracked, and unregistering
+    # afterwards would also drop the writer's entry when both processes
+    # share a resource tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def owner(name=DEFAULT_NAME):
+    """The pid of the process writing block `name`, None when nothing does."""
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return None
+    try:
+        if len(shm.buf) < HEADER.size:
+            return None
+        magic, version, _, _, pid = HEADER.unpack_from(shm.buf)
+    finally:
+        shm.close()
+    if (magic, version) != (MAGIC, VERSION) or not pid or not _alive(pid):
+        return None
+    return pid
+
+class LiveState:
+    """The latest packet in a fixed layout block of shared memory.
+
+    One writer updates the block in place, any number of local readers take
+    consistent copies of it without locks or syscalls. The block is a
+    seqlock: the writer makes the sequence counter odd, writes the fields
+    and makes it even again, a reader copies the fields and retries when
+    the counter was odd or changed meanwhile.
+
+        live = LiveState.create()            # in the logger
+        live.publish(timestamp, packet)
+
+        live = LiveState.attach()            # anywhere else
+        live.read()                          # {'rpm': ..., ...} or None
+
+    The header holds the pid of the writer. create() replaces a block left
+    behind by a process that is gone, and refuses one that is still being
+    written, so two loggers can not take the same name from each other.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+        self.seq = SEQ.unpack_from(self.buf, SEQ_OFFSET)[0] & ~1
+
+    @classmethod
+    def create(cls, name=DEFAULT_NAME):
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+        except FileExistsError:
+            pid = owner(name)
+            if pid is not None:
+                raise FileExistsError(f"{name} is in use by process {pid}")
+            # left behind by a logger that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=SIZE)
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, LAYOUT.size, 0, os.getpid())
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Opens the block of a running logger, FileNotFoundError without one."""
+        shm = _attach(name)
+        if len(shm.buf) < HEADER.size:
+            shm.close()
+            raise ValueError(f"{name} is not a live state block")
+        magic, version, size, _, _ = HEADER.unpack_from(shm.buf)
+        if (magic, version, size) != (MAGIC, VERSION, LAYOUT.size):
+            shm.close()
+            raise ValueError(f"{name} has an unknown layout (version {version})")
+        return cls(shm)
+
+    def write(self, *values):
+        """Writes the fields in FIELDS order."""
+        buf = self.buf
+        seq = self.seq + 1
+        SEQ.pack_into(buf, SEQ_OFFSET, seq)
+        LAYOUT.pack_into(buf, HEADER.size, *values)
+        self.seq = seq + 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)
+
+    def publish(self, timestamp, p, imperial=False):
+        x, y, z = p.position
+        self.write(
+            timestamp, p.tick, p.current_lap, p.laps,
+            p.last_laptime / 1000.0, p.best_laptime / 1000.0,
+            p.speed * (2.23693629 if imperial else 3.6), p.rpm,
+            p.gear, p.suggested_gear, p.throttle, p.brake, p.clutch,
+            p.current_fuel, p.fuel_capacity, x, y, z,
+            p.race_position, p.opponents, p.car_code,
+            p.in_race, p.paused, imperial,
+        )
+
+    def snapshot(self, retries=1000):
+        """(sequence, values) of a consistent copy, None if the writer kept it busy."""
+        buf = self.buf
+        for _ in range(retries):
+            before = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if before & 1:
+                continue
+            values = LAYOUT.unpack_from(buf, HEADER.size)
+            if SEQ.unpack_from(buf, SEQ_OFFSET)[0] == before:
+                return before, values
+        return None
+
+    def read(self):
+        """The latest values by name, None before the first packet."""
+        snapshot = self.snapshot()
+        if snapshot is None or not snapshot[0]:
+            return None
+        return dict(zip(NAMES, snapshot[1]))
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -3,13 +3,21 @@ import logging
 
 l = logging.getLogger(__name__)
 
+def _event_dict(event):
+    return dict(event) if isinstance(event, dict) else dict(vars(event))
+
 class BaseLogger:
-    def __init__(self, rawfile=None, sampler=None, filetemplate=None, imperial=False):
+    def __init__(self, rawfile=None, sampler=None, filetemplate=None, imperial=False,
+                 journal_dir=None, segment_size=1024):
         self.rawfile = rawfile
         self.sampler = sampler
         self.filetemplate = filetemplate
         self.imperial = imperial
         self.log = None
+        # with a journal directory, samples are spilled to disk every
+        # `segment_size` rows instead of piling up in memory, see gt7/journal.py
+        self.journal_dir = journal_dir
+        self.segment_size = segment_size
 
     def new_log(self, channels, event):
         l.info(f"Creating new log file for event: {event}")
@@ -18,25 +26,47 @@ class BaseLogger:
         self.log = {
             "event": event,
             "channels": channels,
-            "samples": []
+            "samples": [],
+            "journal": None,
         }
+        if self.journal_dir and self.filetemplate:
+            from .journal import Journal
+
+            freq = self.sampler.freq if self.sampler else 60
+            path = self.filetemplate.format(**_event_dict(event)).replace(":", "-")
+            journal = Journal(self.journal_dir, path, channels, freq=freq)
+            journal.update_event(_event_dict(event))
+            self.log["journal"] = journal
 
     def add_samples(self, samples):
         if self.log:
             self.log["samples"].append(samples)
+            if self.log["journal"] and len(self.log["samples"]) >= self.segment_size:
+                self._spill()
+
+    def _spill(self):
+        if self.log["samples"]:
+            self.log["journal"].append(self.log["samples"])
+            self.log["samples"] = []
 
     def add_lap(self, laptime, lap):
         if self.log:
             l.info(f"Adding new lap: {lap} with time: {laptime}")
-            # In a real implementation, this would add a lap marker to the log file.
-            pass
+            journal = self.log["journal"]
+            if journal:
+                journal.add_lap((journal.count + len(self.log["samples"])) / journal.freq, laptime)
 
     def save_log(self):
         if self.log:
             l.info(f"Saving log file for event: {self.log['event']}")
-            # In a real implementation, this would save the log file to disk.
+            journal = self.log["journal"]
+            if journal:
+                self._spill()
+                journal.close(_event_dict(self.log["event"]))
             self.log = None
 
     def update_event(self, event):
         if self.log:
             self.log["event"] = event
+            if self.log["journal"]:
+                self.log["journal"].update_event(_event_dict(event))
@@ -0,0 +1,186 @@
+
+import asyncio
+import time
+from bisect import bisect_left
+
+# 50us to 1s, roughly three buckets per decade
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.0002, 0.0005,
+    0.001, 0.002, 0.005,
+    0.01, 0.02, 0.05,
+    0.1, 0.2, 0.5, 1.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGES = ('receive', 'decrypt', 'unpack', 'process', 'enqueue', 'broadcast')
+
+def _escape(value):
+    # console names come from the config, the text format needs these escaped
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+def _number(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+class Histogram:
+    """Fixed bucket histogram, observe() is a bisect and two additions."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile `q`."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+
+class Family:
+    def __init__(self, kind, name, help, factory=None, func=None, label=None):
+        self.kind = kind
+        self.name = name
+        self.help = help
+        self.factory = factory
+        self.func = func
+        self.label = label
+        self.children = {}
+
+    def labels(self, **labels):
+        key = tuple(sorted(labels.items()))
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self.factory()
+        return child
+
+    def samples(self):
+        if self.func is not None:
+            value = self.func()
+            if self.label:
+                # several labels come as a tuple, with tuple keys
+                labels = self.label if isinstance(self.label, tuple) else (self.label,)
+                for key, v in value.items():
+                    key = key if isinstance(key, tuple) else (key,)
+                    yield self.name, tuple(zip(labels, key)), v
+            else:
+                yield self.name, (), value
+            return
+
+        for key, child in self.children.items():
+            if isinstance(child, Histogram):
+                cumulative = 0
+                for bound, count in zip(child.bounds + (float("inf"),), child.counts):
+                    cumulative += count
+                    yield self.name + "_bucket", key + (("le", _number(bound)),), cumulative
+                yield self.name + "_sum", key, child.sum
+                yield self.name + "_count", key, cumulative
+            else:
+                yield self.name, key, child.value
+
+class Registry:
+    """Metrics in the Prometheus text format, without the client library.
+
+    Hot path code keeps a reference to a child (a Counter or Histogram)
+    and updates it directly. Gauges are callbacks evaluated on scrape.
+    Registering a name again replaces the earlier metric. Metrics of other
+    processes are added with a collector, which returns them in the form
+    of collect().
+    """
+
+    def __init__(self):
+        self.families = {}
+        self.collectors = {}
+        self.enabled = True
+
+    def counter(self, name, help):
+        family = self.families[name] = Family("counter", name, help, Counter)
+        return family
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        family = self.families[name] = Family("histogram", name, help, lambda: Histogram(buckets))
+        return family
+
+    def gauge(self, name, help, func, label=None):
+        """A gauge read from `func()` on scrape.
+
+        With `label`, func returns {label value: sample}, or with a tuple
+        of labels {(value, value, ...): sample}.
+        """
+        self.families[name] = Family("gauge", name, help, func=func, label=label)
+
+    def collector(self, name, func):
+        """Adds the families `func()` returns to every scrape."""
+        self.collectors[name] = func
+
+    def collect(self):
+        """Every family as (kind, name, help, samples), picklable for another process."""
+        families = []
+        for family in self.families.values():
+            try:
+                samples = list(family.samples())
+            except Exception:
+                # a gauge whose source has gone away
+                continue
+            families.append((family.kind, family.name, family.help, samples))
+        return families
+
+    def render(self):
+        merged = {}
+        for source in (self.collect, *self.collectors.values()):
+            try:
+                families = source()
+            except Exception:
+                continue
+            for kind, name, help, samples in families:
+                merged.setdefault(name, (kind, help, []))[2].extend(samples)
+
+        lines = []
+        for family, (kind, help, samples) in merged.items():
+            lines.append(f"# HELP {family} {help}")
+            lines.append(f"# TYPE {family} {kind}")
+            for name, key, value in samples:
+                lines.append(f"{name}{_labels(key)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Registry()
+
+stage_seconds = METRICS.histogram("gt7_stage_seconds", "Time spent per packet in each ingest stage, receive is the time queued before it")
+STAGE = {stage: stage_seconds.labels(stage=stage) for stage in STAGES}
+
+packets = METRICS.counter("gt7_packets_total", "Datagrams handed to the logger").labels()
+invalid = METRICS.counter("gt7_packets_invalid_total", "Datagrams that failed to decrypt").labels()
+gap_rows = METRICS.counter("gt7_gap_filled_rows_total", "Rows synthesised for missing ticks").labels()
+gaps_skipped = METRICS.counter("gt7_gaps_skipped_total", "Gaps longer than max_gap left unfilled").labels()
+
+sample_age = METRICS.histogram("gt7_sample_age_seconds", "Time from receiving a sample to a consumer taking it")
+loop_lag = METRICS.histogram("gt7_event_loop_lag_seconds", "How late the event loop woke up a sleeping task").labels()
+
+async def monitor_loop(interval=0.25):
+    """Measures event loop lag for as long as it runs."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        loop_lag.observe(max(time.perf_counter() - start - interval, 0.0))
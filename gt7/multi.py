@@ -0,0 +1,290 @@
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from .heartbeat import Heartbeat, LinkStats
+from .sampler import AsyncGT7Sampler
+
+l = logging.getLogger(__name__)
+
+def consoles_from_config(config):
+    """The `consoles` list of config.yml with a name and index for each.
+
+    Entries are an address or a dict with `ip` and optionally `name`,
+    `driver`, `vehicle`, `session` and `filetemplate`.
+    """
+    consoles = []
+    for i, entry in enumerate(config.get('consoles') or ()):
+        console = {'ip': entry} if isinstance(entry, str) else dict(entry)
+        console.setdefault('name', f"console{i + 1}")
+        console['index'] = i
+        consoles.append(console)
+    return consoles
+
+def logger_options(config, console):
+    """GT7Logger arguments for one console, its own files and live state."""
+    directory = os.path.dirname(config.get('log_output_path', './logs/session.ld')) or "."
+    live = config.get('live_state', 'gt7-live')
+    return dict(
+        filetemplate=console.get('filetemplate') or os.path.join(directory, console['name'], "{datetime}.ld"),
+        driver=console.get('driver', ""),
+        vehicle=console.get('vehicle', ""),
+        session=console.get('session', ""),
+        config=config,
+        replay=config.get('replay', False),
+        gap_fill=config.get('gap_fill', 'hold'),
+        max_gap=config.get('max_gap', 60),
+        derived=config.get('derived_channels', True),
+        live=f"{live}-{console['name']}" if live else None,
+        endurance=config.get('endurance'),
+        console=console['name'],
+    )
+
+def _worker(consoles, config, db_file, jobs, reports, report_interval=1.0):
+    # the parent stops the workers with a sentinel once the socket is closed
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s')
+
+    from .metrics import METRICS
+    from .telemetry import GT7Logger
+
+    METRICS.enabled = config.get('metrics', True)
+    next_report = 0.0
+
+    db = None
+    if db_file:
+        from .database import Database
+        db = Database(db_file=db_file)
+        db.create_tables()
+
+    loggers = {}
+    laps = {}
+    for console in consoles:
+        logger = GT7Logger(**logger_options(config, console))
+        logger.link = LinkStats()
+        loggers[console['index']] = logger
+        laps[console['index']] = logger.bus.subscribe("database", topics=("lap",))
+
+    while True:
+        try:
+            batch = jobs.get(timeout=report_interval)
+        except queue.Empty:
+            # idle, the metrics still go out
+            batch = ()
+        if batch is None:
+            break
+        for index, timestamp, data in batch:
+            logger = loggers[index]
+            try:
+                logger.process_sample(timestamp, data)
+            except Exception as e:
+                l.error(f"error processing telemetry of console {index}: {e}")
+        if db:
+            for index, sub in laps.items():
+                while sub.lag:
+                    _, (_, lap) = sub.get_nowait()
+                    db.insert_session(loggers[index].lap_record(lap))
+        # the metrics of this process, for the parent to serve
+        now = time.monotonic()
+        if METRICS.enabled and now >= next_report:
+            next_report = now + report_interval
+            try:
+                reports.put_nowait(METRICS.collect())
+            except queue.Full:
+                pass
+
+    for console in consoles:
+        logger = loggers[console['index']]
+        logger.close()
+        l.info(f"{console['name']}: link stats {logger.link.snapshot()}, saved {logger.saved}")
+    if db:
+        db.close()
+
+class MultiIngest:
+    """Logs several consoles sending telemetry to one port.
+
+    Datagrams are told apart by their source address and passed, a batch
+    per wakeup of the event loop, to a pool of worker processes. Each
+    console belongs to one worker, which decrypts and logs it with a
+    GT7Logger of its own, so every car gets its own .ld files and live
+    state (`live_state` suffixed with the console name) and the work
+    spreads over `workers` cores. The heartbeats go out from here, one per
+    console.
+
+    At most `maxsize` batches wait for each worker. A worker that falls
+    further behind loses the datagrams that do not fit, counted in
+    `dropped`, instead of the queue growing without end. A worker that dies
+    is started again, with a new queue, within `check_interval` seconds;
+    the batches it had not taken yet are lost with it.
+
+    The workers send their metrics, the stage timings and the gauges of
+    their loggers, about once a second. They are served with the metrics
+    of this process, labelled with the worker.
+    """
+
+    def __init__(self, consoles, config=None, port=33740, heartbeat_port=33739,
+                 interval=1.5, workers=None, db_file=None, maxsize=256, check_interval=1.0,
+                 **sampler_options):
+        self.consoles = consoles
+        self.config = config or {}
+        self.db_file = db_file
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(consoles)))
+        self.sampler = AsyncGT7Sampler(port=port, source=True, **sampler_options)
+        self.sampler.callback = self.datagram_received
+
+        self.by_ip = {}
+        self.stats = {}
+        self.heartbeats = []
+        for console in consoles:
+            console['worker'] = console['index'] % self.workers
+            self.by_ip[console['ip']] = console
+            self.stats[console['name']] = LinkStats(freq=self.sampler.freq)
+            self.heartbeats.append(Heartbeat(
+                console['ip'], port=heartbeat_port, interval=interval,
+                stats=self.stats[console['name']],
+            ))
+
+        self.unknown = 0
+        self.batches = [[] for _ in range(self.workers)]
+        self.flushing = False
+        self.processes = [None] * self.workers
+        self.queues = [None] * self.workers
+        self.dropped = [0] * self.workers
+        self.restarts = [0] * self.workers
+        self.reports = [None] * self.workers
+        self.collected = [()] * self.workers
+        self.timer = None
+
+    def bind(self):
+        return self.sampler.bind()
+
+    def _spawn(self, worker):
+        mine = [c for c in self.consoles if c['worker'] == worker]
+        jobs = self.ctx.Queue(self.maxsize)
+        reports = self.ctx.Queue(4)
+        process = self.ctx.Process(
+            target=_worker, args=(mine, self.config, self.db_file, jobs, reports),
+            name=f"gt7-ingest-{worker}",
+        )
+        process.start()
+        self.queues[worker] = jobs
+        self.reports[worker] = reports
+        self.processes[worker] = process
+        return mine
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        # spawned, a fork would copy the socket and the event loop
+        self.ctx = multiprocessing.get_context("spawn")
+        for worker in range(self.workers):
+            mine = self._spawn(worker)
+            l.info(f"worker {worker} logs {', '.join(c['name'] for c in mine)}")
+
+        self.bind()
+        for heartbeat in self.heartbeats:
+            await heartbeat.start()
+        await self.sampler.start()
+        self.timer = self.loop.call_later(self.check_interval, self.check)
+
+        from .metrics import METRICS
+        METRICS.collector("ingest", self.collect)
+        METRICS.gauge("gt7_ingest_dropped", "Datagrams dropped for a worker that fell behind",
+                      lambda: {str(w): n for w, n in enumerate(self.dropped)}, label="worker")
+        METRICS.gauge("gt7_ingest_restarts", "Ingest workers started again after dying",
+                      lambda: {str(w): n for w, n in enumerate(self.restarts)}, label="worker")
+
+    def check(self):
+        """Takes in the metrics of the workers and starts the ones that died again."""
+        for worker, process in enumerate(self.processes):
+            while True:
+                try:
+                    self.collected[worker] = self.reports[worker].get_nowait()
+                except (queue.Empty, OSError, EOFError):
+                    break
+            if not process.is_alive():
+                l.error(f"ingest worker {worker} exited with {process.exitcode}, restarting it")
+                # it may have died holding the queue locks
+                for q in (self.queues[worker], self.reports[worker]):
+                    q.cancel_join_thread()
+                    q.close()
+                self.restarts[worker] += 1
+                self._spawn(worker)
+        self.timer = self.loop.call_later(self.check_interval, self.check)
+
+    def collect(self):
+        """The latest metrics of every worker, labelled with it."""
+        families = []
+        for worker, collected in enumerate(self.collected):
+            label = (("worker", str(worker)),)
+            for kind, name, help, samples in collected:
+                families.append((kind, name, help, [(n, label + key, v) for n, key, v in samples]))
+        return families
+
+    def datagram_received(self, timestamp, data, addr):
+        console = self.by_ip.get(addr[0])
+        if console is None:
+            self.unknown += 1
+            if self.unknown == 1:
+                l.warning(f"ignoring telemetry from {addr[0]}, not in consoles")
+            return
+        self.stats[console['name']].touch()
+        # the sampler may reuse its buffer, so the datagram is copied
+        self.batches[console['worker']].append((console['index'], timestamp, bytes(data)))
+        if not self.flushing:
+            self.flushing = True
+            self.loop.call_soon(self.flush)
+
+    def flush(self):
+        self.flushing = False
+        for worker, batch in enumerate(self.batches):
+            if batch:
+                self.batches[worker] = []
+                try:
+                    self.queues[worker].put_nowait(batch)
+                except queue.Full:
+                    if not self.dropped[worker]:
+                        l.warning(f"ingest worker {worker} is falling behind, dropping telemetry")
+                    self.dropped[worker] += len(batch)
+
+    def snapshot(self):
+        return {
+            "workers": self.workers,
+            "unknown": self.unknown,
+            "dropped": self.dropped,
+            "restarts": self.restarts,
+            "consoles": {
+                c['name']: {"ip": c['ip'], "worker": c['worker'], "heartbeats": h.sent, "stalled": h.stalled}
+                for c, h in zip(self.consoles, self.heartbeats)
+            },
+        }
+
+    def stop(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        for heartbeat in self.heartbeats:
+            heartbeat.stop()
+        self.sampler.stop()
+
+    async def wait_closed(self):
+        await self.sampler.wait_closed()
+
+    async def close(self):
+        """Stops receiving and waits for the workers to finish their sessions."""
+        self.stop()
+        for worker, (process, jobs) in enumerate(zip(self.processes, self.queues)):
+            # a dead worker would never make room in its queue
+            if process.is_alive():
+                if self.batches[worker]:
+                    await asyncio.to_thread(jobs.put, self.batches[worker])
+                await asyncio.to_thread(jobs.put, None)
+        self.batches = [[] for _ in range(self.workers)]
+        for process in self.processes:
+            await asyncio.to_thread(process.join)
@@ -0,0 +1,250 @@
+
+import importlib
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+l = logging.getLogger(__name__)
+
+PLUGIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugins")
+
+# config key of each stage and the method its plugins implement
+STAGES = {
+    "decryptor": "decrypt",
+    "parser": "parse",
+    "enrichers": "enrich",
+    "outputs": "output",
+}
+
+class Block:
+    """A block of packets on its way through the pipeline.
+
+    `columns` maps a column name to one value per packet, `meta` holds
+    values for the block as a whole (car, venue, ...), carried over from
+    block to block by the enrichers that set them.
+    """
+
+    def __init__(self, columns, meta=None):
+        self.columns = columns
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.columns.get("timestamp", ()))
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.items = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds, items):
+        self.calls += 1
+        self.items += items
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "items": self.items,
+            "total": self.total,
+            "max": self.max,
+            "per_item": self.total / self.items if self.items else 0.0,
+        }
+
+def discover(path=PLUGIN_DIR):
+    """Names of the plugin packages in `path`, without importing any of them."""
+    try:
+        return sorted(
+            entry.name for entry in os.scandir(path)
+            if entry.is_dir() and os.path.exists(os.path.join(entry.path, "__init__.py"))
+        )
+    except FileNotFoundError:
+        return []
+
+_plugins = {}
+
+def load_plugin(name, path=PLUGIN_DIR):
+    """Imports plugins/<name> on first use and returns its PLUGIN class."""
+    if name not in _plugins:
+        root = os.path.dirname(path)
+        if root not in sys.path:
+            sys.path.insert(0, root)
+        module = importlib.import_module(f"{os.path.basename(path)}.{name}")
+        _plugins[name] = module.PLUGIN
+    return _plugins[name]
+
+def _spec(entry):
+    # a stage is given as "name" or {"name": ..., **options}
+    if isinstance(entry, str):
+        return entry, {}
+    entry = dict(entry)
+    return entry.pop("name"), entry
+
+def _create(name, options, stage):
+    cls = load_plugin(name)
+    method = STAGES[stage]
+    if not hasattr(cls, method):
+        raise ValueError(f"plugin {name} has no {method}(), it can not be used as {stage}")
+    return cls(**options)
+
+# enricher instances living in worker processes
+_workers = {}
+
+def _enrich_in_worker(name, options, block):
+    key = (name, repr(sorted(options.items())))
+    plugin = _workers.get(key)
+    if plugin is None:
+        plugin = _workers[key] = _create(name, options, "enrichers")
+    return plugin.enrich(block)
+
+class RemoteEnricher:
+    """Runs a CPU heavy enricher in a process of its own.
+
+    One process per enricher keeps its state between blocks and the
+    blocks in order, and keeps its work off the GIL of the receive loop.
+    """
+
+    def __init__(self, name, options):
+        self.name = name
+        self.options = options
+        self.pool = ProcessPoolExecutor(max_workers=1)
+
+    def enrich(self, block):
+        return self.pool.submit(_enrich_in_worker, self.name, self.options, block).result()
+
+    def close(self):
+        self.pool.shutdown()
+
+class Pipeline:
+    """Decryptor, parser, enrichers and outputs loaded from plugins/.
+
+    Datagrams are fed one at a time and processed `block_size` at a time
+    on a background thread, so the receive loop only pays for a copy and an
+    append. Every stage works on a whole block:
+
+        decrypt(timestamps, datagrams) -> (timestamps, packets)
+        parse(timestamps, packets) -> Block
+        enrich(block) -> Block
+        output(block)
+
+    With `decrypted`, the packets fed are decrypted already, as GT7Logger
+    hands them over, and there is no decrypt stage. Enrichers with
+    `cpu_bound = True` run in a worker process. The time spent in every
+    stage is kept in `stats`. When the stages fall behind,
+    at most `max_pending` blocks wait for the background thread. Further
+    blocks are dropped and their packets counted in `dropped`.
+    """
+
+    def __init__(self, decryptor, parser, enrichers=(), outputs=(), block_size=60, workers=True,
+                 max_pending=8, decrypted=False):
+        self.block_size = block_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.stages = []
+        self.stats = {}
+
+        for stage, entries in (("decryptor", [] if decrypted else [decryptor]), ("parser", [parser]),
+                               ("enrichers", enrichers), ("outputs", outputs)):
+            for entry in entries:
+                name, options = _spec(entry)
+                if stage == "enrichers" and workers and getattr(load_plugin(name), "cpu_bound", False):
+                    plugin = RemoteEnricher(name, options)
+                else:
+                    plugin = _create(name, options, stage)
+                key = f"{stage}:{name}"
+                self.stages.append((stage, key, plugin))
+                self.stats[key] = StageStats(key)
+
+        self.meta = {}
+        self.pending = []
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline")
+        self.futures = []
+
+    @classmethod
+    def from_config(cls, config, **options):
+        """Builds the pipeline from the `pipeline` section of config.yml."""
+        config = dict(config, **options)
+        return cls(
+            config.pop("decryptor", "decryptor_a"),
+            config.pop("parser", "parser_a"),
+            enrichers=config.pop("enrichers", ()),
+            outputs=config.pop("outputs", ()),
+            **config,
+        )
+
+    def feed(self, timestamp, datagram):
+        # the sampler and the logger reuse their buffers, so keep a copy
+        self.pending.append((timestamp, bytes(datagram)))
+        if len(self.pending) >= self.block_size:
+            self._submit()
+
+    def _submit(self):
+        pending, self.pending = self.pending, []
+        self.futures = [f for f in self.futures if not f.done()]
+        if len(self.futures) >= self.max_pending:
+            if not self.dropped:
+                l.warning(f"pipeline is {len(self.futures)} blocks behind, dropping packets")
+            self.dropped += len(pending)
+            return
+        self.futures.append(self.executor.submit(self._run, pending))
+
+    def _timed(self, key, items, func, *args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.stats[key].add(time.perf_counter() - start, items)
+
+    def _run(self, pending):
+        try:
+            self.process([ts for ts, _ in pending], [d for _, d in pending])
+        except Exception as e:
+            l.error(f"pipeline failed on a block of {len(pending)} packets: {e}")
+
+    def process(self, timestamps, datagrams):
+        """Runs one block through every stage and returns the enriched Block."""
+        data = (np.asarray(timestamps, dtype=np.float64), datagrams)
+        block = None
+        for stage, key, plugin in self.stages:
+            if stage == "decryptor":
+                data = self._timed(key, len(data[1]), plugin.decrypt, *data)
+            elif stage == "parser":
+                block = self._timed(key, len(data[1]), plugin.parse, *data)
+                block.meta = dict(self.meta, **block.meta)
+            elif stage == "enrichers":
+                block = self._timed(key, len(block), plugin.enrich, block)
+            else:
+                self._timed(key, len(block), plugin.output, block)
+
+        if block is not None:
+            self.meta = block.meta
+        return block
+
+    def flush(self):
+        if self.pending:
+            self._submit()
+        for f in self.futures:
+            f.result()
+        self.futures = []
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown()
+        for stage, _, plugin in self.stages:
+            if not hasattr(plugin, "close"):
+                continue
+            if stage == "outputs":
+                # outputs get the metadata gathered over the whole run
+                plugin.close(self.meta)
+            else:
+                plugin.close()
+
+    def snapshot(self):
+        return dict({key: s.snapshot() for key, s in self.stats.items()}, dropped=self.dropped)
@@ -1,10 +1,36 @@
 
+import asyncio
 import socket
 import threading
 import logging
+import struct
+import sys
+import time
+
+from .metrics import METRICS, STAGE
 
 l = logging.getLogger(__name__)
 
+# the socket module does not export it, this is the Linux value
+SO_TIMESTAMP = 29
+_TIMEVAL = struct.Struct("@ll")
+
+def _enable_timestamps(sock):
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMP, 1)
+        return hasattr(sock, "recvmsg_into")
+    except OSError:
+        return False
+
+def _arrival(ancdata, default):
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMP and len(data) >= _TIMEVAL.size:
+            sec, usec = _TIMEVAL.unpack_from(data)
+            return sec + usec / 1e6
+    return default
+
 class GT7Sampler(threading.Thread):
     def __init__(self, addr="0.0.0.0", port=33740, freq=60):
         super().__init__()
@@ -27,7 +53,7 @@ class GT7Sampler(threading.Thread):
             try:
                 data, addr = self.socket.recvfrom(4096)
                 if self.callback:
-                    self.callback(data)
+                    self.callback(time.time(), data)
             except socket.timeout:
                 continue
             except Exception as e:
@@ -38,3 +64,161 @@ class GT7Sampler(threading.Thread):
 
     def stop(self):
         self.running = False
+
+class GT7Protocol(asyncio.DatagramProtocol):
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        callback = self.sampler.callback
+        if callback:
+            try:
+                if self.sampler.source:
+                    callback(time.time(), data, addr)
+                else:
+                    callback(time.time(), data)
+            except Exception as e:
+                l.error(f"Error processing telemetry data: {e}")
+
+    def error_received(self, exc):
+        l.error(f"Error receiving telemetry data: {exc}")
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+class AsyncGT7Sampler:
+    """Receives GT7 telemetry on the running event loop.
+
+    Same interface as GT7Sampler, but the callback is invoked from the loop
+    that called start(), so it can touch asyncio objects directly.
+
+    With `pool_size`, datagrams are read with recv_into() into a ring of
+    preallocated buffers, draining everything queued on the socket each
+    time it becomes readable, and the callback gets a memoryview of the
+    buffer. A view stays valid until the ring wraps, `pool_size` datagrams
+    later. `rcvbuf` sets SO_RCVBUF so bursts are absorbed by the kernel
+    while the loop is busy elsewhere.
+
+    On Linux the pool also asks the kernel to timestamp every datagram
+    (SO_TIMESTAMP), so the time spent queued on the socket is measured as
+    the receive stage and the callback gets the arrival time.
+
+    With `source`, the callback also gets the address each datagram came
+    from, for demultiplexing several consoles sending to one port.
+    """
+
+    def __init__(self, addr="0.0.0.0", port=33740, freq=60, pool_size=0, rcvbuf=None, bufsize=4096, source=False):
+        self.addr = addr
+        self.port = port
+        self.freq = freq
+        self.pool_size = pool_size
+        self.rcvbuf = rcvbuf
+        self.bufsize = bufsize
+        self.source = source
+        self.transport = None
+        self.protocol = None
+        self.socket = None
+        self.bound = None
+        self.closed = None
+        self.callback = None
+        self.timestamps = False
+
+    @property
+    def running(self):
+        if self.socket is not None:
+            return True
+        return self.transport is not None and not self.transport.is_closing()
+
+    def bind(self):
+        """Binds the socket without reading from it yet.
+
+        From here on the kernel queues datagrams (up to `rcvbuf` bytes) for
+        start() to pick up, so a slow start does not lose packets.
+        """
+        if self.bound is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.rcvbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+            sock.bind((self.addr, self.port))
+            sock.setblocking(False)
+            self.bound = sock
+            l.info(f"Listening for GT7 telemetry on {self.addr}:{self.port}")
+        return self.bound
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        sock = self.bind()
+
+        if self.pool_size:
+            self.loop = loop
+            self.socket = sock
+            self.pool = [bytearray(self.bufsize) for _ in range(self.pool_size)]
+            self.views = [memoryview(buf) for buf in self.pool]
+            self.slot = 0
+            self.timestamps = METRICS.enabled and _enable_timestamps(sock)
+            self.ancbuf = socket.CMSG_SPACE(_TIMEVAL.size) if self.timestamps else 0
+            self.closed = loop.create_future()
+            loop.add_reader(sock.fileno(), self._drain)
+        else:
+            self.transport, self.protocol = await loop.create_datagram_endpoint(
+                lambda: GT7Protocol(self),
+                sock=sock,
+            )
+            self.closed = self.protocol.closed
+
+        l.info(f"Receiving GT7 telemetry on {self.addr}:{self.port}")
+
+    def _drain(self):
+        callback = self.callback
+        for _ in range(self.pool_size):
+            view = self.views[self.slot]
+            try:
+                if self.timestamps:
+                    n, ancdata, _, addr = self.socket.recvmsg_into([view], self.ancbuf)
+                else:
+                    n, addr = self.socket.recvfrom_into(view)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                l.error(f"Error receiving telemetry data: {e}")
+                return
+
+            self.slot = (self.slot + 1) % self.pool_size
+            now = time.time()
+            if self.timestamps and ancdata:
+                arrival = _arrival(ancdata, now)
+                STAGE['receive'].observe(now - arrival)
+                now = arrival
+            if callback:
+                try:
+                    if self.source:
+                        callback(now, view[:n], addr)
+                    else:
+                        callback(now, view[:n])
+                except Exception as e:
+                    l.error(f"Error processing telemetry data: {e}")
+
+    def stop(self):
+        if self.socket is not None:
+            self.loop.remove_reader(self.socket.fileno())
+            self.socket.close()
+            self.socket = None
+            self.bound = None
+            if not self.closed.done():
+                self.closed.set_result(None)
+        if self.transport:
+            self.transport.close()
+            self.bound = None
+        elif self.bound is not None:
+            # bound but never started
+            self.bound.close()
+            self.bound = None
+            if self.closed and not self.closed.done():
+                self.closed.set_result(None)
+
+    async def wait_closed(self):
+        if self.closed:
+            await self.closed
+            l.info("GT7 telemetry listener stopped")
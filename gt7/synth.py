@@ -0,0 +1,222 @@
+
+import struct
+
+import numpy as np
+
+from .telemetry import GT7DataPacket, Flags, Salsa20
+
+KEY = b'Simulator Interface Packet GT7 ver 0.0'[:32]
+MAGIC = 0x47375330
+
+# IV xor and size of each packet variant, by the heartbeat payload asking for it
+PACKETS = {
+    payload: (GT7DataPacket.IV_XOR[size], size)
+    for payload, size in (("A", 0x128), ("B", 0x13C), ("~", 0x158))
+}
+
+GEARS = (3.2, 2.3, 1.75, 1.35, 1.1, 0.92)
+FINAL_DRIVE = 4.0
+WHEEL_RADIUS = 0.33
+REDLINE = 8000
+
+def encrypt(plain, packet="A", iv=0):
+    """Encrypts a decrypted packet the way the console does.
+
+    The IV goes in clear at 0x40, GT7DataPacket.decrypt reads it back from
+    there.
+    """
+    xor, _ = PACKETS[packet]
+    cipher = Salsa20.new(key=KEY, nonce=struct.pack('<II', iv ^ xor, iv))
+    data = bytearray(cipher.encrypt(bytes(plain)))
+    data[0x40:0x44] = struct.pack('<I', iv)
+    return bytes(data)
+
+class Track:
+    """A closed racing line with a speed profile.
+
+    The line is sampled every `step` metres and the speed at each point
+    comes from the grip limit in the corners, then forward and backward
+    passes limit it to what the car can accelerate and brake.
+    """
+
+    def __init__(self, radius=(600.0, 300.0), wiggle=80.0, step=1.0,
+                 vmax=80.0, lateral=15.0, accel=6.0, brake=12.0):
+        t = np.linspace(0, 2 * np.pi, 20000, endpoint=False)
+        x = radius[0] * np.cos(t)
+        z = radius[1] * np.sin(t) + wiggle * np.sin(3 * t)
+
+        seg = np.hypot(np.diff(x, append=x[0]), np.diff(z, append=z[0]))
+        along = np.concatenate([[0], np.cumsum(seg)])
+        self.length = along[-1]
+
+        self.s = np.arange(0, self.length, step)
+        x = np.interp(self.s, along, np.append(x, x[0]))
+        z = np.interp(self.s, along, np.append(z, z[0]))
+        self.x, self.z = x, z
+
+        dx = np.gradient(np.concatenate([x[-2:], x, x[:2]]))[2:-2]
+        dz = np.gradient(np.concatenate([z[-2:], z, z[:2]]))[2:-2]
+        self.heading = np.unwrap(np.arctan2(dx, dz))
+        # one full turn per lap, clockwise or not
+        turn = 2 * np.pi * np.sign(self.heading[-1] - self.heading[0])
+        padded = np.concatenate([self.heading[-2:] - turn, self.heading, self.heading[:2] + turn])
+        curvature = np.abs(np.gradient(padded)[2:-2]) / step
+
+        with np.errstate(divide='ignore'):
+            v = np.minimum(vmax, np.sqrt(lateral / np.maximum(curvature, 1e-9)))
+
+        # twice round so the profile joins up across the start line
+        n = len(v)
+        for _ in range(2):
+            for i in range(n):
+                v[i] = min(v[i], np.sqrt(v[i - 1] ** 2 + 2 * accel * step))
+            for i in range(n - 1, -1, -1):
+                v[i] = min(v[i], np.sqrt(v[(i + 1) % n] ** 2 + 2 * brake * step))
+        self.v = v
+
+    def at(self, s):
+        s = s % self.length
+        i = np.interp(s, self.s, np.arange(len(self.s)))
+        def lerp(a):
+            return np.interp(i, np.arange(len(a)), a)
+        return lerp(self.x), lerp(self.z), lerp(self.heading), lerp(self.v)
+
+def _gear(speed):
+    for gear, ratio in enumerate(GEARS, 1):
+        rpm = speed / WHEEL_RADIUS * ratio * FINAL_DRIVE * 60 / (2 * np.pi)
+        if rpm < REDLINE * 0.92 or gear == len(GEARS):
+            return gear, max(rpm, 1000.0)
+
+def packets(laps=3, freq=60, track=None, start_tick=1, car_code=1234, seed=0):
+    """Yields the decrypted packets of `laps` laps, one per tick."""
+    track = track or Track()
+    rng = np.random.default_rng(seed)
+
+    s = 0.0
+    lap = 1
+    lap_ticks = 0
+    best = -1
+    last = -1
+    fuel = 100.0
+    prev_v = None
+    tick = start_tick
+    dt = 1.0 / freq
+
+    while lap <= laps:
+        x, z, heading, speed = track.at(s)
+        vx, vz = speed * np.sin(heading), speed * np.cos(heading)
+        accel = 0.0 if prev_v is None else (speed - prev_v) * freq
+        prev_v = speed
+
+        gear, rpm = _gear(speed)
+        throttle = 255 if accel >= 0 else 0
+        brake = int(min(255, -accel / 12 * 255)) if accel < 0 else 0
+        flags = Flags.IN_RACE.value | Flags.IN_GEAR.value | Flags.HAS_TURBO.value
+        if rpm > REDLINE * 0.9:
+            flags |= Flags.REV_LIMIT.value
+
+        spin = speed / WHEEL_RADIUS
+        bump = rng.normal(0, 0.002, 4)
+        values = (
+            x, 1.0 + rng.normal(0, 0.01), z,
+            vx, 0.0, vz,
+            np.cos(heading / 2), 0.0, np.sin(heading / 2), 0.0,
+            0.08 + bump[0],
+            rpm,
+            fuel, 100.0,
+            speed,
+            1.0 + 0.5 * throttle / 255,
+            4.5, 85.0, 95.0,
+            80.0, 80.0, 82.0, 82.0,
+            tick,
+            lap, laps,
+            best, last,
+            1, 16,
+            int(REDLINE * 0.9), REDLINE,
+            flags,
+            gear | ((gear + (1 if rpm > REDLINE * 0.85 else 0)) << 4),
+            throttle, brake,
+            -spin, -spin, -spin, -spin,
+            WHEEL_RADIUS, WHEEL_RADIUS, WHEEL_RADIUS, WHEEL_RADIUS,
+            *(0.05 + bump),
+            0.0,
+            car_code,
+        )
+        yield tick, GT7DataPacket.fmt.pack(*values)
+
+        tick += 1
+        lap_ticks += 1
+        fuel = max(fuel - 0.0005, 0.0)
+        s += speed * dt
+        if s >= track.length * lap:
+            last = int(round(lap_ticks * dt * 1000))
+            best = last if best < 0 else min(best, last)
+            lap += 1
+            lap_ticks = 0
+
+def _plain(body, size):
+    plain = bytearray(size)
+    plain[:len(body)] = body
+    struct.pack_into('<I', plain, 0, MAGIC)
+    return plain
+
+def datagrams(laps=3, freq=60, packet="A", loss=0.0, reorder=0.0, seed=0, **kwargs):
+    """Yields encrypted datagrams as the console would send them.
+
+    `loss` drops that fraction of packets and `reorder` swaps that fraction
+    with the packet after them.
+    """
+    _, size = PACKETS[packet]
+    rng = np.random.default_rng(seed)
+    held = None
+    for tick, body in packets(laps=laps, freq=freq, seed=seed, **kwargs):
+        if loss and rng.random() < loss:
+            continue
+        data = encrypt(_plain(body, size), packet=packet, iv=int(rng.integers(1, 2 ** 32)))
+        if held is not None:
+            yield data
+            yield held
+            held = None
+        elif reorder and rng.random() < reorder:
+            held = data
+        else:
+            yield data
+    if held is not None:
+        yield held
+
+if __name__ == "__main__":
+    import argparse
+    import socket
+    import time
+
+    from .capture import CaptureWriter
+
+    parser = argparse.ArgumentParser(description="Generate synthetic GT7 telemetry")
+    parser.add_argument("--laps", type=int, default=3)
+    parser.add_argument("--packet", choices=sorted(PACKETS), default="A")
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--reorder", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write a raw capture for replay or transcode.py")
+    parser.add_argument("--send", metavar="HOST:PORT", help="stream the datagrams in real time")
+    args = parser.parse_args()
+
+    stream = datagrams(laps=args.laps, packet=args.packet, loss=args.loss, reorder=args.reorder, seed=args.seed)
+
+    if args.send:
+        host, port = args.send.rsplit(":", 1)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        next_at = time.monotonic()
+        for n, data in enumerate(stream, 1):
+            sock.sendto(data, (host, int(port)))
+            next_at += 1 / 60
+            time.sleep(max(next_at - time.monotonic(), 0))
+        print(f"sent {n} datagrams to {args.send}")
+    else:
+        writer = CaptureWriter(args.output or "synthetic.gt7raw")
+        n = 0
+        for n, data in enumerate(stream, 1):
+            p = GT7DataPacket(data)
+            writer.write(n / 60, data, p.tick, p.current_lap)
+        writer.close()
+        print(f"wrote {n} datagrams to {args.output or 'synthetic.gt7raw'}")
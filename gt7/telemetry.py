@@ -4,13 +4,24 @@ from collections import namedtuple
 from datetime import datetime
 from copy import copy
 import logging
+import time
 import asyncio
-import json
 import sys
-import pandas as pd
 import os
+import weakref
 
 from .database import Database
+from .buffer import SampleBuffer
+from .bus import EventBus
+from .capture import CaptureWriter
+from .derived import DerivedChannels, RAW_COLUMNS, STEP_COLUMNS, EVENT_COLUMNS
+from .gapfill import fill_rows, Resampler, METHODS, ROTATION, TICK_RATE
+from .livestate import LiveState
+from .export import ExportWorker, finalise
+from .journal import Journal, recover
+from . import metrics
+from .metrics import METRICS, STAGE
+from .tracks import GT7TrackDetector, load_db, DEFAULT_DB
 
 try:
     from Crypto.Cipher import Salsa20
@@ -20,11 +31,61 @@ except ImportError:
     except ImportError:
         raise RuntimeError("Missing dependency 'salsa20' or 'pycryptodome'. Run 'pip install salsa20' or 'pip install pycryptodome'")
 
-from gt7.writer.motec_exporter import export_to_ld
+from gt7.writer.ld_stream import LDStreamWriter
 from .sampler import GT7Sampler
 
 l = logging.getLogger(__name__)
 
+# the GT7Loggers of this process by console, for the gauges registered below
+LOGGERS = weakref.WeakValueDictionary()
+
+def _per_console(func):
+    def gauge():
+        return {console: func(logger) for console, logger in list(LOGGERS.items())}
+    return gauge
+
+def _per_subscriber(key):
+    def gauge():
+        return {
+            (console, name): s[key]
+            for console, logger in list(LOGGERS.items())
+            for name, s in logger.bus.stats().items()
+        }
+    return gauge
+
+def _link(name):
+    return _per_console(lambda logger: getattr(logger.link, name) if logger.link else 0)
+
+def _clients(func):
+    def gauge():
+        return {console: func(logger.manager.clients) for console, logger in list(LOGGERS.items()) if logger.manager}
+    return gauge
+
+METRICS.gauge("gt7_ticks_lost", "Ticks missing from the stream", _link("lost"), label="console")
+METRICS.gauge("gt7_packets_reordered", "Duplicate or late packets", _link("reordered"), label="console")
+METRICS.gauge("gt7_link_jitter_seconds", "Interarrival jitter of the stream", _link("jitter"), label="console")
+METRICS.gauge(
+    "gt7_samples_logged", "Samples in the log being written",
+    _per_console(lambda logger: len(logger.samples)), label="console",
+)
+METRICS.gauge(
+    "gt7_bus_queue_depth", "Events waiting per bus subscriber",
+    _per_subscriber("lag"), label=("console", "subscriber"),
+)
+METRICS.gauge(
+    "gt7_bus_dropped", "Events dropped per bus subscriber",
+    _per_subscriber("dropped"), label=("console", "subscriber"),
+)
+METRICS.gauge("gt7_websocket_clients", "Connected WebSocket clients", _clients(len), label="console")
+METRICS.gauge(
+    "gt7_websocket_queue_depth", "Frames waiting for the slowest WebSocket client",
+    _clients(lambda clients: max((len(c.queue) for c in clients.values()), default=0)), label="console",
+)
+METRICS.gauge(
+    "gt7_websocket_dropped", "Frames dropped for slow WebSocket clients",
+    _clients(lambda clients: sum(c.dropped for c in clients.values())), label="console",
+)
+
 Wheels = namedtuple("Wheels", ["fl", "fr", "rl", "rr"])
 
 def handle_uncaught(exc_type, exc_value, _):
@@ -63,6 +124,12 @@ class GT7Logger:
         'asm', 'tcs'
     ]
 
+    # settings apply_settings() can change while logging
+    RELOADABLE = {
+        "name", "session", "vehicle", "driver", "venue", "comment", "shortcomment",
+        "replay", "imperial", "gap_fill", "max_gap", "filetemplate", "log_output_path",
+    }
+
     def __init__(self,
                 rawfile=None,
                 sampler=None,
@@ -78,9 +145,23 @@ class GT7Logger:
                 imperial=False,
                 manager=None,
                 db=None,
-                config=None):
+                config=None,
+                gap_fill="hold",
+                max_gap=60,
+                derived=True,
+                live=None,
+                export_worker=False,
+                endurance=None,
+                console=""):
         
+        self.console = console
         self.sampler = sampler
+        self.filetemplate = filetemplate
+        self.rawfile = CaptureWriter(rawfile) if rawfile else None
+        self.link = None
+        self.gap_fill = gap_fill
+        self.max_gap = max_gap
+        self.last_row = None
         self.event = {
             "name": name,
             "session": session,
@@ -97,47 +178,111 @@ class GT7Logger:
         self.track = None
         self.track_detector = None
         self.replay = replay
-        self.queue = asyncio.Queue()
+        self.bus = EventBus()
         self.manager = manager
         self.db = db
         self.config = config
-        self.samples = []
+        self.imperial = imperial
+        self.writer = None
+        self.saved = []
+        self.derived = derived
+        self.derive = None
+        # rows are logged one per tick and resampled when sampler.freq is not the tick rate
+        self.resampler = None
+        # raw columns are buffered, the logged channels are derived a block at a time
+        # endurance sessions go to a journal a segment at a time, see gt7/journal.py
+        # `endurance` is True or a dict of options: segment_size, journal_dir, sync
+        self.endurance = None
+        chunk_size = 4096
+        if endurance:
+            self.endurance = dict(endurance) if isinstance(endurance, dict) else {}
+            chunk_size = self.endurance.get("segment_size", 1024)
+        self.samples = SampleBuffer(RAW_COLUMNS, chunk_size=chunk_size, sink=self._write_block)
+        self.step_index = [RAW_COLUMNS.index(c) for c in STEP_COLUMNS]
+        self.event_index = [RAW_COLUMNS.index(c) for c in EVENT_COLUMNS]
+        self.rotation_index = [RAW_COLUMNS.index(c) for c in ROTATION]
+        # decrypted packets are unpacked straight away, so one buffer is reused
+        self.scratch = bytearray(4096)
+        # latest packet in shared memory for displays in other processes
+        self.live = None
+        if live:
+            try:
+                self.live = LiveState.create(live)
+            except FileExistsError as e:
+                l.warning(f"not publishing the live state: {e}")
+        # sessions are finished in another process so ingest carries straight on
+        self.exporter = ExportWorker() if export_worker else None
+        # called with (timestamp, decrypted packet) for every valid packet,
+        # e.g. the feed of a Pipeline built with decrypted=True
+        self.on_packet = None
+        self.register_metrics()
+
+    def register_metrics(self):
+        # the gauges are registered once for the module and find the
+        # logger here, held weakly so a finished logger can go
+        LOGGERS[self.console] = self
+
+    def new_derive(self, freq=60):
+        return DerivedChannels(self.channels, freq=freq, imperial=self.imperial, derived=self.derived)
 
     async def _websocket_broadcaster_task(self):
+        # live view only, falling behind just skips samples
+        sub = self.bus.subscribe("websocket", topics=("sample",), maxlen=256)
+        derive = self.new_derive()
+        age = metrics.sample_age.labels(consumer="websocket")
         while True:
             try:
-                timestamp, samples, is_lap = await self.queue.get()
-                if not is_lap and self.manager:
-                    data = dict(zip([c.get('name', c) for c in self.channels], samples))
-                    data['timestamp'] = timestamp
-                    await self.manager.broadcast(json.dumps(data))
-                self.queue.task_done()
+                items = [await sub.get()]
+                while sub.lag:
+                    items.append(sub.get_nowait())
+                # the oldest sample of the batch waited longest
+                age.observe(time.time() - items[0][1][0])
+                if self.manager:
+                    start = time.perf_counter()
+                    derive.freq = self.sampler.freq if self.sampler else 60
+                    derive.imperial = self.imperial
+                    rows = derive([row for _, (_, row) in items])
+                    for (_, (timestamp, _)), row in zip(items, rows):
+                        self.manager.publish(timestamp, row)
+                    per_sample = (time.perf_counter() - start) / len(items)
+                    for _ in items:
+                        STAGE['broadcast'].observe(per_sample)
             except asyncio.CancelledError:
                 l.info("WebSocket broadcaster task cancelled.")
+                sub.close()
                 break
             except Exception as e:
                 l.error(f"Error in WebSocket broadcaster task: {e}")
 
     async def _db_writer_task(self):
+        sub = self.bus.subscribe("database", topics=("lap",))
+        age = metrics.sample_age.labels(consumer="database")
         while True:
             try:
-                timestamp, samples, is_lap = await self.queue.get()
-                if is_lap and self.db:
-                    session_data = {
-                        "driver": self.event.get("driver", ""),
-                        "vehicle": self.event.get("vehicle", ""),
-                        "venue": self.event.get("venue", ""),
-                        "session": self.event.get("session", ""),
-                        "best_lap": samples['laptime']
-                    }
-                    self.db.insert_session(session_data)
-                self.queue.task_done()
+                _, (timestamp, lap) = await sub.get()
+                age.observe(time.time() - timestamp)
+                if self.db:
+                    self.db.insert_session(self.lap_record(lap))
             except asyncio.CancelledError:
                 l.info("DB writer task cancelled.")
+                sub.close()
                 break
             except Exception as e:
                 l.error(f"Error in DB writer task: {e}")
 
+    def lap_record(self, lap):
+        event = lap.get("event") or self.event
+        return {
+            "driver": event.get("driver", ""),
+            "vehicle": event.get("vehicle", ""),
+            "venue": event.get("venue", ""),
+            "session": event.get("session", ""),
+            "datetime": event.get("datetime", ""),
+            "console": self.console,
+            "lap": lap.get("lap"),
+            "best_lap": lap['laptime']
+        }
+
     def get_latest_data(self):
         if self.last_packet:
             return {
@@ -151,23 +296,61 @@ class GT7Logger:
         return None
 
     def process_sample(self, timestamp, sample):
-        p = GT7DataPacket(sample)
+        timed = METRICS.enabled
+        if timed:
+            t0 = time.perf_counter()
+        buf = GT7DataPacket.decrypt(sample, out=self.scratch)
+        if not buf:
+            metrics.invalid.inc()
+            return
+        if timed:
+            t1 = time.perf_counter()
+        try:
+            p = GT7DataPacket(buf, encrypted=False)
+        except ValueError as e:
+            l.warning(str(e))
+            metrics.invalid.inc()
+            return
+        if timed:
+            t2 = time.perf_counter()
+            STAGE['decrypt'].observe(t1 - t0)
+            STAGE['unpack'].observe(t2 - t1)
+            metrics.packets.inc()
+
+        if self.rawfile:
+            self.rawfile.write(timestamp, sample, p.tick, p.current_lap)
+        if self.on_packet:
+            self.on_packet(timestamp, buf)
+        if self.link:
+            self.link.observe(p.tick)
         if not self.last_packet:
             self.last_packet = p
             l.info(f"received first packet from GT7 with ID {p.tick}")
 
-        missing = range(self.last_packet.tick + 1, p.tick)
-        if len(missing):
-            l.info(f"misssed {len(missing)} ticks, duplicating {self.last_packet.tick}")
-            for tick in missing:
-                mp = copy(self.last_packet)
-                mp.tick = tick
-                self.process_packet(timestamp, mp)
+        gap = max(p.tick - self.last_packet.tick - 1, 0)
+        if gap:
+            l.info(f"misssed {gap} ticks after {self.last_packet.tick}")
 
-        self.process_packet(timestamp, p)
+        self.process_packet(timestamp, p, gap=gap)
         self.last_packet = p
+        if self.live:
+            self.live.publish(timestamp, p, self.imperial)
+        if timed:
+            STAGE['process'].observe(time.perf_counter() - t2)
 
-    def process_packet(self, timestamp, packet):
+    def fill_gap(self, row, gap):
+        if self.last_row is None:
+            return
+        if gap > self.max_gap:
+            l.warning(f"not filling a gap of {gap} ticks, more than {self.max_gap}")
+            metrics.gaps_skipped.inc()
+            return
+        self.samples.extend(fill_rows(
+            self.last_row, row, gap, self.gap_fill, self.step_index, self.event_index, self.rotation_index,
+        ))
+        metrics.gap_rows.inc(gap)
+
+    def process_packet(self, timestamp, packet, gap=0):
         try:
             beacon = 0
             new_log = False
@@ -187,7 +370,7 @@ class GT7Logger:
             if currp.current_lap < lastp.current_lap:
                 self.save_log()
 
-            if not self.samples:
+            if self.current_event is None:
                 new_log = True
                 self.skip_samples = 3
                 then = datetime.fromtimestamp(timestamp)
@@ -199,6 +382,16 @@ class GT7Logger:
                     event['session'] = "Replay"
 
                 self.current_event = event
+                try:
+                    self.writer = self.new_writer(event, freq)
+                except OSError as e:
+                    # a full or missing disk loses the session, not the logger
+                    l.error(f"could not open a log for {event['datetime']}, not saving this session: {e}")
+                    self.writer = None
+                self.derive = self.new_derive(freq)
+                self.resampler = Resampler(RAW_COLUMNS, freq) if freq != TICK_RATE else None
+                self.track_detector = self.new_track_detector(event)
+                self.bus.publish("session", (timestamp, {"state": "start", "event": event}))
 
             if self.skip_samples > 0:
                 l.info(f"skipping tick {currp.tick}")
@@ -208,7 +401,20 @@ class GT7Logger:
             if currp.current_lap > lastp.current_lap:
                 beacon = 1
                 laptime = currp.last_laptime / 1000.0
-                self.queue.put_nowait((timestamp, {"laptime": laptime, "lap": lastp.current_lap}, True))
+                if self.writer:
+                    self.writer.add_lap(len(self.samples) / TICK_RATE, laptime)
+                if self.track_detector:
+                    self.track_detector.guess(lastp.position[0], lastp.position[2], currp.position[0], currp.position[2])
+                self.bus.publish("lap", (timestamp, {"laptime": laptime, "lap": lastp.current_lap, "event": self.current_event}))
+
+            elif self.track_detector:
+                self.track_detector.update(currp.position[0], currp.position[2])
+
+            if self.track_detector and self.track_detector.track_name:
+                self.current_event['venue'] = str(self.track_detector.track_name).replace(" - ", "-")
+                if self.writer:
+                    self.writer.update_event(self.current_event)
+                self.track_detector = None
 
             if (currp.tick % 1000) == 0 or new_log:
                 l.info(
@@ -221,72 +427,241 @@ class GT7Logger:
                     f" {currp.car_code:5}"
                 )
 
-            if self.imperial:
-                ms_to_speed = 2.23693629 # m/s to mph
-            else:
-                ms_to_speed = 3.6  # m/s to kph
-
-            if currp.in_race:
-                wheelspeed = [ r * s * -ms_to_speed for r,s in zip(currp.wheelradius, currp.wheelspeed) ]
-            else:
-                wheelspeed = [ r * s * ms_to_speed for r,s in zip(currp.wheelradius, currp.wheelspeed) ]
-
-            if currp.fuel_capacity > 0:
-                fuel_level = currp.current_fuel / currp.fuel_capacity * 100.0
-            else:
-                fuel_level = 0
-
-            row = [
+            # raw values in RAW_COLUMNS order, conversions happen in DerivedChannels
+            row = (
                 beacon,
                 currp.current_lap,
                 currp.rpm,
                 currp.gear,
-                currp.throttle * 100 / 255,
-                currp.brake * 100 / 255,
-                currp.clutch * 100 / 255,
-                0, # steer
-                currp.speed * ms_to_speed,
-                0,0, # lat, long
-                0,0,0, # velx, vely, velz
-                0,0,0, # glat, gvert, glong
-                *[p * 100 for p in currp.suspension],
-                *wheelspeed,
+                currp.throttle,
+                currp.brake,
+                currp.clutch,
+                currp.speed,
+                *currp.position,
+                *currp.velocity,
+                *currp.rotation,
+                *currp.suspension,
+                *currp.wheelspeed,
+                *currp.wheelradius,
                 *currp.tyretemp,
-                currp.ride_height * 100,
-                currp.turbo_boost * 100.0,
+                currp.ride_height,
+                currp.turbo_boost,
                 currp.oil_pressure,
                 currp.oil_temp,
                 currp.water_temp,
-                fuel_level,
-                1 if currp.asm_active else 0,
-                1 if currp.tcs_active else 0
-            ]
+                currp.current_fuel,
+                currp.fuel_capacity,
+                currp.asm_active,
+                currp.tcs_active,
+                currp.in_race,
+            )
+            if gap and not new_log:
+                self.fill_gap(row, gap)
+            timed = METRICS.enabled
+            if timed:
+                start = time.perf_counter()
             self.samples.append(row)
-            self.queue.put_nowait((timestamp, row, False))
-        except Exception:
-            print("[DATAFRAME ERROR] Could not assemble dataframe.")
-            sys.exit(1)
+            self.last_row = row
+            self.bus.publish("sample", (timestamp, row))
+            if timed:
+                STAGE['enqueue'].observe(time.perf_counter() - start)
+        except Exception as e:
+            # one bad packet is skipped, ingest carries on
+            l.error(f"could not log tick {packet.tick}: {e}")
+
+    def apply_settings(self, settings):
+        """Applies changed settings while logging, returns the keys it handles.
+
+        Runs on the event loop, so it always lands between two samples.
+        Event details go into the running session as well as the next one,
+        `replay`, `imperial`, `gap_fill` and `max_gap` take effect straight
+        away and the output path from the next session on. A value that is
+        not valid is logged and the old one kept. Keys not returned need a
+        restart.
+        """
+        changed = {}
+        for key in self.event:
+            if settings.get(key) is not None and settings[key] != self.event[key]:
+                self.event[key] = changed[key] = settings[key]
+        if changed and self.current_event is not None:
+            self.current_event.update(changed)
+            if self.writer:
+                self.writer.update_event(self.current_event)
+
+        for key in ("replay", "imperial", "gap_fill", "max_gap", "filetemplate"):
+            value = settings.get(key)
+            if value is None or value == getattr(self, key):
+                continue
+            error = self.invalid_setting(key, value)
+            if error:
+                l.warning(f"not applying {key}={value!r}: {error}")
+                continue
+            setattr(self, key, value)
+            changed[key] = value
+        if "imperial" in changed and self.derive:
+            self.derive.imperial = self.imperial
+        if settings.get("log_output_path") and self.config is not None:
+            if settings["log_output_path"] != self.config.get("log_output_path"):
+                self.config["log_output_path"] = changed["log_output_path"] = settings["log_output_path"]
+
+        if changed:
+            l.info(f"applied {', '.join(f'{k}={v!r}' for k, v in changed.items())}")
+        return set(settings) & self.RELOADABLE
+
+    @staticmethod
+    def invalid_setting(key, value):
+        """Why `value` can not be used for `key`, None when it can."""
+        if key in ("replay", "imperial") and not isinstance(value, bool):
+            return "expected true or false"
+        if key == "gap_fill" and value not in METHODS:
+            return f"expected one of {', '.join(METHODS)}"
+        if key == "max_gap" and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+            return "expected a number of ticks, 0 or more"
+        if key == "filetemplate" and not isinstance(value, str):
+            return "expected a path"
+        return None
+
+    def output_path(self, event):
+        if self.filetemplate:
+            return self.filetemplate.format(**event).replace(":", "-")
+        config = self.config or {}
+        return config.get('log_output_path', './logs/session.ld')
+
+    def new_writer(self, event, freq):
+        output_path = self.output_path(event)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        if self.endurance is not None:
+            directory = self.journal_dir()
+            os.makedirs(directory, exist_ok=True)
+            l.info(f"journalling {output_path} in {directory}")
+            return Journal(directory, output_path, self.channels, freq=freq, sync=self.endurance.get("sync", True))
+        l.info(f"opening {output_path}")
+        # room for a whole session up front, so the channel extents do not have to grow
+        seconds = (self.config or {}).get('session_length', 3600)
+        return LDStreamWriter(output_path, self.channels, freq=freq, capacity=max(int(seconds * freq), 1))
+
+    def journal_dir(self):
+        return (self.endurance or {}).get("journal_dir", "./logs/journal")
+
+    def recover(self):
+        """Assembles the sessions a crash left in the journal, returns their paths."""
+        recovered = recover(self.journal_dir())
+        self.saved.extend(recovered)
+        return recovered
+
+    def new_track_detector(self, event):
+        if event['venue']:
+            return None
+        config = self.config or {}
+        db = load_db(config.get('track_db') or DEFAULT_DB)
+        return GT7TrackDetector(db) if db else None
+
+    def _write_block(self, block):
+        if self.writer:
+            try:
+                self.writer.append(self.derive(self.regrid(block)))
+            except OSError as e:
+                self.drop_writer(e)
+
+    def regrid(self, rows):
+        return self.resampler(rows) if self.resampler and len(rows) else rows
+
+    def drop_writer(self, error):
+        """Gives up on the session's file after a write error, keeping what made it to disk.
+
+        The rest of the session is not saved, the next one gets a new file.
+        """
+        writer, self.writer = self.writer, None
+        l.error(f"could not write {writer.path}, not saving the rest of this session: {error}")
+        try:
+            writer.close(self.current_event)
+            if writer.count:
+                self.finished(writer.path, writer.count)
+            else:
+                for path in (writer.path, os.path.splitext(writer.path)[0] + ".ldx"):
+                    if os.path.exists(path):
+                        os.remove(path)
+        except Exception as e:
+            l.error(f"could not close {writer.path}: {e}")
 
     def save_log(self):
-        if not self.samples:
+        writer = self.writer
+        if not writer:
+            # nothing to save, or the session's file was dropped after an error
+            self.samples.clear()
+            self.last_row = None
+            self.resampler = None
+            self.track_detector = None
+            self.current_event = None
             return
 
         try:
-            df = pd.DataFrame(self.samples, columns=[c.get('name', c) if isinstance(c, dict) else c for c in self.channels])
-            
-            metadata = {
-                'vehicle': self.current_event.get('vehicle', 'Placeholder Vehicle'),
-                'venue': self.current_event.get('venue', 'Placeholder Track'),
-                'event': self.current_event.get('event', 'Placeholder Event')
-            }
+            if self.exporter:
+                count = self.hand_off(writer)
+            else:
+                self.samples.flush()
+                writer.close(self.current_event)
+                count = writer.count
+                if not count and os.path.exists(writer.path):
+                    os.remove(writer.path)
+                else:
+                    self.finished(writer.path, count)
+            if count:
+                self.bus.publish("session", (time.time(), {"state": "end", "event": self.current_event, "path": writer.path}))
+        except Exception as e:
+            # the next session is logged regardless
+            l.error(f"could not export {writer.path}: {e}")
+
+        self.samples.clear()
+        self.last_row = None
+        self.resampler = None
+        self.writer = None
+        self.track_detector = None
+        self.current_event = None
+
+    def hand_off(self, writer):
+        """Passes the writer to the export worker, returns the samples in the log."""
+        self.collect(self.exporter.poll())
 
-            output_path = self.config.get('log_output_path', './logs/session.ld')
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            export_to_ld(df, metadata, output_path)
-            self.samples = []
-        except Exception:
-            print("[EXPORT ERROR] Could not export to .ld file.")
-            sys.exit(1)
+        rows = self.regrid(self.samples.pending())
+        tail = self.derive(rows) if len(rows) else None
+        count = writer.count + len(rows)
+        state = writer.detach()
+        try:
+            submitted = self.exporter.submit(state, tail, self.current_event)
+            if not submitted:
+                l.warning(f"export queue full, finishing {writer.path} here")
+        except Exception as e:
+            submitted = False
+            l.error(f"export worker unavailable, finishing {writer.path} here: {e}")
+        if not submitted:
+            count = finalise(state, tail, self.current_event)
+            if count:
+                self.finished(writer.path, count)
+        return count
+
+    def finished(self, path, count):
+        l.info(f"saved {count} samples to {path}")
+        self.saved.append(path)
+
+    def collect(self, results):
+        for path, count, error in results:
+            if error:
+                l.error(f"could not export {path}: {error}")
+            elif count:
+                self.finished(path, count)
+
+    def close(self):
+        if LOGGERS.get(self.console) is self:
+            del LOGGERS[self.console]
+        self.save_log()
+        if self.exporter:
+            self.collect(self.exporter.close())
+        if self.rawfile:
+            self.rawfile.close()
+        if self.live:
+            self.live.close()
+            self.live = None
 
 class GT7DataPacket:
     fmt = struct.Struct(
@@ -336,10 +711,10 @@ class GT7DataPacket:
 
     size = fmt.size
 
-    def __init__(self, buf, encrypted=True):
+    def __init__(self, buf, encrypted=True, scratch=None):
         try:
             if encrypted:
-                buf = self.decrypt(buf)
+                buf = self.decrypt(buf, out=scratch)
 
             (
                 px, py, pz,
@@ -361,9 +736,9 @@ class GT7DataPacket:
                 self.best_laptime,
                 self.last_laptime,
                 self.race_position,
+                self.opponents,
                 self.rev_upshift,
                 self.rev_limit,
-                self.opponents,
                 self.flags,
                 gear,
                 self.throttle,
@@ -373,10 +748,9 @@ class GT7DataPacket:
                 susfl, susfr, susrl, susrr,
                 self.clutch,
                 self.car_code
-            ) = self.fmt.unpack(buf)
-        except Exception:
-            print("[PARSING ERROR] Could not parse packet.")
-            sys.exit(1)
+            ) = self.fmt.unpack_from(buf)
+        except struct.error as e:
+            raise ValueError(f"could not parse packet: {e}")
 
         self.position = (px, py, pz)
         self.velocity = (vx, vy, vz)
@@ -395,22 +769,30 @@ class GT7DataPacket:
         self.tcs_active = bool(self.flags & Flags.TCS.value)
         self.asm_active = bool(self.flags & Flags.ASM.value)
 
+    # IV xor of each packet variant by its size, packet A, B and ~ are sent
+    # for the heartbeats "A", "B" and "~"; only the fields of A are unpacked
+    IV_XOR = {0x128: 0xDEADBEAF, 0x13C: 0xDEADBEEF, 0x158: 0x55FABB4F}
+
     @staticmethod
-    def decrypt(dat):
+    def decrypt(dat, out=None):
+        # with `out`, the packet is decrypted into that buffer and a
+        # memoryview of it is returned instead of a new bytes object
         try:
             KEY = b'Simulator Interface Packet GT7 ver 0.0'
-            oiv = dat[0x40:0x44]
-            iv1 = int.from_bytes(oiv, byteorder='little')
-            iv2 = iv1 ^ 0xDEADBEAF
-            IV = bytearray()
-            IV.extend(iv2.to_bytes(4, 'little'))
-            IV.extend(iv1.to_bytes(4, 'little'))
-            ddata = Salsa20.new(key=KEY[0:32], nonce=bytes(IV)).decrypt(dat)
+            iv1 = int.from_bytes(dat[0x40:0x44], byteorder='little')
+            iv2 = iv1 ^ GT7DataPacket.IV_XOR.get(len(dat), 0xDEADBEAF)
+            cipher = Salsa20.new(key=KEY[0:32], nonce=struct.pack('<II', iv2, iv1))
+            if out is None:
+                ddata = cipher.decrypt(dat)
+            else:
+                ddata = memoryview(out)[:len(dat)]
+                cipher.decrypt(dat, output=ddata)
 
             magic = int.from_bytes(ddata[0:4], byteorder='little')
             if magic != 0x47375330:
                 return bytearray(b'')
             return ddata
-        except Exception:
-            print("[DECRYPTION ERROR] Invalid packet or wrong key. Check your config’s salsa20_key.")
-            sys.exit(1)
+        except Exception as e:
+            # counted as an invalid packet, the next one may be fine
+            l.warning(f"could not decrypt packet, check the salsa20_key: {e}")
+            return bytearray(b'')
@@ -1,6 +1,5 @@
 
 import csv
-import matplotlib.pyplot as plt
 
 class TrackMap:
     def __init__(self, filename):
@@ -33,6 +32,9 @@ class TrackMap:
                 self.longs.append(float(row[long_index]))
 
     def generate_map(self, output_filename="track_map.png"):
+        # matplotlib takes seconds to import on a Pi, only load it to plot
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 10))
         plt.plot(self.longs, self.lats)
         plt.xlabel("Longitude")
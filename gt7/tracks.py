@@ -0,0 +1,299 @@
+
+import json
+import logging
+import os
+
+import numpy as np
+
+l = logging.getLogger(__name__)
+
+# not shipped, built from recorded laps with `python -m gt7.tracks compile`
+DEFAULT_DB = os.path.join(os.path.dirname(__file__), "data", "tracks.npz")
+
+class TrackDB:
+    """Precompiled reference set of track centrelines and start/finish lines.
+
+    Centrelines are resampled to `spacing` metres when compiled and every
+    point is filed in a uniform grid of `cell` metre squares. The grid is
+    stored as the points sorted by cell key, so finding the points near a
+    position is a binary search per neighbouring cell.
+
+    Coordinates are GT7 world x and z in metres.
+    """
+
+    def __init__(self, names, points, track, starts, cell, keys):
+        self.names = list(names)
+        self.points = points
+        self.track = track
+        self.starts = starts
+        self.cell = float(cell)
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _key(cx, cz):
+        # column major, so the cells of one x column are contiguous and in z order
+        return (np.asarray(cx, dtype=np.int64) << 32) + (np.asarray(cz, dtype=np.int64) + (1 << 31))
+
+    @classmethod
+    def compile(cls, tracks, spacing=5.0, cell=32.0):
+        """Builds the index from {"name", "centreline", "start"} dicts.
+
+        `centreline` is a list of [x, z] points around the lap and `start`
+        the two [x, z] ends of the start/finish line.
+        """
+        names, points, track, starts = [], [], [], []
+        for i, t in enumerate(tracks):
+            line = np.asarray(t["centreline"], dtype=np.float64)
+            # close the loop and resample to an even spacing
+            line = np.vstack([line, line[:1]])
+            along = np.concatenate([[0], np.cumsum(np.hypot(*np.diff(line, axis=0).T))])
+            at = np.arange(0, along[-1], spacing)
+            line = np.column_stack([np.interp(at, along, line[:, 0]), np.interp(at, along, line[:, 1])])
+
+            names.append(t["name"])
+            points.append(line)
+            track.append(np.full(len(line), i, dtype=np.int32))
+            starts.append(np.ravel(t.get("start") or [np.nan] * 4))
+
+        points = np.concatenate(points).astype(np.float32) if points else np.empty((0, 2), np.float32)
+        track = np.concatenate(track) if track else np.empty(0, np.int32)
+        keys = cls._key(np.floor(points[:, 0] / cell), np.floor(points[:, 1] / cell))
+        order = np.argsort(keys, kind="stable")
+
+        return cls(
+            names,
+            points[order],
+            track[order],
+            np.asarray(starts, dtype=np.float32).reshape(-1, 4),
+            cell,
+            keys[order],
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            names=np.asarray(self.names),
+            points=self.points,
+            track=self.track,
+            starts=self.starts,
+            cell=np.float64(self.cell),
+            keys=self.keys,
+        )
+
+    @classmethod
+    def load(cls, path=DEFAULT_DB):
+        with np.load(path) as f:
+            return cls(f["names"].tolist(), f["points"], f["track"], f["starts"], f["cell"], f["keys"])
+
+    def nearest(self, x, z, radius):
+        """Distance from (x, z) to the closest point of every track.
+
+        Tracks with no point within `radius` get `radius`.
+        """
+        dist = np.full(len(self.names), radius, dtype=np.float64)
+        cx = int(np.floor(x / self.cell))
+        cz = int(np.floor(z / self.cell))
+        reach = int(np.ceil(radius / self.cell))
+
+        for dx in range(-reach, reach + 1):
+            # cells of one column are contiguous in key order
+            lo = np.searchsorted(self.keys, self._key(cx + dx, cz - reach), side="left")
+            hi = np.searchsorted(self.keys, self._key(cx + dx, cz + reach), side="right")
+            if lo == hi:
+                continue
+            p = self.points[lo:hi]
+            d = np.hypot(p[:, 0] - x, p[:, 1] - z)
+            np.minimum.at(dist, self.track[lo:hi], d)
+        return dist
+
+    def crossed(self, x1, z1, x2, z2, margin=5.0):
+        """Which tracks have a start/finish line the move (x1, z1)-(x2, z2) crosses."""
+        s = self.starts.astype(np.float64)
+        ax, az, bx, bz = s[:, 0], s[:, 1], s[:, 2], s[:, 3]
+        # extend the line by `margin` at each end, GT7 positions are sampled coarsely
+        length = np.hypot(bx - ax, bz - az)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            ux, uz = (bx - ax) / length, (bz - az) / length
+        ax, az, bx, bz = ax - ux * margin, az - uz * margin, bx + ux * margin, bz + uz * margin
+
+        def side(px, pz, qx, qz, rx, rz):
+            return np.sign((qx - px) * (rz - pz) - (qz - pz) * (rx - px))
+
+        with np.errstate(invalid="ignore"):
+            return (
+                (side(ax, az, bx, bz, x1, z1) != side(ax, az, bx, bz, x2, z2))
+                & (side(x1, z1, x2, z2, ax, az) != side(x1, z1, x2, z2, bx, bz))
+                & np.isfinite(length)
+            )
+
+_databases = {}
+
+def load_db(path=DEFAULT_DB):
+    """TrackDB.load, cached per path. Returns None when there is no database."""
+    if path not in _databases:
+        try:
+            _databases[path] = TrackDB.load(path)
+            l.info(f"loaded {len(_databases[path])} reference tracks from {path}")
+        except FileNotFoundError:
+            l.info(f"no track database at {path}, venues are not detected until one is compiled")
+            _databases[path] = None
+        except (OSError, KeyError, ValueError) as e:
+            l.warning(f"no track database, venues will not be detected: {e}")
+            _databases[path] = None
+    return _databases[path]
+
+class GT7TrackDetector:
+    """Identifies the venue from car positions while driving.
+
+    Keeps a log likelihood per reference track from the car's distance to
+    its centreline, measured every `step` metres travelled so consecutive
+    samples do not count twice, and a likelihood for "none of them" so
+    driving somewhere unknown stays unknown. A start/finish line crossing
+    at a lap boundary counts towards every track whose line was crossed.
+
+    `track_name` is set once one track holds `threshold` of the probability
+    and the car has covered `min_distance` metres.
+    """
+
+    def __init__(self, db=None, sigma=12.0, radius=64.0, step=10.0, min_distance=200.0, threshold=0.9):
+        self.db = db if db is not None else load_db()
+        self.sigma = sigma
+        self.radius = radius
+        self.step = step
+        self.min_distance = min_distance
+        self.threshold = threshold
+
+        n = len(self.db) if self.db else 0
+        self.loglik = np.zeros(n + 1)
+        self.distance = 0.0
+        self.last = None
+        self.track_name = None
+        self.probability = 0.0
+
+    def _score(self, dist):
+        d = np.minimum(dist, self.radius) / self.sigma
+        # an unknown track is as likely as being two sigma off a known one
+        return np.append(-0.5 * d * d, -2.0)
+
+    def _posterior(self):
+        p = np.exp(self.loglik - self.loglik.max())
+        p /= p.sum()
+        return p
+
+    def _decide(self):
+        p = self._posterior()
+        best = int(np.argmax(p[:-1])) if len(p) > 1 else None
+        if best is None:
+            return
+        self.probability = float(p[best])
+        if self.probability >= self.threshold and self.distance >= self.min_distance:
+            name = self.db.names[best]
+            if name != self.track_name:
+                l.info(f"detected track {name} ({self.probability:.3f}) after {self.distance:.0f}m")
+            self.track_name = name
+
+    def update(self, x, z):
+        if not self.db:
+            return
+        if self.last is not None:
+            moved = np.hypot(x - self.last[0], z - self.last[1])
+            if moved < self.step:
+                return
+            self.distance += moved
+        self.last = (x, z)
+
+        self.loglik += self._score(self.db.nearest(x, z, self.radius))
+        # keep the numbers small on long sessions
+        self.loglik -= self.loglik.max()
+        self._decide()
+
+    def guess(self, x1, z1, x2, z2):
+        """Counts a lap boundary between positions (x1, z1) and (x2, z2)."""
+        if not self.db:
+            return
+        crossed = self.db.crossed(x1, z1, x2, z2)
+        self.loglik[:-1] += np.where(crossed, 0.0, -4.0)
+        self.update(x2, z2)
+        self._decide()
+
+def learn(capture, name, lap=None):
+    """Reference entry for a track from one lap of a raw capture.
+
+    The centreline is the driven line of the lap, the start/finish line is
+    put across it where the lap counter changed. Packets that do not
+    decrypt are skipped.
+    """
+    from .capture import CaptureReader
+    from .telemetry import GT7DataPacket
+
+    reader = CaptureReader(capture)
+    try:
+        positions = {}
+        for _, data in reader:
+            try:
+                p = GT7DataPacket(bytes(data))
+            except ValueError:
+                continue
+            positions.setdefault(p.current_lap, []).append((p.position[0], p.position[2]))
+    finally:
+        reader.close()
+
+    laps = sorted(k for k in positions if k > 0 and k + 1 in positions)
+    if not laps:
+        raise ValueError(f"{capture} has no complete lap")
+    lap = lap if lap is not None else laps[0]
+
+    line = np.asarray(positions[lap])
+    sx, sz = line[0]
+    dx, dz = line[min(5, len(line) - 1)] - line[0]
+    norm = np.hypot(dx, dz) or 1.0
+    # 20m either side, across the direction of travel
+    nx, nz = -dz / norm * 20, dx / norm * 20
+
+    return {
+        "name": name,
+        "centreline": np.round(line, 2).tolist(),
+        "start": [[sx - nx, sz - nz], [sx + nx, sz + nz]],
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the reference track database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("learn", help="add a track to a JSON source file from a raw capture")
+    p.add_argument("source")
+    p.add_argument("name")
+    p.add_argument("capture")
+    p.add_argument("--lap", type=int)
+
+    p = sub.add_parser("compile", help="compile a JSON source file into the database")
+    p.add_argument("source")
+    p.add_argument("--output", default=DEFAULT_DB)
+    p.add_argument("--spacing", type=float, default=5.0)
+    p.add_argument("--cell", type=float, default=32.0)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "learn":
+        tracks = []
+        if os.path.exists(args.source):
+            with open(args.source) as f:
+                tracks = json.load(f)["tracks"]
+        tracks = [t for t in tracks if t["name"] != args.name]
+        tracks.append(learn(args.capture, args.name, args.lap))
+        with open(args.source, "w") as f:
+            json.dump({"tracks": tracks}, f)
+        print(f"{len(tracks)} tracks in {args.source}")
+    else:
+        with open(args.source) as f:
+            tracks = json.load(f)["tracks"]
+        db = TrackDB.compile(tracks, spacing=args.spacing, cell=args.cell)
+        db.save(args.output)
+        print(f"compiled {len(db)} tracks, {len(db.points)} points to {args.output}")
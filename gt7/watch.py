@@ -0,0 +1,186 @@
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import sys
+
+l = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# a file written in place or replaced by a rename, created or removed
+CHANGES = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+EVENT = struct.Struct("iIII")  # wd mask cookie len, then len bytes of name
+
+_libc = None
+
+def _load_libc():
+    global _libc
+    if _libc is None and sys.platform.startswith("linux"):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            _libc = libc
+        except (OSError, AttributeError):
+            _libc = False
+    return _libc or None
+
+class Inotify:
+    """inotify through ctypes, no third party package needed."""
+
+    def __init__(self):
+        libc = _load_libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path, mask=CHANGES):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"can not watch {path}")
+        return wd
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        """The pending events as (wd, mask, name), empty when there are none."""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, size = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + size].rstrip(b"\0").decode(errors="replace")
+            offset += size
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class DirectoryWatcher:
+    """Calls `callback(names)` with the files of `directory` that changed.
+
+    Uses inotify on Linux and falls back to polling the directory every
+    `interval` seconds elsewhere. Changes are gathered for `debounce`
+    seconds so a burst of writes, or a write and a rename, makes one call.
+    `names` limits it to those files. names is None for the callback when
+    changes may have been missed (an inotify overflow), so the caller should
+    rescan everything.
+    """
+
+    def __init__(self, directory, callback, names=None, debounce=0.2, interval=1.0):
+        self.directory = directory
+        self.callback = callback
+        self.names = set(names) if names else None
+        self.debounce = debounce
+        self.interval = interval
+        self.inotify = None
+        self.task = None
+        self.pending = set()
+        self.overflow = False
+        self.timer = None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        try:
+            self.inotify = Inotify()
+            self.inotify.add(self.directory)
+            self.loop.add_reader(self.inotify.fileno(), self._read)
+            l.info(f"watching {self.directory} with inotify")
+        except OSError as e:
+            if self.inotify:
+                self.inotify.close()
+                self.inotify = None
+            l.info(f"polling {self.directory} every {self.interval}s: {e}")
+            # taken now, changes made before the task first runs still count
+            self.task = asyncio.create_task(self._poll(self._scan()))
+
+    def _changed(self, names):
+        if names is None:
+            self.overflow = True
+        else:
+            if self.names is not None:
+                names = [n for n in names if n in self.names]
+            if not names:
+                return
+            self.pending.update(names)
+        if self.timer is None:
+            self.timer = self.loop.call_later(self.debounce, self._fire)
+
+    def _fire(self):
+        self.timer = None
+        names, self.pending = self.pending, set()
+        overflow, self.overflow = self.overflow, False
+        try:
+            self.callback(None if overflow else names)
+        except Exception as e:
+            l.error(f"error handling changes in {self.directory}: {e}")
+
+    def _read(self):
+        events = self.inotify.read()
+        if any(mask & IN_Q_OVERFLOW for _, mask, _ in events):
+            self._changed(None)
+        else:
+            self._changed([name for _, _, name in events if name])
+
+    def _scan(self):
+        state = {}
+        try:
+            for entry in os.scandir(self.directory):
+                if self.names is None or entry.name in self.names:
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    state[entry.name] = (st.st_mtime_ns, st.st_size, st.st_ino)
+        except FileNotFoundError:
+            pass
+        return state
+
+    async def _poll(self, before):
+        while True:
+            await asyncio.sleep(self.interval)
+            # the directory mtime only moves when entries come and go, files
+            # written in place are caught by comparing their own stat
+            after = self._scan()
+            changed = [n for n in before.keys() | after.keys() if before.get(n) != after.get(n)]
+            before = after
+            if changed:
+                self._changed(changed)
+
+    def stop(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if self.inotify:
+            self.loop.remove_reader(self.inotify.fileno())
+            self.inotify.close()
+            self.inotify = None
+        if self.task:
+            self.task.cancel()
+            self.task = None
@@ -0,0 +1,262 @@
+import os
+import struct
+from datetime import datetime
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+
+# MoTeC .ld layout, see https://github.com/gotzl/ldparser
+HEAD = struct.Struct(
+    "<"
+    "I4x"     # LD_MARKER
+    "II"      # CHANNEL_META_PTR CHANNEL_DATA_PTR
+    "20x"
+    "I"       # EVENT_PTR
+    "24x"
+    "HHH"     # STATIC
+    "I"       # DEVICE_SERIAL
+    "8s"      # DEVICE_TYPE
+    "H"       # DEVICE_VERSION
+    "H"       # STATIC
+    "I"       # NUM_CHANNELS
+    "4x"
+    "16s"     # DATE
+    "16x"
+    "16s"     # TIME
+    "16x"
+    "64s"     # DRIVER
+    "64s"     # VEHICLE_ID
+    "64x"
+    "64s"     # VENUE
+    "64x"
+    "1024x"
+    "I"       # PRO_LOGGING
+    "66x"
+    "64s"     # SHORT_COMMENT
+    "126x"
+)
+
+EVENT = struct.Struct("<64s64s1024sH")     # NAME SESSION COMMENT VENUE_PTR
+VENUE = struct.Struct("<64s1034xH")        # NAME VEHICLE_PTR
+VEHICLE = struct.Struct("<64s128xI32s32s") # ID WEIGHT TYPE COMMENT
+
+CHANNEL = struct.Struct(
+    "<"
+    "IIII"    # PREV_PTR NEXT_PTR DATA_PTR DATA_LEN
+    "H"       # COUNTER
+    "HHH"     # DATATYPE_A DATATYPE FREQ
+    "hhhh"    # SHIFT MUL SCALE DEC_PLACES
+    "32s"     # NAME
+    "8s"      # SHORT_NAME
+    "12s"     # UNIT
+    "40x"
+)
+
+EVENT_PTR = HEAD.size
+VENUE_PTR = EVENT_PTR + EVENT.size
+VEHICLE_PTR = VENUE_PTR + VENUE.size
+META_PTR = VEHICLE_PTR + VEHICLE.size
+
+DTYPE = np.dtype("<f4")
+
+def _s(value, size):
+    return str(value or "").encode("ascii", "replace")[:size]
+
+class LDStreamWriter:
+    """Writes a MoTeC .ld file incrementally while a session is running.
+
+    Each channel's samples must be contiguous in an .ld file, so channel data
+    lives in an extent holding `capacity` samples per channel. Blocks are
+    written straight into the extent as they arrive; when it fills up a new
+    extent of twice the size is allocated at the end of the file and the
+    samples logged so far are moved over. That keeps the cost per sample
+    amortised O(1) during the session, at the price of some dead space left
+    behind by old extents, and lets close() finish in constant time by only
+    patching the header, event and channel metadata plus the .ldx laps. Size
+    `capacity` for the expected session and the extent never has to grow.
+    """
+
+    def __init__(self, path, channels, freq=60, capacity=16384):
+        self.path = path
+        self.freq = freq
+        self.names = []
+        self.units = []
+        for c in channels:
+            if isinstance(c, dict):
+                self.names.append(c.get("name"))
+                self.units.append(c.get("units", ""))
+            else:
+                self.names.append(c)
+                self.units.append("")
+
+        self.event = {}
+        self.laps = []
+        self.laptimes = []
+        self.count = 0
+        self.capacity = capacity
+        self.extent_ptr = META_PTR + CHANNEL.size * len(self.names)
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._write_meta()
+
+    def _data_ptr(self, index, extent_ptr=None, capacity=None):
+        extent_ptr = self.extent_ptr if extent_ptr is None else extent_ptr
+        capacity = self.capacity if capacity is None else capacity
+        return extent_ptr + index * capacity * DTYPE.itemsize
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+
+        extent_ptr = os.fstat(self.fd).st_size
+        extent_ptr = max(extent_ptr, self.extent_ptr + len(self.names) * self.capacity * DTYPE.itemsize)
+        length = self.count * DTYPE.itemsize
+
+        for i in range(len(self.names)):
+            src = self._data_ptr(i)
+            dst = self._data_ptr(i, extent_ptr, capacity)
+            if length:
+                os.pwrite(self.fd, os.pread(self.fd, length, src), dst)
+
+        self.extent_ptr = extent_ptr
+        self.capacity = capacity
+
+    def append(self, block):
+        """Appends a (samples, channels) block of rows to the file."""
+        block = np.asarray(block)
+        n = len(block)
+        if not n:
+            return
+
+        if self.count + n > self.capacity:
+            self._grow(self.count + n)
+
+        offset = self.count * DTYPE.itemsize
+        for i in range(len(self.names)):
+            data = np.ascontiguousarray(block[:, i], dtype=DTYPE)
+            os.pwrite(self.fd, data.tobytes(), self._data_ptr(i) + offset)
+
+        self.count += n
+
+    def add_lap(self, time, laptime):
+        """Marks a lap beacon `time` seconds after the start of the log."""
+        self.laps.append(time)
+        self.laptimes.append(laptime)
+
+    def update_event(self, event):
+        self.event = dict(event)
+
+    def _write_meta(self):
+        event = self.event
+        try:
+            then = datetime.strptime(event.get("datetime", ""), "%Y-%m-%dT%H:%M:%S")
+        except ValueError:
+            then = datetime.now()
+
+        head = HEAD.pack(
+            0x40,
+            META_PTR, self._data_ptr(0), EVENT_PTR,
+            1, 0x4240, 0xf,
+            0x1f44, b"ADL", 420, 0xadb0, len(self.names),
+            then.strftime("%d/%m/%Y").encode(),
+            then.strftime("%H:%M:%S").encode(),
+            _s(event.get("driver"), 64),
+            _s(event.get("vehicle"), 64),
+            _s(event.get("venue"), 64),
+            0xc81a4,
+            _s(event.get("shortcomment"), 64),
+        )
+        meta = [
+            head,
+            EVENT.pack(_s(event.get("name"), 64), _s(event.get("session"), 64), _s(event.get("comment"), 1024), VENUE_PTR),
+            VENUE.pack(_s(event.get("venue"), 64), VEHICLE_PTR),
+            VEHICLE.pack(_s(event.get("vehicle"), 64), 0, b"", b""),
+        ]
+
+        for i, (name, unit) in enumerate(zip(self.names, self.units)):
+            ptr = META_PTR + i * CHANNEL.size
+            prev_ptr = ptr - CHANNEL.size if i else 0
+            next_ptr = ptr + CHANNEL.size if i < len(self.names) - 1 else 0
+            meta.append(CHANNEL.pack(
+                prev_ptr, next_ptr, self._data_ptr(i), self.count,
+                0x2ee1 + i,
+                0x07, DTYPE.itemsize, int(self.freq),
+                0, 1, 1, 0,
+                _s(name, 32), _s(name, 8), _s(unit, 12),
+            ))
+
+        os.pwrite(self.fd, b"".join(meta), 0)
+
+    def _write_ldx(self):
+        if not self.laps:
+            return
+
+        markers = []
+        for i, time in enumerate(self.laps):
+            markers.append(
+                f'     <Marker Version="100" ClassName="BCN" Name="Manual.{i + 1}"'
+                f' Flags="77" Time="{int(time * 1e6)}"/>'
+            )
+
+        fastest = min(range(len(self.laptimes)), key=self.laptimes.__getitem__)
+        minutes, seconds = divmod(self.laptimes[fastest], 60)
+
+        details = [
+            ("Total Laps", len(self.laps)),
+            ("Fastest Time", f"{int(minutes)}:{seconds:06.3f}"),
+            ("Fastest Lap", fastest + 1),
+        ]
+
+        lines = [
+            '<?xml version="1.0"?>',
+            '<LDXFile Locale="English_United Kingdom.1252" DefaultLocale="C" Version="1.6">',
+            ' <Layers>',
+            '  <Layer>',
+            '   <MarkerBlock>',
+            '    <MarkerGroup Name="Beacons" Index="3">',
+            *markers,
+            '    </MarkerGroup>',
+            '   </MarkerBlock>',
+            '   <RangeBlock/>',
+            '  </Layer>',
+            '  <Details>',
+            *[f'   <String Id={quoteattr(k)} Value={quoteattr(str(v))}/>' for k, v in details],
+            '  </Details>',
+            ' </Layers>',
+            '</LDXFile>',
+        ]
+        with open(os.path.splitext(self.path)[0] + ".ldx", "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def detach(self):
+        """Closes the file here and returns the state resume() needs to finish it elsewhere."""
+        state = {
+            name: getattr(self, name)
+            for name in ("path", "freq", "names", "units", "event", "laps", "laptimes", "count", "capacity", "extent_ptr")
+        }
+        os.close(self.fd)
+        self.fd = None
+        return state
+
+    @classmethod
+    def resume(cls, state):
+        """Reopens a file given up with detach(), in this or another process."""
+        self = cls.__new__(cls)
+        self.__dict__.update(state)
+        self.fd = os.open(self.path, os.O_RDWR)
+        return self
+
+    def close(self, event=None):
+        """Patches the metadata for the samples written so far and closes the file."""
+        if self.fd is None:
+            return
+        if event is not None:
+            self.update_event(event)
+
+        self._write_meta()
+        self._write_ldx()
+        # the last channel of the current extent ends the file, drop its spare capacity
+        os.ftruncate(self.fd, self._data_ptr(len(self.names) - 1) + self.count * DTYPE.itemsize)
+        os.close(self.fd)
+        self.fd = None
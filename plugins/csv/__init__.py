@@ -1,3 +1,30 @@
+import os
+
+import numpy as np
+
 class CSVOutput:
-    def output(self, data):
-        print("Outputting to CSV")
+    """Appends every block to a CSV file, one row per packet."""
+
+    def __init__(self, path="./logs/pipeline.csv"):
+        self.path = path
+        self.file = None
+        self.names = None
+
+    def output(self, block):
+        if not len(block):
+            return
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.file = open(self.path, "w")
+            self.names = list(block.columns)
+            self.file.write(",".join(self.names) + "\n")
+
+        data = np.column_stack([np.asarray(block.columns[n], dtype=np.float64) for n in self.names])
+        np.savetxt(self.file, data, delimiter=",", fmt="%.6g")
+
+    def close(self, meta):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+PLUGIN = CSVOutput
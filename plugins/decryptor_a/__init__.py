@@ -1,4 +1,30 @@
+import struct
+
+import numpy as np
+
+from gt7.telemetry import Salsa20
+
+KEY = b'Simulator Interface Packet GT7 ver 0.0'[:32]
+MAGIC = 0x47375330
+
 class Salsa20Decryptor:
-    def decrypt(self, data):
-        print("Decrypting with Salsa20Decryptor")
-        return data
+    """Decrypts packet A, the 296 byte packet sent for heartbeat "A"."""
+
+    xor = 0xDEADBEAF
+
+    def decrypt(self, timestamps, datagrams):
+        keep = []
+        packets = []
+        for i, dat in enumerate(datagrams):
+            if len(dat) < 0x44:
+                continue
+            iv1 = int.from_bytes(dat[0x40:0x44], byteorder='little')
+            cipher = Salsa20.new(key=KEY, nonce=struct.pack('<II', iv1 ^ self.xor, iv1))
+            ddata = cipher.decrypt(dat)
+            if int.from_bytes(ddata[0:4], byteorder='little') != MAGIC:
+                continue
+            keep.append(i)
+            packets.append(ddata)
+        return np.asarray(timestamps)[keep], packets
+
+PLUGIN = Salsa20Decryptor
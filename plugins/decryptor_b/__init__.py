@@ -1,4 +1,8 @@
-class Salsa20PacketBDecryptor:
-    def decrypt(self, data):
-        print("Decrypting with Salsa20PacketBDecryptor")
-        return data
+from plugins.decryptor_a import Salsa20Decryptor
+
+class Salsa20PacketBDecryptor(Salsa20Decryptor):
+    """Decrypts packet B, the 316 byte packet sent for heartbeat "B"."""
+
+    xor = 0xDEADBEEF
+
+PLUGIN = Salsa20PacketBDecryptor
@@ -1,4 +1,19 @@
+from gt7 import gps
+
 class MapProjectionPlugin:
-    def enrich(self, data):
-        print("Enriching with MapProjectionPlugin")
-        return data
+    """Adds lat and long columns projected from the world position."""
+
+    def __init__(self, origin=gps.ORIGIN):
+        self.origin = tuple(origin)
+
+    def enrich(self, block):
+        c = block.columns
+        c["lat"], c["long"] = gps.convert(
+            x=c["position_x"].astype("f8"),
+            z=-c["position_z"].astype("f8"),
+            latmid=self.origin[0],
+            longmid=self.origin[1],
+        )
+        return block
+
+PLUGIN = MapProjectionPlugin
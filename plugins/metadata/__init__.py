@@ -1,4 +1,17 @@
 class MetadataPlugin:
-    def enrich(self, data):
-        print("Enriching with MetadataPlugin")
-        return data
+    """Keeps the car, lap count and lap times of the latest packet in the block meta."""
+
+    def enrich(self, block):
+        c = block.columns
+        if len(block):
+            block.meta.update(
+                car_code=int(c["car_code"][-1]),
+                current_lap=int(c["current_lap"][-1]),
+                laps=int(c["laps"][-1]),
+                best_laptime=int(c["best_laptime"][-1]) / 1000.0,
+                last_laptime=int(c["last_laptime"][-1]) / 1000.0,
+                in_race=bool(c["in_race"][-1]),
+            )
+        return block
+
+PLUGIN = MetadataPlugin
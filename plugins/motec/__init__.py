@@ -1,3 +1,34 @@
+import os
+
+import numpy as np
+
+from gt7.writer.ld_stream import LDStreamWriter
+
 class MoTeCWriter:
-    def output(self, data):
-        print("Outputting to MoTeC")
+    """Streams every numeric column of the blocks to a MoTeC .ld file."""
+
+    def __init__(self, path="./logs/pipeline.ld", freq=60, channels=None):
+        self.path = path
+        self.freq = freq
+        self.channels = channels
+        self.writer = None
+
+    def output(self, block):
+        if not len(block):
+            return
+        if self.writer is None:
+            self.channels = self.channels or [
+                name for name, values in block.columns.items()
+                if name != "timestamp" and np.asarray(values).dtype.kind in "biuf"
+            ]
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.writer = LDStreamWriter(self.path, self.channels, freq=self.freq)
+
+        self.writer.append(np.column_stack([block.columns[n] for n in self.channels]))
+
+    def close(self, meta):
+        if self.writer:
+            self.writer.close({k: str(v) for k, v in meta.items()})
+            self.writer = None
+
+PLUGIN = MoTeCWriter
@@ -1,4 +1,18 @@
+import numpy as np
+
+from gt7.batch import decode_batch
+from gt7.pipeline import Block
+from gt7.telemetry import GT7DataPacket
+
 class PacketAParser:
-    def parse(self, data):
-        print("Parsing with PacketAParser")
-        return {}
+    min_size = GT7DataPacket.size
+
+    def parse(self, timestamps, packets):
+        # decode_batch skips short packets, their timestamps go with them
+        keep = np.fromiter((len(p) >= self.min_size for p in packets), dtype=bool, count=len(packets))
+        records = decode_batch([p for p, k in zip(packets, keep) if k], encrypted=False)
+        columns = {"timestamp": np.asarray(timestamps)[keep]}
+        columns.update((name, records[name]) for name in records.dtype.names)
+        return Block(columns)
+
+PLUGIN = PacketAParser
@@ -1,4 +1,24 @@
-class PacketBParser:
-    def parse(self, data):
-        print("Parsing with PacketBParser")
-        return {}
+import numpy as np
+
+from plugins.parser_a import PacketAParser
+
+# fields packet B adds after the 296 bytes of packet A
+EXTRA_DTYPE = np.dtype({
+    "names": ["wheel_rotation", "sway", "heave", "surge"],
+    "formats": ["<f4", "<f4", "<f4", "<f4"],
+    "offsets": [0x128, 0x130, 0x134, 0x138],
+    "itemsize": 0x13C,
+})
+
+class PacketBParser(PacketAParser):
+    min_size = EXTRA_DTYPE.itemsize
+
+    def parse(self, timestamps, packets):
+        block = super().parse(timestamps, packets)
+        packets = [p for p in packets if len(p) >= self.min_size]
+        extra = np.frombuffer(b"".join(bytes(p[:EXTRA_DTYPE.itemsize]) for p in packets), dtype=EXTRA_DTYPE)
+        for name in EXTRA_DTYPE.names:
+            block.columns[name] = extra[name].copy()
+        return block
+
+PLUGIN = PacketBParser
@@ -1,4 +1,32 @@
+from gt7.tracks import GT7TrackDetector, load_db, DEFAULT_DB
+
 class TrackDetectPlugin:
-    def enrich(self, data):
-        print("Enriching with TrackDetectPlugin")
-        return data
+    """Sets the venue in the block meta once the track is recognised."""
+
+    # one detector update per packet, keep it off the receive loop
+    cpu_bound = True
+
+    def __init__(self, track_db=DEFAULT_DB):
+        self.db = load_db(track_db)
+        self.detector = GT7TrackDetector(self.db) if self.db else None
+        self.lap = None
+
+    def enrich(self, block):
+        if not self.detector or not len(block):
+            return block
+
+        c = block.columns
+        x, z, lap = c["position_x"], c["position_z"], c["current_lap"]
+        for i in range(len(block)):
+            if self.lap is not None and lap[i] > self.lap and i:
+                self.detector.guess(x[i - 1], z[i - 1], x[i], z[i])
+            else:
+                self.detector.update(x[i], z[i])
+            self.lap = lap[i]
+
+        if self.detector.track_name:
+            block.meta["venue"] = self.detector.track_name
+        block.meta["track_probability"] = self.detector.probability
+        return block
+
+PLUGIN = TrackDetectPlugin
@@ -17,6 +17,6 @@ if [ ! -f "config.yml" ]; then
 fi
 
 # Run a sample parse and .ld export
-python gt7.py
+python gt7.py --no-listen
 
 echo "Success: .ld file generated at path specified in config.yml"
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# the tests import gt7 and plugins from the checkout, not an installed copy
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def lap_datagrams():
+    """Encrypted datagrams of two synthetic laps, as the console sends them."""
+    from gt7.synth import datagrams
+
+    return list(datagrams(laps=2, seed=1))
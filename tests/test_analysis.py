@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from gt7.analysis import LapAnalysis
+
+FREQ = 60
+
+def _session(lap_speeds, length=1000.0, order=("speed", "beacon", "lap", "rpm"), rpm=5000.0):
+    """Laps of `length` metres, each at a constant speed in m/s."""
+    speed, beacon, lap = [], [], []
+    for number, v in enumerate(lap_speeds, 1):
+        n = int(round(length / v * FREQ))
+        speed.append(np.full(n, v * 3.6))
+        marks = np.zeros(n)
+        marks[0] = 1
+        beacon.append(marks)
+        lap.append(np.full(n, number))
+    # the beacon that closes the last lap
+    speed.append([lap_speeds[-1] * 3.6])
+    beacon.append([1])
+    lap.append([len(lap_speeds) + 1])
+    channels = {"speed": np.concatenate(speed), "beacon": np.concatenate(beacon), "lap": np.concatenate(lap)}
+    channels["rpm"] = np.full(len(channels["speed"]), rpm)
+    return {name: channels[name] for name in order}
+
+def test_laps_and_best():
+    analysis = LapAnalysis(_session([50.0, 40.0, 50.0]), freq=FREQ, points=201)
+    assert [lap.number for lap in analysis.laps] == [1, 2, 3]
+    assert [lap.time for lap in analysis.laps] == pytest.approx([20.0, 25.0, 20.0], abs=0.02)
+    assert [lap.length for lap in analysis.laps] == pytest.approx([1000.0] * 3, rel=0.01)
+    assert analysis.best() in (0, 2)
+
+def test_delta_grows_along_the_lap():
+    analysis = LapAnalysis(_session([50.0, 40.0]), freq=FREQ, points=201)
+    result = analysis.compare(1, reference=0)
+    # 5 s lost evenly over the lap
+    assert result["delta"][-1] == pytest.approx(5.0, abs=0.05)
+    assert result["delta"][100] == pytest.approx(2.5, abs=0.05)
+    assert result["distance"][-1] == pytest.approx(1000.0, rel=0.01)
+    assert np.all(np.diff(result["delta"]) >= -1e-6)
+    assert result["channels"]["speed"][100] == pytest.approx(-36.0, abs=0.1)
+
+def test_compare_all_matches_compare():
+    analysis = LapAnalysis(_session([50.0, 40.0, 45.0]), freq=FREQ, points=101)
+    every = analysis.compare_all()
+    for i in range(len(analysis.laps)):
+        np.testing.assert_allclose(every["delta"][i], analysis.compare(i)["delta"])
+
+def test_reference_from_another_session():
+    this = LapAnalysis(_session([50.0, 40.0], rpm=6000.0), freq=FREQ, points=101)
+    other = LapAnalysis(_session([50.0], order=("rpm", "lap", "beacon", "speed")), freq=FREQ, points=101)
+    result = this.compare(1, reference=other.resample(0))
+    assert result["delta"][-1] == pytest.approx(5.0, abs=0.05)
+    # columns are paired by name, not position
+    assert result["channels"]["rpm"][50] == pytest.approx(1000.0)
+    assert result["channels"]["speed"][50] == pytest.approx(-36.0, abs=0.1)
+
+def test_reference_with_other_points():
+    this = LapAnalysis(_session([50.0, 40.0]), freq=FREQ, points=101)
+    other = LapAnalysis(_session([50.0]), freq=FREQ, points=51)
+    with pytest.raises(ValueError):
+        this.compare(0, reference=other.resample(0))
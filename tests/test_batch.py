@@ -0,0 +1,23 @@
+import pytest
+
+from gt7.batch import decode_batch
+from gt7.telemetry import GT7DataPacket
+
+FIELDS = ("tick", "current_lap", "rpm", "speed", "gear", "throttle", "brake", "current_fuel")
+
+def test_decode_batch_matches_packets(lap_datagrams):
+    datagrams = lap_datagrams[:600]
+    records = decode_batch(datagrams)
+    assert len(records) == len(datagrams)
+    for record, data in zip(records[::37], datagrams[::37]):
+        p = GT7DataPacket(data)
+        for name in FIELDS:
+            assert record[name] == pytest.approx(getattr(p, name)), name
+
+def test_decode_batch_drops_bad_packets(lap_datagrams):
+    good = lap_datagrams[:10]
+    corrupt = bytearray(good[3])
+    # the magic no longer decrypts
+    corrupt[0] ^= 0xFF
+    records = decode_batch(good[:3] + [bytes(corrupt), b"short"] + good[4:])
+    assert list(records["tick"]) == [GT7DataPacket(d).tick for d in good[:3] + good[4:]]
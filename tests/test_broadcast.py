@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import numpy as np
+
+from gt7.broadcast import FRAME_HEADER, Broadcaster
+
+class Socket:
+    def __init__(self, stall=False):
+        self.text = []
+        self.frames = []
+        self.stall = asyncio.Event() if stall else None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.text.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        if self.stall:
+            await self.stall.wait()
+        self.frames.append(data)
+
+def _decode(frame):
+    (timestamp,) = FRAME_HEADER.unpack_from(frame)
+    return timestamp, np.frombuffer(frame, dtype="<f4", offset=FRAME_HEADER.size).tolist()
+
+def test_subsets_decimation_and_a_stalled_client():
+    async def run():
+        broadcaster = Broadcaster(["speed", "rpm", {"name": "gear"}], maxlen=4)
+        full, subset, stalled = Socket(), Socket(), Socket(stall=True)
+        await broadcaster.connect(full)
+        await broadcaster.connect(subset, every=2, channels=["gear", "speed", "missing"])
+        slow = await broadcaster.connect(stalled)
+        for i in range(10):
+            broadcaster.publish(i / 60, [i, 1000 + i, 2])
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        stats = broadcaster.stats()
+        broadcaster.disconnect(stalled)
+        return broadcaster, full, subset, slow, stats
+
+    broadcaster, full, subset, slow, stats = asyncio.run(run())
+    assert full.text == [{"channels": ["speed", "rpm", "gear"], "every": 1}]
+    assert subset.text == [{"channels": ["gear", "speed"], "every": 2}]
+    assert [_decode(f) for f in full.frames] == [(i / 60, [i, 1000 + i, 2]) for i in range(10)]
+    assert [_decode(f) for f in subset.frames] == [(i / 60, [2, i]) for i in range(0, 10, 2)]
+    # the stalled client only held up itself, and kept its newest frames
+    assert slow.dropped == 5 and _decode(slow.queue[-1])[0] == 9 / 60
+    assert [s["sent"] for s in stats] == [10, 5, 0]
+    assert len(broadcaster.clients) == 2
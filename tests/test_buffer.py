@@ -0,0 +1,41 @@
+import numpy as np
+
+from gt7.buffer import SampleBuffer
+
+def _rows(n, channels=3):
+    return np.arange(n * channels, dtype=np.float64).reshape(n, channels)
+
+def test_append_and_extend_across_chunks():
+    rows = _rows(25)
+    buffer = SampleBuffer(["a", {"name": "b", "units": "m"}, "c"], chunk_size=8)
+    for row in rows[:5]:
+        buffer.append(row)
+    buffer.extend(rows[5:])
+    assert len(buffer) == 25
+    assert [len(b) for b in buffer.blocks()] == [8, 8, 8, 1]
+    np.testing.assert_array_equal(buffer.array(), rows)
+    np.testing.assert_array_equal(buffer.columns()["b"], rows[:, 1])
+    np.testing.assert_array_equal(buffer.last(), rows[-1])
+    # every channel of a chunk is contiguous
+    assert all(b[:, 0].flags["C_CONTIGUOUS"] for b in buffer.blocks())
+
+def test_single_chunk_is_a_view():
+    buffer = SampleBuffer(["a", "b", "c"], chunk_size=8)
+    buffer.extend(_rows(5))
+    assert np.shares_memory(buffer.array(), buffer.current)
+
+def test_sink_gets_full_chunks_and_the_rest_on_flush():
+    blocks = []
+    buffer = SampleBuffer(["a", "b", "c"], chunk_size=8, sink=lambda block: blocks.append(block.copy()))
+    rows = _rows(21)
+    buffer.extend(rows)
+    assert [len(b) for b in blocks] == [8, 8]
+    assert buffer.chunks == []
+    np.testing.assert_array_equal(buffer.pending(), rows[16:])
+
+    buffer.flush()
+    assert len(buffer) == 21 and not len(buffer.pending())
+    np.testing.assert_array_equal(np.vstack(blocks), rows)
+
+    buffer.clear()
+    assert not buffer
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from gt7.bus import EventBus
+
+def test_topics_and_overflow():
+    bus = EventBus()
+    samples = bus.subscribe("samples", topics=("sample",), maxlen=3)
+    newest = bus.subscribe("laps", topics=("lap",), maxlen=1, overflow="drop_newest")
+    for i in range(5):
+        bus.publish("sample", (i, None))
+    bus.publish("lap", (1, {"lap": 1}))
+    bus.publish("lap", (2, {"lap": 2}))
+    bus.publish("session", (3, {"state": "end"}))
+
+    # a slow subscriber loses its oldest events, and only its own
+    assert [samples.get_nowait()[1][0] for _ in range(samples.lag)] == [2, 3, 4]
+    assert newest.get_nowait() == ("lap", (1, {"lap": 1}))
+    stats = bus.stats()
+    assert stats["samples"] == {"topics": ["sample"], "lag": 0, "delivered": 3, "dropped": 2}
+    assert stats["laps"]["dropped"] == 1
+
+    samples.close()
+    bus.publish("sample", (5, None))
+    assert "samples" not in bus.stats() and not samples.lag
+
+def test_get_waits_for_an_event():
+    async def run():
+        bus = EventBus()
+        sub = bus.subscribe("all")
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, bus.publish, "session", (0, {"state": "start"}))
+        return await asyncio.wait_for(sub.get(), 1)
+    assert asyncio.run(run()) == ("session", (0, {"state": "start"}))
+
+def test_unknown_topic_or_policy():
+    bus = EventBus()
+    with pytest.raises(ValueError):
+        bus.subscribe("x", topics=("laps",))
+    with pytest.raises(ValueError):
+        bus.subscribe("x", overflow="block")
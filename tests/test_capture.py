@@ -0,0 +1,66 @@
+from gt7.capture import CaptureWriter, CaptureReader
+from gt7.telemetry import GT7DataPacket
+
+def _capture(path, datagrams, close=True, **options):
+    writer = CaptureWriter(path, **options)
+    for n, data in enumerate(datagrams):
+        p = GT7DataPacket(data)
+        writer.write(n / 60, data, p.tick, p.current_lap)
+    if close:
+        writer.close()
+    else:
+        # as a logger that died leaves it
+        writer.f.flush()
+    return writer
+
+def test_round_trip(tmp_path, lap_datagrams):
+    path = str(tmp_path / "a.gt7raw")
+    _capture(path, lap_datagrams, compress=True)
+    reader = CaptureReader(path)
+    try:
+        records = list(reader.records())
+        assert len(reader) == len(lap_datagrams)
+        assert [bytes(data) for _, _, data in records] == lap_datagrams
+        assert [timestamp for timestamp, _, _ in records] == [n / 60 for n in range(len(lap_datagrams))]
+    finally:
+        reader.close()
+
+def test_seek(tmp_path, lap_datagrams):
+    path = str(tmp_path / "a.gt7raw")
+    _capture(path, lap_datagrams)
+    reader = CaptureReader(path)
+    try:
+        ticks = [tick for _, tick, _ in reader.records(tick=1234)]
+        assert ticks[0] == 1234 and ticks == sorted(ticks)
+        # lap seeking starts in the block before the lap, so the change is seen
+        laps = [GT7DataPacket(data).current_lap for _, _, data in reader.records(lap=2)]
+        assert laps[0] == 1 and 2 in laps
+    finally:
+        reader.close()
+
+def test_unclosed_capture(tmp_path, lap_datagrams):
+    closed, unclosed = str(tmp_path / "closed.gt7raw"), str(tmp_path / "unclosed.gt7raw")
+    _capture(closed, lap_datagrams)
+    writer = _capture(unclosed, lap_datagrams, close=False)
+    a, b = CaptureReader(closed), CaptureReader(unclosed)
+    try:
+        # the block still being gathered is all that is lost
+        assert len(b) == len(lap_datagrams) - writer.records
+        assert writer.records < 60
+        # the scan finds the same laps the index records
+        assert [e[2] for e in b.index] == [e[2] for e in a.index[:len(b.index)]]
+        assert sum(1 for _ in b.records(lap=2)) > 0
+    finally:
+        a.close()
+        b.close()
+
+def test_truncated_block_is_skipped(tmp_path, lap_datagrams):
+    path = str(tmp_path / "cut.gt7raw")
+    _capture(path, lap_datagrams[:600], close=False, block_records=100, max_age=60)
+    with open(path, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 10)
+    reader = CaptureReader(path)
+    try:
+        assert len(reader) == 500
+    finally:
+        reader.close()
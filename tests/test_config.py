@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+
+import yaml
+
+from gt7.config import Config, SettingsWatcher
+from gt7.derived import MS_TO_MPH
+from gt7.telemetry import GT7Logger
+
+def test_config_writes_a_burst_once(tmp_path):
+    path = str(tmp_path / "config.yml")
+    config = Config(path, delay=60)
+    mtime = os.stat(path).st_mtime_ns
+    for i in range(10):
+        config.set("driver", f"Driver {i}")
+    config.set("session", "Qualifying")
+    # nothing is written until the delay is up or flush() is called
+    assert os.stat(path).st_mtime_ns == mtime
+    config.flush()
+    assert config.timer is None
+    with open(path) as f:
+        data = yaml.safe_load(f)
+    assert (data["driver"], data["session"]) == ("Driver 9", "Qualifying")
+
+def test_watcher_reports_changed_keys(tmp_path):
+    config = tmp_path / "config.yml"
+    settings = tmp_path / "service_settings.json"
+    config.write_text("driver: Config\ngap_fill: hold\n")
+    settings.write_text(json.dumps({"driver": "Settings"}))
+    calls = []
+
+    async def run():
+        watcher = SettingsWatcher([str(config), str(settings)], calls.append, debounce=0.05)
+        # the later file wins
+        assert watcher.settings == {"driver": "Settings", "gap_fill": "hold"}
+        await watcher.start()
+        try:
+            tmp = str(settings) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"driver": "Renamed", "session": "Race"}, f)
+            os.replace(tmp, settings)
+            for _ in range(100):
+                if calls:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            watcher.stop()
+
+    asyncio.run(run())
+    assert calls == [{"driver": "Renamed", "session": "Race"}]
+
+def test_apply_settings():
+    logger = GT7Logger(driver="Before")
+    logger.derive = logger.new_derive()
+    applied = logger.apply_settings({"driver": "After", "gap_fill": "linear", "max_gap": 30, "imperial": True, "ps_ip": "1.2.3.4"})
+    assert applied == {"driver", "gap_fill", "max_gap", "imperial"}
+    assert (logger.event["driver"], logger.gap_fill, logger.max_gap) == ("After", "linear", 30)
+    # the running session switches units as well as the next one
+    assert logger.derive.ms_to_speed == MS_TO_MPH
+
+def test_apply_settings_keeps_invalid_values_out():
+    logger = GT7Logger()
+    for settings in ({"gap_fill": "cubic"}, {"max_gap": -1}, {"max_gap": "lots"}, {"replay": "yes"}):
+        logger.apply_settings(settings)
+    assert (logger.gap_fill, logger.max_gap, logger.replay) == ("hold", 60, False)
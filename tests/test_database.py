@@ -0,0 +1,123 @@
+import sqlite3
+import time
+
+from gt7.database import Database, SCHEMA
+
+def _v1(path):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        driver TEXT, vehicle TEXT, venue TEXT, session TEXT, best_lap REAL
+    )""")
+    conn.executemany(
+        "INSERT INTO sessions (timestamp, driver, venue, best_lap) VALUES (?, ?, ?, ?)",
+        [("2026-01-02 10:00:00", "b", "Suzuka", 91.0), ("2026-01-01 10:00:00", "a", "Monza", 90.0)],
+    )
+    conn.commit()
+    conn.close()
+
+def _wait(db, count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if sum(s["laps"] for s in db.get_sessions(limit=100)) >= count:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"{count} laps not committed")
+
+def test_migrates_version_1(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    _v1(path)
+    db = Database(path, flush_interval=0.1)
+    db.create_tables()
+    try:
+        sessions = db.get_sessions()
+        assert [(s["driver"], s["best_lap"], s["laps"]) for s in sessions] == [("b", 91.0, 1), ("a", 90.0, 1)]
+        assert db.get_sessions(venue="Monza")[0]["driver"] == "a"
+    finally:
+        db.close()
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "sessions.db")
+    _v1(path)
+    db = Database(path)
+
+    def fail(cursor):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(db, "_create", fail)
+    db.create_tables()
+    db.close()
+
+    conn = sqlite3.connect(path)
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "sessions_v1" not in tables
+    assert "best_lap" in [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+
+def test_sessions_sort_in_utc(tmp_path, monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    path = str(tmp_path / "sessions.db")
+    try:
+        # version 2 left local times next to CURRENT_TIMESTAMP in UTC
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.execute("PRAGMA user_version = 2")
+        conn.execute("INSERT INTO sessions (started_at, driver) VALUES ('2026-10-18T08:00:00', 'local')")
+        conn.execute("INSERT INTO sessions (started_at, driver) VALUES ('2026-10-18 11:00:00', 'utc')")
+        conn.commit()
+        conn.close()
+
+        db = Database(path, flush_interval=0.1)
+        db.create_tables()
+        try:
+            db.insert_session({"datetime": "2026-10-18T06:30:00", "driver": "new", "lap": 1, "best_lap": 90.0})
+            _wait(db, 1)
+            sessions = db.get_sessions()
+            # 08:00 in New York is 12:00 UTC, 06:30 is 10:30
+            assert [(s["driver"], s["timestamp"]) for s in sessions] == [
+                ("local", "2026-10-18 12:00:00"),
+                ("utc", "2026-10-18 11:00:00"),
+                ("new", "2026-10-18 10:30:00"),
+            ]
+        finally:
+            db.close()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+def test_steady_writes_commit(tmp_path):
+    db = Database(str(tmp_path / "sessions.db"), flush_interval=0.2)
+    db.create_tables()
+    try:
+        # never idle for flush_interval, the deadline still commits
+        for lap in range(12):
+            db.insert_session({"driver": "x", "lap": lap, "best_lap": 90.0})
+            time.sleep(0.05)
+        assert db.get_sessions()[0]["laps"] >= 4
+    finally:
+        db.close()
+
+def test_session_keeps_its_laps_when_names_change(tmp_path):
+    db = Database(str(tmp_path / "sessions.db"), flush_interval=0.1)
+    db.create_tables()
+    try:
+        start = {"datetime": "2026-10-18T10:00:00", "driver": "a", "venue": "", "console": "car1"}
+        db.insert_session(dict(start, lap=1, best_lap=92.0))
+        _wait(db, 1)
+        # the track detector names the venue, then the driver is changed
+        db.insert_session(dict(start, venue="Suzuka", lap=2, best_lap=91.0))
+        db.insert_session(dict(start, venue="Suzuka", driver="b", lap=3, best_lap=90.5))
+        # another car that started in the same second
+        db.insert_session(dict(start, console="car2", lap=1, best_lap=95.0))
+        _wait(db, 4)
+        sessions = sorted(db.get_sessions(), key=lambda s: s["laps"])
+        assert [(s["driver"], s["venue"], s["laps"], s["best_lap"]) for s in sessions] == [
+            ("a", "", 1, 95.0),
+            ("b", "Suzuka", 3, 90.5),
+        ]
+    finally:
+        db.close()
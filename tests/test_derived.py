@@ -0,0 +1,47 @@
+import numpy as np
+
+from gt7.derived import MS_TO_KPH, MS_TO_MPH, RAW_COLUMNS, DerivedChannels
+from gt7.telemetry import GT7Logger
+
+def _raw(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    raw = rng.uniform(0, 100, size=(n, len(RAW_COLUMNS)))
+    raw[:, RAW_COLUMNS.index('rotation_w')] = 1
+    raw[:, [RAW_COLUMNS.index(c) for c in ('rotation_x', 'rotation_y', 'rotation_z')]] = 0
+    raw[:, RAW_COLUMNS.index('in_race')] = 1
+    return raw
+
+def _column(derive, out, name):
+    return out[:, derive.names.index(name)]
+
+def test_blocks_match_one_call():
+    raw = _raw()
+    whole = DerivedChannels(GT7Logger.channels)(raw)
+    derive = DerivedChannels(GT7Logger.channels)
+    blocks = np.vstack([derive(raw[i:i + 37]) for i in range(0, len(raw), 37)])
+    np.testing.assert_allclose(blocks, whole)
+
+def test_units():
+    raw = _raw(10)
+    speed = raw[:, RAW_COLUMNS.index('speed')]
+    metric = DerivedChannels(GT7Logger.channels)
+    np.testing.assert_allclose(_column(metric, metric(raw), 'speed'), speed * MS_TO_KPH)
+    imperial = DerivedChannels(GT7Logger.channels, imperial=True)
+    np.testing.assert_allclose(_column(imperial, imperial(raw), 'speed'), speed * MS_TO_MPH)
+    np.testing.assert_allclose(_column(metric, metric(raw), 'throttle'), raw[:, RAW_COLUMNS.index('throttle')] * 100 / 255)
+
+def test_longitudinal_g():
+    raw = _raw(60)
+    # 9.8 m/s more every second along z, the car pointing straight ahead
+    raw[:, [RAW_COLUMNS.index(c) for c in ('vx', 'vy')]] = 0
+    raw[:, RAW_COLUMNS.index('vz')] = np.arange(60) * 9.8 / 60
+    derive = DerivedChannels(GT7Logger.channels, freq=60)
+    glong = _column(derive, derive(raw), 'glong')
+    np.testing.assert_allclose(np.abs(glong[1:]), 1.0)
+
+def test_derived_off():
+    derive = DerivedChannels(GT7Logger.channels, derived=False)
+    out = derive(_raw(10))
+    for name in ('lat', 'long', 'velx', 'glat'):
+        assert not _column(derive, out, name).any()
+    assert _column(derive, out, 'rpm').any()
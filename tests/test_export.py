@@ -0,0 +1,40 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from gt7.analysis import read_ld_channels
+from gt7.export import ExportWorker, finalise
+from gt7.telemetry import GT7Logger
+from gt7.writer.ld_stream import LDStreamWriter
+
+def _log(tmp_path, datagrams, **options):
+    logger = GT7Logger(replay=True, filetemplate=str(tmp_path / "{datetime}.ld"), **options)
+    logger.sampler = SimpleNamespace(freq=60)
+    for i, data in enumerate(datagrams):
+        logger.process_sample(i / 60, data)
+    logger.close()
+    return logger.saved
+
+def test_worker_writes_what_the_logger_would(tmp_path, lap_datagrams):
+    (local,) = _log(tmp_path / "local", lap_datagrams)
+    (exported,) = _log(tmp_path / "worker", lap_datagrams, export_worker=True)
+    expected, freq = read_ld_channels(local)
+    channels, _ = read_ld_channels(exported)
+    assert list(channels) == list(expected) and freq == 60
+    for name in expected:
+        np.testing.assert_array_equal(channels[name], expected[name])
+
+def test_finalise_removes_an_empty_log(tmp_path):
+    path = str(tmp_path / "empty.ld")
+    state = LDStreamWriter(path, ["speed", "rpm"], freq=60, capacity=16).detach()
+    assert finalise(state, None, None) == 0
+    assert not os.path.exists(path)
+
+def test_errors_are_reported_not_raised(tmp_path):
+    state = LDStreamWriter(str(tmp_path / "gone.ld"), ["speed"], freq=60, capacity=16).detach()
+    os.remove(state["path"])
+    worker = ExportWorker()
+    assert worker.submit(state, np.ones((4, 1), dtype=np.float32), None)
+    ((path, count, error),) = worker.close()
+    assert path == state["path"] and count == 0 and error
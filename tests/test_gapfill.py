@@ -0,0 +1,80 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from gt7.analysis import read_ld_channels
+from gt7.derived import RAW_COLUMNS
+from gt7.gapfill import Resampler, fill_rows, resample
+from gt7.synth import datagrams
+from gt7.telemetry import GT7Logger
+
+def test_fill_rows_hold_and_linear():
+    last, current = np.array([1.0, 0.0, 10.0, 3.0]), np.array([2.0, 1.0, 20.0, 4.0])
+    held = fill_rows(last, current, 3, "hold", step=[0], event=[1])
+    assert (held == [1.0, 0.0, 10.0, 3.0]).all()
+
+    linear = fill_rows(last, current, 3, "linear", step=[0], event=[1])
+    np.testing.assert_allclose(linear[:, 2], [12.5, 15.0, 17.5])
+    assert (linear[:, 0] == 1.0).all() and (linear[:, 1] == 0).all()
+
+    with pytest.raises(ValueError):
+        fill_rows(last, current, 3, "cubic")
+
+def test_fill_rows_slerps_rotation():
+    half = np.sqrt(0.5)
+    # a quarter turn about y, linear interpolation would shorten it
+    last, current = np.array([0.0, 1.0, 0.0, 0.0, 0.0]), np.array([0.0, half, 0.0, half, 0.0])
+    rows = fill_rows(last, current, 1, "linear", rotation=[1, 2, 3, 4])
+    np.testing.assert_allclose(np.linalg.norm(rows[:, 1:], axis=1), 1.0)
+    np.testing.assert_allclose(rows[0, 1:], [np.cos(np.pi / 8), 0.0, np.sin(np.pi / 8), 0.0])
+
+def test_resample_to_grid():
+    times = np.arange(7) / 60
+    columns = {"speed": np.arange(7.0), "gear": np.array([1, 1, 2, 2, 3, 3, 3]), "beacon": np.array([0, 1, 0, 0, 0, 1, 0])}
+    grid, out = resample(times, columns, 40)
+    np.testing.assert_allclose(grid, np.arange(5) / 40)
+    np.testing.assert_allclose(out["speed"], np.arange(5) * 1.5)
+    assert list(out["gear"]) == [1, 1, 2, 3, 3]
+    # each beacon lands on the grid point at or after its sample
+    assert list(out["beacon"]) == [0, 1, 0, 0, 1]
+
+def test_resampler_blocks_match_one_call():
+    rows = np.zeros((600, len(RAW_COLUMNS)))
+    rows[:, RAW_COLUMNS.index("speed")] = np.sin(np.arange(600) / 50)
+    rows[:, RAW_COLUMNS.index("rotation_w")] = 1
+    rows[[59, 300, 451], RAW_COLUMNS.index("beacon")] = 1
+    _, columns = resample(np.arange(600) / 60, {name: rows[:, i] for i, name in enumerate(RAW_COLUMNS)}, 25)
+    whole = np.column_stack([columns[name] for name in RAW_COLUMNS])
+
+    resampler = Resampler(RAW_COLUMNS, 25)
+    sizes = np.random.default_rng(2).integers(1, 40, size=100)
+    bounds = np.cumsum(sizes)
+    blocks = [resampler(block) for block in np.split(rows, bounds[bounds < len(rows)])]
+    np.testing.assert_allclose(np.vstack(blocks), whole)
+
+def _log(tmp_path, freq=60, loss=0.0, **options):
+    logger = GT7Logger(replay=True, filetemplate=str(tmp_path / f"{freq}-{{datetime}}.ld"), **options)
+    logger.sampler = SimpleNamespace(freq=freq)
+    data = list(datagrams(laps=1, seed=4, loss=loss))
+    for i, d in enumerate(data):
+        logger.process_sample(i / 60, d)
+    logger.save_log()
+    assert len(logger.saved) == 1
+    return read_ld_channels(logger.saved[0])
+
+def test_process_packet_fills_gaps(tmp_path):
+    full, _ = _log(tmp_path)
+    os.makedirs(tmp_path / "lossy")
+    lossy, _ = _log(tmp_path / "lossy", loss=0.05, gap_fill="linear")
+    # every dropped tick is synthesised again
+    assert len(lossy["speed"]) == len(full["speed"])
+    np.testing.assert_allclose(lossy["speed"], full["speed"], atol=1.0)
+
+def test_log_resampled_to_sampler_freq(tmp_path):
+    full, _ = _log(tmp_path)
+    half, freq = _log(tmp_path, freq=30)
+    assert freq == 30
+    assert abs(len(half["speed"]) - len(full["speed"]) / 2) <= 1
+    np.testing.assert_allclose(half["speed"], full["speed"][::2][:len(half["speed"])], atol=0.5)
@@ -0,0 +1,39 @@
+import pytest
+
+from gt7.heartbeat import LinkStats
+
+def _feed(stats, ticks, start=0.0):
+    for i, tick in enumerate(ticks):
+        stats.observe(tick, start + i / 60)
+
+def test_loss_and_reorder():
+    stats = LinkStats()
+    _feed(stats, [1, 2, 3, 6, 5, 7, 10])
+    assert stats.received == 6
+    assert stats.lost == 2 + 2
+    assert stats.reordered == 1
+    assert stats.loss == pytest.approx(4 / 10)
+
+def test_steady_stream_has_no_jitter():
+    stats = LinkStats()
+    _feed(stats, range(100, 400))
+    assert stats.lost == 0
+    assert stats.jitter == pytest.approx(0.0, abs=1e-9)
+
+def test_tick_reset_is_picked_up():
+    stats = LinkStats()
+    _feed(stats, range(5000, 5100))
+    _feed(stats, range(1, 101), start=2.0)
+    assert stats.resets == 1
+    assert stats.reordered == 0
+    assert stats.received == 200
+    assert stats.lost == 0
+    assert stats.last_tick == 100
+
+def test_late_packet_still_counts_as_arrival():
+    stats = LinkStats()
+    _feed(stats, [1, 2, 3])
+    stats.observe(2, 5.0)
+    assert stats.reordered == 1
+    assert stats.last_arrival == 5.0
+    assert stats.last_tick == 3
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+from gt7.analysis import read_ld_channels
+from gt7.journal import Journal, recover, SEGMENTS_FILE
+from gt7.library import read_ldx
+
+NAMES = ["speed", "rpm", "gear"]
+
+def test_recovers_complete_segments(tmp_path):
+    journal_dir = str(tmp_path / "journal")
+    path = str(tmp_path / "logs" / "race.ld")
+    blocks = [np.full((100, len(NAMES)), i, dtype=np.float32) + np.arange(len(NAMES)) for i in range(5)]
+
+    journal = Journal(journal_dir, path, NAMES, freq=60, sync=False)
+    journal.update_event({"driver": "Tester", "datetime": "2026-10-18T10:00:00"})
+    for block in blocks:
+        journal.append(block)
+    journal.add_lap(1.0, 80.0)
+    # the power goes while the next segment is being written
+    os.write(journal.fd, b"\x47\x54\x37\x4a" + bytes(30))
+    os.close(journal.fd)
+
+    assert recover(journal_dir) == [path]
+    assert os.listdir(journal_dir) == []
+
+    channels, freq = read_ld_channels(path)
+    assert freq == 60
+    expected = np.concatenate(blocks)
+    for i, name in enumerate(NAMES):
+        np.testing.assert_array_equal(channels[name], expected[:, i])
+    assert read_ldx(path) == {"laps": 1, "best_lap": 80.0}
+
+def test_bad_checksum_ends_the_journal(tmp_path):
+    journal_dir = str(tmp_path / "journal")
+    path = str(tmp_path / "race.ld")
+    journal = Journal(journal_dir, path, NAMES, sync=False)
+    for i in range(3):
+        journal.append(np.full((10, len(NAMES)), i, dtype=np.float32))
+    os.close(journal.fd)
+
+    segments = os.path.join(journal.directory, SEGMENTS_FILE)
+    with open(segments, "r+b") as f:
+        # a byte of the second segment's data
+        f.seek(2 * 20 + 10 * len(NAMES) * 4 + 5)
+        f.write(b"\xff")
+
+    recover(journal_dir)
+    channels, _ = read_ld_channels(path)
+    np.testing.assert_array_equal(channels["speed"], np.zeros(10))
+
+def test_close_assembles_and_removes(tmp_path):
+    journal_dir = str(tmp_path / "journal")
+    path = str(tmp_path / "race.ld")
+    journal = Journal(journal_dir, path, NAMES, sync=False)
+    journal.append(np.ones((50, len(NAMES)), dtype=np.float32))
+    journal.close()
+    assert os.listdir(journal_dir) == []
+    assert len(read_ld_channels(path)[0]["rpm"]) == 50
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from gt7.analysis import read_ld_channels
+from gt7.library import read_ld
+from gt7.writer.ld_stream import LDStreamWriter, META_PTR, CHANNEL, DTYPE
+
+NAMES = ["speed", "rpm", "gear", "throttle", "brake"]
+
+def _write(path, data, capacity, detach=False):
+    writer = LDStreamWriter(path, NAMES, freq=60, capacity=capacity)
+    sizes = np.random.default_rng(0).integers(1, 97, size=len(data))
+    start = 0
+    for size in sizes:
+        if start >= len(data):
+            break
+        writer.append(data[start:start + size])
+        start += size
+    if detach:
+        writer = LDStreamWriter.resume(writer.detach())
+    writer.add_lap(10.0, 95.5)
+    writer.close({"driver": "Tester", "venue": "Suzuka", "datetime": "2026-10-18T10:00:00"})
+    return writer
+
+def test_round_trip_through_extent_growth(tmp_path):
+    data = np.random.default_rng(1).standard_normal((5003, len(NAMES))).astype(DTYPE)
+    path = str(tmp_path / "session.ld")
+    # a capacity of 64 doubles the extent seven times
+    _write(path, data, capacity=64, detach=True)
+
+    channels, freq = read_ld_channels(path)
+    assert freq == 60
+    assert list(channels) == NAMES
+    for i, name in enumerate(NAMES):
+        np.testing.assert_array_equal(channels[name], data[:, i])
+
+    info = read_ld(path)
+    assert (info["driver"], info["venue"], info["samples"]) == ("Tester", "Suzuka", len(data))
+    assert os.path.exists(str(tmp_path / "session.ldx"))
+
+def test_close_drops_spare_capacity(tmp_path):
+    data = np.ones((3000, len(NAMES)), dtype=DTYPE)
+    path = str(tmp_path / "session.ld")
+    # sized for the session, the extent never grows
+    writer = _write(path, data, capacity=4000)
+    assert writer.extent_ptr == META_PTR + CHANNEL.size * len(NAMES)
+    assert os.path.getsize(path) == writer.extent_ptr + 4 * 4000 * DTYPE.itemsize + 3000 * DTYPE.itemsize
+
+def test_empty_session(tmp_path):
+    path = str(tmp_path / "empty.ld")
+    LDStreamWriter(path, NAMES).close()
+    channels, _ = read_ld_channels(path)
+    assert all(len(values) == 0 for values in channels.values())
@@ -0,0 +1,60 @@
+import asyncio
+import os
+
+import pytest
+
+from gt7.library import parse_range, read_file
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("items=0-10", None),
+    ("bytes=0-1,5-9", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=10-", (10, 999)),
+    ("bytes=990-2000", (990, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=999-999", (999, 999)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=20-10", "bytes=a-b", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+def test_read_file(tmp_path):
+    path = tmp_path / "data"
+    path.write_bytes(bytes(range(256)) * 4)
+    start, end = parse_range("bytes=100-899", 1024)
+    assert b"".join(read_file(str(path), start, end, chunk_size=64)) == path.read_bytes()[100:900]
+
+def test_directory_moved_in_is_indexed(tmp_path):
+    from gt7.library import LogLibrary
+    from gt7.writer.ld_stream import LDStreamWriter
+
+    logs, outside = tmp_path / "logs", tmp_path / "car2"
+    (outside / "practice").mkdir(parents=True)
+    writer = LDStreamWriter(str(outside / "practice" / "a.ld"), ["speed"])
+    writer.append([[1.0], [2.0]])
+    writer.close({"driver": "Tester"})
+
+    async def run():
+        library = LogLibrary(str(logs), debounce=0.05)
+        await library.start()
+        try:
+            os.rename(outside, logs / "car2")
+            for _ in range(100):
+                if library.query()["total"]:
+                    break
+                await asyncio.sleep(0.05)
+            return library.query()["items"], sorted(library.watchers)
+        finally:
+            library.close()
+
+    items, watched = asyncio.run(run())
+    assert [(item["name"], item["driver"]) for item in items] == [("car2/practice/a.ld", "Tester")]
+    # its subdirectories are followed from then on
+    assert str(logs / "car2" / "practice") in watched
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+
+import pytest
+
+from gt7.livestate import LiveState, LAYOUT, NAMES, SEQ, SEQ_OFFSET, owner
+
+def _values(i):
+    # every field derived from i, so a torn copy shows as a mismatch
+    return (
+        float(i), i, i % 1000, i % 1000, float(i), float(i), float(i), float(i),
+        i % 256, i % 256, i % 256, i % 256, float(i), float(i), float(i), float(i), float(i), float(i),
+        i % 1000, i % 1000, i, True, False, False,
+    )
+
+def _writer(name, count):
+    live = LiveState.attach(name)
+    live.owner = False
+    for i in range(1, count + 1):
+        live.write(*_values(i))
+    live.close()
+
+@pytest.fixture
+def live():
+    live = LiveState.create(f"gt7-test-{os.getpid()}")
+    yield live
+    live.close()
+
+def test_read_before_first_write(live):
+    reader = LiveState.attach(live.shm.name)
+    try:
+        assert reader.read() is None
+    finally:
+        reader.close()
+
+def test_read_after_write(live):
+    live.write(*_values(42))
+    reader = LiveState.attach(live.shm.name)
+    try:
+        assert reader.read() == dict(zip(NAMES, LAYOUT.unpack(LAYOUT.pack(*_values(42)))))
+    finally:
+        reader.close()
+
+def test_odd_sequence_is_never_read(live):
+    live.write(*_values(1))
+    # a writer stopped half way through an update
+    SEQ.pack_into(live.buf, SEQ_OFFSET, live.seq + 1)
+    reader = LiveState.attach(live.shm.name)
+    try:
+        assert reader.snapshot(retries=10) is None
+    finally:
+        reader.close()
+
+def test_copies_are_consistent(live):
+    count = 20000
+    ctx = multiprocessing.get_context("fork")
+    process = ctx.Process(target=_writer, args=(live.shm.name, count))
+    process.start()
+    reader = LiveState.attach(live.shm.name)
+    try:
+        seen = 0
+        while process.is_alive() or seen < count:
+            values = reader.read()
+            if values is None:
+                continue
+            i = int(values["timestamp"])
+            assert values["tick"] == values["car_code"] == i
+            assert values["rpm"] == values["z"] == float(i)
+            seen = i
+            if not process.is_alive() and seen == count:
+                break
+    finally:
+        process.join()
+        reader.close()
+
+def test_refuses_a_block_in_use(live):
+    assert owner(live.shm.name) == os.getpid()
+    with pytest.raises(FileExistsError):
+        LiveState.create(live.shm.name)
@@ -0,0 +1,38 @@
+from gt7.metrics import Registry
+
+def test_render():
+    registry = Registry()
+    registry.counter("packets_total", "Packets").labels().inc(3)
+    latency = registry.histogram("stage_seconds", "Latency", buckets=(0.001, 0.01)).labels(stage="decrypt")
+    for value in (0.0005, 0.005, 0.005, 1.0):
+        latency.observe(value)
+    registry.gauge("depth", "Queue depth", lambda: {("car1", "bus"): 2}, label=("console", "queue"))
+
+    lines = registry.render().splitlines()
+    assert "# TYPE packets_total counter" in lines
+    assert "packets_total 3" in lines
+    assert 'stage_seconds_bucket{stage="decrypt",le="0.001"} 1' in lines
+    assert 'stage_seconds_bucket{stage="decrypt",le="0.01"} 3' in lines
+    assert 'stage_seconds_bucket{stage="decrypt",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="decrypt"} 4' in lines
+    assert 'depth{console="car1",queue="bus"} 2' in lines
+    assert latency.quantile(0.5) == 0.01
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.gauge("link", "Link", lambda: {'pit "A"\\\nbox': 1}, label="console")
+    assert 'link{console="pit \\"A\\"\\\\\\nbox"} 1' in registry.render().splitlines()
+
+def test_collector_merges_other_processes():
+    registry = Registry()
+    registry.counter("packets_total", "Packets").labels().inc()
+    worker = Registry()
+    worker.counter("packets_total", "Packets").labels(worker="1").inc(5)
+    registry.collector("worker-1", worker.collect)
+    # a worker that has gone away is skipped
+    registry.collector("worker-2", lambda: 1 / 0)
+
+    lines = registry.render().splitlines()
+    assert lines.count("# TYPE packets_total counter") == 1
+    assert "packets_total 1" in lines
+    assert 'packets_total{worker="1"} 5' in lines
@@ -0,0 +1,59 @@
+import queue
+import signal
+from types import SimpleNamespace
+
+from gt7.database import Database
+from gt7.multi import MultiIngest, _worker, consoles_from_config, logger_options
+
+def test_consoles_from_config():
+    consoles = consoles_from_config({"consoles": ["192.168.1.10", {"ip": "192.168.1.11", "name": "car2", "driver": "b"}]})
+    assert [(c["ip"], c["name"], c["index"]) for c in consoles] == [
+        ("192.168.1.10", "console1", 0), ("192.168.1.11", "car2", 1)]
+    options = logger_options({"log_output_path": "/logs/session.ld", "live_state": "gt7-live"}, consoles[1])
+    assert options["filetemplate"] == "/logs/car2/{datetime}.ld"
+    assert options["live"] == "gt7-live-car2" and options["driver"] == "b"
+    assert consoles_from_config({}) == []
+
+def test_routes_by_source_and_drops_when_behind():
+    consoles = consoles_from_config({"consoles": ["10.0.0.1", "10.0.0.2", "10.0.0.3"]})
+    ingest = MultiIngest(consoles, workers=2, maxsize=1)
+    ingest.loop = SimpleNamespace(call_soon=lambda callback: None)
+    ingest.queues = [queue.Queue(1) for _ in range(ingest.workers)]
+
+    for n in range(3):
+        for console in consoles:
+            ingest.datagram_received(n, b"data", (console["ip"], 33740))
+    ingest.datagram_received(0, b"data", ("10.0.0.9", 33740))
+    ingest.flush()
+    ingest.datagram_received(3, b"data", ("10.0.0.1", 33740))
+    ingest.flush()
+
+    assert [c["worker"] for c in consoles] == [0, 1, 0]
+    assert ingest.queues[0].get_nowait() == [(i, n, b"data") for n in range(3) for i in (0, 2)]
+    assert [index for index, _, _ in ingest.queues[1].get_nowait()] == [1, 1, 1]
+    assert ingest.unknown == 1
+    assert ingest.dropped == [1, 0]
+
+def test_worker_logs_each_console(tmp_path, lap_datagrams):
+    config = {"log_output_path": str(tmp_path / "session.ld"), "live_state": None, "replay": True}
+    consoles = consoles_from_config({"consoles": ["10.0.0.1", "10.0.0.2"]})
+    jobs, reports = queue.Queue(), queue.Queue()
+    for n in range(0, len(lap_datagrams), 100):
+        jobs.put([(c["index"], i / 60, data) for i, data in enumerate(lap_datagrams[n:n + 100], n) for c in consoles])
+    jobs.put(None)
+
+    db_file = str(tmp_path / "sessions.db")
+    previous = signal.getsignal(signal.SIGINT)
+    try:
+        _worker(consoles, config, db_file, jobs, reports)
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+    for console in consoles:
+        assert list((tmp_path / console["name"]).glob("*.ld"))
+    db = Database(db_file)
+    try:
+        sessions = db.get_sessions()
+    finally:
+        db.close()
+    assert len(sessions) == 2 and all(s["laps"] for s in sessions)
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+
+from gt7.pipeline import Pipeline, StageStats, discover
+from gt7.synth import datagrams
+from gt7.telemetry import GT7Logger
+
+class Collect:
+    def __init__(self, delay=0.0):
+        self.blocks = []
+        self.delay = delay
+
+    def output(self, block):
+        time.sleep(self.delay)
+        self.blocks.append(block)
+
+def _output(pipeline, plugin):
+    # an output that is not a plugin package
+    pipeline.stages.append(("outputs", "outputs:test", plugin))
+    pipeline.stats["outputs:test"] = StageStats("outputs:test")
+    return plugin
+
+def test_discover():
+    assert {"decryptor_a", "decryptor_b", "parser_a", "parser_b", "metadata", "csv"} <= set(discover())
+
+def test_stages(lap_datagrams):
+    pipeline = Pipeline("decryptor_a", "parser_a", enrichers=["metadata", "mapping"], workers=False)
+    try:
+        # a datagram that does not decrypt is dropped with its timestamp
+        data = lap_datagrams[:100] + [bytes(296)]
+        block = pipeline.process(np.arange(len(data)) / 60, data)
+    finally:
+        pipeline.close()
+    assert list(block.columns["tick"]) == list(range(1, 101))
+    np.testing.assert_allclose(block.columns["timestamp"], np.arange(100) / 60)
+    assert {"lat", "long"} <= set(block.columns)
+    assert block.meta["current_lap"] == 1 and block.meta["in_race"]
+    snapshot = pipeline.snapshot()
+    assert snapshot["decryptor:decryptor_a"]["items"] == 101
+    assert snapshot["parser:parser_a"]["items"] == 100
+
+def test_packet_b():
+    data = list(datagrams(laps=1, packet="B", seed=2))[:60]
+    pipeline = Pipeline("decryptor_b", "parser_b", workers=False)
+    try:
+        block = pipeline.process(np.zeros(len(data)), data)
+    finally:
+        pipeline.close()
+    assert len(block) == 60
+    assert {"wheel_rotation", "sway", "heave", "surge"} <= set(block.columns)
+
+def test_fed_from_the_logger(tmp_path, lap_datagrams):
+    decrypting = Pipeline("decryptor_a", "parser_a", workers=False)
+    expected = decrypting.process(np.arange(len(lap_datagrams)) / 60, lap_datagrams)
+    decrypting.close()
+
+    pipeline = Pipeline("decryptor_a", "parser_a", block_size=50, workers=False, decrypted=True)
+    # nothing is decrypted twice
+    assert [key for _, key, _ in pipeline.stages] == ["parser:parser_a"]
+    blocks = _output(pipeline, Collect()).blocks
+
+    logger = GT7Logger(replay=True, filetemplate=str(tmp_path / "{datetime}.ld"))
+    logger.on_packet = pipeline.feed
+    for i, data in enumerate(lap_datagrams):
+        logger.process_sample(i / 60, data)
+    logger.save_log()
+    pipeline.close()
+
+    columns = {name: np.concatenate([b.columns[name] for b in blocks]) for name in ("timestamp", "tick", "speed")}
+    np.testing.assert_allclose(columns["timestamp"], expected.columns["timestamp"])
+    assert (columns["tick"] == expected.columns["tick"]).all()
+    assert (columns["speed"] == expected.columns["speed"]).all()
+
+def test_drops_blocks_when_behind(lap_datagrams):
+    pipeline = Pipeline("decryptor_a", "parser_a", block_size=10, workers=False, max_pending=2)
+    output = _output(pipeline, Collect(delay=0.05))
+    for i, data in enumerate(lap_datagrams[:200]):
+        pipeline.feed(i / 60, data)
+    pipeline.close()
+    assert 0 < pipeline.dropped < 200 and pipeline.dropped % 10 == 0
+    assert sum(len(b) for b in output.blocks) + pipeline.dropped == 200
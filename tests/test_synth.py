@@ -0,0 +1,32 @@
+import numpy as np
+
+from gt7.synth import datagrams
+from gt7.telemetry import GT7DataPacket
+
+def test_packet_variants_decrypt():
+    ticks = {}
+    for packet in ("A", "B", "~"):
+        ticks[packet] = [GT7DataPacket(d).tick for _, d in zip(range(20), datagrams(laps=1, packet=packet, seed=3))]
+    assert ticks["A"] == ticks["B"] == ticks["~"] == list(np.arange(1, 21))
+
+def _ticks(**options):
+    return [GT7DataPacket(d).tick for d in datagrams(laps=1, seed=5, **options)]
+
+def test_loss_and_reorder():
+    every = _ticks()
+    assert every == list(range(1, len(every) + 1))
+
+    lossy = _ticks(loss=0.1)
+    assert set(lossy) < set(every)
+    assert 0.05 < 1 - len(lossy) / len(every) < 0.15
+
+    reordered = _ticks(reorder=0.05)
+    assert sorted(reordered) == every
+    assert reordered != every
+
+def test_laps_complete():
+    p = [GT7DataPacket(d) for d in datagrams(laps=2, seed=1)]
+    laps = [packet.current_lap for packet in p]
+    assert laps[0] == 1 and max(laps) == 2
+    # the lap time of the first lap shows up once it is done
+    assert p[-1].last_laptime > 0
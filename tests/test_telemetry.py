@@ -0,0 +1,48 @@
+from copy import copy
+from types import SimpleNamespace
+
+from gt7.analysis import read_ld_channels
+from gt7.library import read_ldx
+from gt7.synth import datagrams
+from gt7.telemetry import GT7Logger
+
+def _logger(tmp_path, **options):
+    logger = GT7Logger(filetemplate=str(tmp_path / "{datetime}.ld"), **options)
+    logger.sampler = SimpleNamespace(freq=60)
+    return logger
+
+def _feed(logger, data, start=0.0):
+    for i, d in enumerate(data):
+        logger.process_sample(start + i / 60, d)
+
+def test_new_log_when_the_lap_count_goes_back(tmp_path, lap_datagrams):
+    logger = _logger(tmp_path, replay=True)
+    sessions = logger.bus.subscribe("test", topics=("session", "lap"))
+    _feed(logger, lap_datagrams)
+    # a restarted race begins at lap 1 again, an hour later
+    _feed(logger, list(datagrams(laps=1, seed=2)), start=3600.0)
+    logger.close()
+
+    first, second = logger.saved
+    channels, _ = read_ld_channels(first)
+    # three skipped ticks at the start of each log
+    assert len(channels["rpm"]) == len(lap_datagrams) - 3
+    assert read_ldx(first)["laps"] == 1 and read_ldx(first)["best_lap"] > 0
+    assert read_ldx(second)["laps"] == 0
+
+    events = [(topic, item[1].get("state")) for topic, item in (sessions.get_nowait() for _ in range(sessions.lag))]
+    assert events == [("session", "start"), ("lap", None), ("session", "end"), ("session", "start"), ("session", "end")]
+
+def test_log_ends_with_the_race(tmp_path, lap_datagrams):
+    logger = _logger(tmp_path)
+    _feed(logger, lap_datagrams[:300])
+    assert not logger.saved
+
+    left = copy(logger.last_packet)
+    left.in_race = False
+    left.tick += 1
+    logger.process_packet(300 / 60, left)
+    (path,) = logger.saved
+    assert len(read_ld_channels(path)[0]["rpm"]) == 297
+    assert logger.writer is None and logger.current_event is None
+    logger.close()
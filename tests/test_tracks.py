@@ -0,0 +1,59 @@
+import numpy as np
+
+from gt7.capture import CaptureWriter
+from gt7.telemetry import GT7DataPacket
+from gt7.tracks import GT7TrackDetector, TrackDB, learn, load_db
+
+def _circle(cx, cz, radius, n=200):
+    a = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    return np.column_stack([cx + radius * np.cos(a), cz + radius * np.sin(a)]).tolist()
+
+def _db(tmp_path, lap_datagrams):
+    path = str(tmp_path / "laps.gt7raw")
+    writer = CaptureWriter(path)
+    for n, data in enumerate(lap_datagrams):
+        writer.write(n / 60, data)
+        if n == 10:
+            # a packet that does not decrypt
+            writer.write(n / 60, bytes(len(data)))
+    writer.close()
+
+    tracks = [
+        learn(path, "Synthetic"),
+        {"name": "Oval", "centreline": _circle(5000, 5000, 400), "start": [[5400, 4990], [5400, 5010]]},
+    ]
+    return TrackDB.compile(tracks)
+
+def test_nearest_and_crossed():
+    db = TrackDB.compile([
+        {"name": "A", "centreline": _circle(0, 0, 100), "start": [[90, 0], [110, 0]]},
+        {"name": "B", "centreline": _circle(1000, 0, 100)},
+    ])
+    np.testing.assert_allclose(db.nearest(100, 0, 64), [0, 64], atol=0.5)
+    assert list(db.crossed(100, -1, 100, 1)) == [True, False]
+    assert list(db.crossed(0, -1, 0, 1)) == [False, False]
+
+def test_detects_the_learned_track_early(tmp_path, lap_datagrams):
+    db = _db(tmp_path, lap_datagrams)
+    db.save(str(tmp_path / "tracks.npz"))
+    db = load_db(str(tmp_path / "tracks.npz"))
+    assert db.names == ["Synthetic", "Oval"]
+
+    detector = GT7TrackDetector(db)
+    for data in lap_datagrams:
+        p = GT7DataPacket(data)
+        detector.update(p.position[0], p.position[2])
+        if detector.track_name:
+            break
+    assert detector.track_name == "Synthetic"
+    assert detector.distance < 500
+
+def test_unknown_track_stays_unknown():
+    db = TrackDB.compile([{"name": "A", "centreline": _circle(0, 0, 100)}])
+    detector = GT7TrackDetector(db)
+    for x, z in _circle(3000, 3000, 300):
+        detector.update(x, z)
+    assert detector.track_name is None
+
+def test_missing_database(tmp_path):
+    assert load_db(str(tmp_path / "missing.npz")) is None
@@ -0,0 +1,123 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DONE_FILE = '.transcoded'
+
+def transcode(capture, output_dir, replay=False):
+    from gt7.capture import CaptureReader
+    from gt7.telemetry import GT7Logger
+
+    logging.getLogger('gt7').setLevel(logging.WARNING)
+
+    stem = os.path.splitext(os.path.basename(capture))[0].replace('{', '{{').replace('}', '}}')
+    template = os.path.join(output_dir, stem + '_{datetime}.ld')
+    logger = GT7Logger(replay=replay, filetemplate=template)
+
+    start = time.perf_counter()
+    reader = CaptureReader(capture)
+    packets = 0
+    try:
+        for timestamp, data in reader:
+            logger.process_sample(timestamp, data)
+            packets += 1
+        logger.save_log()
+    finally:
+        reader.close()
+
+    return capture, packets, len(logger.saved), time.perf_counter() - start
+
+def load_done(output_dir):
+    done = {}
+    path = os.path.join(output_dir, DONE_FILE)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # interrupted while writing the last line
+                    continue
+                done[entry['capture']] = entry
+    return done
+
+def mark_done(output_dir, capture, packets, sessions):
+    st = os.stat(capture)
+    entry = {
+        'capture': os.path.basename(capture),
+        'size': st.st_size,
+        'mtime': st.st_mtime,
+        'packets': packets,
+        'sessions': sessions,
+    }
+    with open(os.path.join(output_dir, DONE_FILE), 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def is_done(done, capture):
+    entry = done.get(os.path.basename(capture))
+    if not entry:
+        return False
+    st = os.stat(capture)
+    return entry['size'] == st.st_size and entry['mtime'] == st.st_mtime
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-export a directory of raw GT7 captures to MoTeC .ld files")
+    parser.add_argument('captures', help="directory holding the raw captures")
+    parser.add_argument('--output', help="directory for the .ld files, defaults to the capture directory")
+    parser.add_argument('--pattern', default='*.gt7raw', help="glob for the capture files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--replay', action='store_true', help="log replays as well as live sessions")
+    parser.add_argument('--force', action='store_true', help="re-export captures that were already transcoded")
+    args = parser.parse_args()
+
+    output_dir = args.output or args.captures
+    os.makedirs(output_dir, exist_ok=True)
+
+    captures = sorted(glob.glob(os.path.join(glob.escape(args.captures), args.pattern)))
+    done = {} if args.force else load_done(output_dir)
+    todo = [c for c in captures if not is_done(done, c)]
+
+    print(f"{len(captures)} captures, {len(captures) - len(todo)} already transcoded, {len(todo)} to go")
+    if not todo:
+        return 0
+
+    start = time.perf_counter()
+    total_packets = 0
+    total_sessions = 0
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(transcode, c, output_dir, args.replay): c for c in todo}
+        for n, future in enumerate(as_completed(futures), 1):
+            capture = futures[future]
+            name = os.path.basename(capture)
+            try:
+                _, packets, sessions, seconds = future.result()
+            except BaseException as e:
+                failed += 1
+                print(f"[{n}/{len(todo)}] {name}: failed ({e!r})")
+                continue
+
+            mark_done(output_dir, capture, packets, sessions)
+            total_packets += packets
+            total_sessions += sessions
+            print(f"[{n}/{len(todo)}] {name}: {packets} packets, {sessions} sessions in {seconds:.1f}s")
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"transcoded {len(todo) - failed} captures in {elapsed:.1f}s:"
+        f" {total_packets / elapsed:.0f} packets/s,"
+        f" {total_sessions / elapsed * 60:.1f} sessions/min"
+        + (f", {failed} failed" if failed else "")
+    )
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())